@@ -31,7 +31,7 @@ CORE_MODULES = ['annotation', 'attribute', 'color', 'dimension', 'document',
 
 __all__ = CORE_MODULES + ['font', 'fonts', 'frontend', 'backend', 'resource',
                           'styleds', 'styles', 'stylesheets', 'templates',
-                          'strings', 'language']
+                          'strings', 'language', 'progress']
 
 
 DATA_PATH = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'data')
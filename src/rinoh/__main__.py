@@ -22,6 +22,7 @@ from rinoh.flowable import StaticGroupedFlowables, GroupedFlowablesStyle
 from rinoh.font import Typeface, FontSlant
 from rinoh.paper import Paper, PAPER_BY_NAME
 from rinoh.paragraph import ParagraphStyle, Paragraph
+from rinoh.progress import ProgressBar, JSONLinesProgressLog
 from rinoh.resource import ResourceNotInstalled
 from rinoh.style import StyleSheet, StyleSheetFile
 from rinoh.stylesheets import matcher
@@ -64,6 +65,25 @@ parser.add_argument('-p', '--paper', type=str,
 parser.add_argument('-i', '--install-resources', action='store_true',
                     help='automatically install missing resources (fonts, '
                          'templates, style sheets) from PyPI')
+parser.add_argument('--incremental', action='store_true',
+                    help='on subsequent rendering passes, only render the '
+                         'pages affected by changed page references again')
+parser.add_argument('--layout-cache', action='store_true',
+                    help='store the rendered pages in a layout cache (.rtl) '
+                         'and reuse the pages that are unaffected by changes '
+                         'to the input when rendering it again')
+parser.add_argument('--processes', metavar='N', type=int,
+                    help='first render the document in N processes in '
+                         'parallel, using the page numbers from the '
+                         'previous build (.rtc)')
+parser.add_argument('--stream', action='store_true',
+                    help='write the content of each page to the output file '
+                         'as soon as it is placed, instead of holding all '
+                         'pages in memory (not with --incremental or '
+                         '--layout-cache)')
+parser.add_argument('--progress-log', metavar='FILENAME', type=str,
+                    help='additionally write the rendering progress to '
+                         'FILENAME as JSON lines')
 parser.add_argument('--list-templates', action='store_true',
                     help='list the installed document templates and exit')
 parser.add_argument('--list-stylesheets', action='store_true',
@@ -280,9 +300,17 @@ def main():
 
     document_tree = reader.parse(args.input)
     document = template_cls(document_tree, configuration=configuration)
+    progress_reporters = [ProgressBar()]
+    if args.progress_log:
+        progress_reporters.append(JSONLinesProgressLog(args.progress_log))
     while True:
         try:
-            success = document.render(output_path)
+            success = document.render(output_path,
+                                      incremental=args.incremental,
+                                      layout_cache=args.layout_cache,
+                                      progress_reporters=progress_reporters,
+                                      processes=args.processes,
+                                      stream=args.stream)
             if not success:
                 raise SystemExit('Rendering completed with errors')
             break
@@ -301,6 +329,8 @@ def main():
             else:
                 raise SystemExit(not_installed_msg + " Consider passing the "
                                  "--install-resources command line option.")
+    for reporter in progress_reporters:
+        reporter.close()
 
 
 if __name__ == '__main__':
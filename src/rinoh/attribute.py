@@ -424,11 +424,20 @@ class RuleSet(OrderedDict):
         except DefaultValueException:
             value = configurable.configuration_class._get_default(attribute)
         if isinstance(value, Var):
-            config = configurable.configuration_class
-            value = config.validate_attribute(attribute,
-                                              self.get_variable(value), False)
+            value = self.get_variable_value(configurable.configuration_class,
+                                            attribute, value.name)
         return value
 
+    @cached
+    def get_variable_value(self, configuration_class, attribute, name):
+        """Return the value of the variable `name` validated as a value for
+        `attribute` of `configuration_class`
+
+        Validating a variable's value can involve parsing it, so the result
+        is cached."""
+        value = self.get_variable(Var(name))
+        return configuration_class.validate_attribute(attribute, value, False)
+
 
 class RuleSetFile(RuleSet):
     def __init__(self, filename, base=None, **kwargs):
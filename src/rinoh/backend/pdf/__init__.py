@@ -6,8 +6,14 @@
 # Public License v3. See the LICENSE file or http://www.gnu.org/licenses/.
 
 
+import hashlib
 import math
+import os
+import re
+import struct
 
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from contextlib import contextmanager
 
@@ -19,17 +25,27 @@ from .xobject.png import PNGReader
 
 from ...font.type1 import Type1Font
 from ...font.opentype import OpenTypeFont
+from ...font.opentype.subset import subset
 
 
 class Document(object):
     extension = '.pdf'
 
-    def __init__(self, creator):
-        self.cos_document = cos.Document(creator)
+    def __init__(self, creator, object_streams=False, compression_level=6,
+                 compression_threads=None):
+        """`compression_level` is the zlib compression level (0-9) for the
+        page content streams and embedded fonts. These are compressed in
+        `compression_threads` threads (default: the number of processors)
+        when writing the document."""
+        self.cos_document = cos.Document(creator, object_streams)
+        self.compression_level = compression_level
+        self.compression_threads = compression_threads or os.cpu_count() or 1
         self.pages = []
         self.fonts = {}
+        self.used_glyphs = {}
         self._font_number = 0
         self._image_number = 0
+        self.images = {}
 
     def get_unique_font_number(self):
         self._font_number += 1
@@ -39,6 +55,21 @@ class Document(object):
         self._image_number += 1
         return self._image_number
 
+    def register_image(self, image):
+        """Return the number and the canonical instance of `image`
+
+        Images with identical file contents share a single XObject, so that
+        an image placed several times is embedded in the PDF file only once.
+
+        """
+        try:
+            image_number, canonical_image = self.images[image.digest]
+        except KeyError:
+            image_number = self.get_unique_image_number()
+            canonical_image = image
+            self.images[image.digest] = image_number, image
+        return image_number, canonical_image
+
     def get_metadata(self, field):
         return str(self.cos_document.info[field.capitalize()])
 
@@ -54,32 +85,47 @@ class Document(object):
                 font_file = (None if font.core else
                              cos.Type1FontFile(font.font_program.header,
                                                font.font_program.body,
-                                               filter=FlateDecode()))
+                                               filter=self.flate_decode()))
                 if font.encoding_scheme == 'AdobeStandardEncoding':
                     symbolic = False
             elif isinstance(font, OpenTypeFont):
-                ff_cls = (cos.OpenTypeFontFile if 'CFF' in font
-                          else cos.TrueTypeFontFile)
-                with open(font.filename, 'rb') as font_data:
-                    font_file = ff_cls(font_data.read(), filter=FlateDecode())
+                font_file = None    # embedded on writing, see _embed_fonts
             # TODO: properly determine flags
             font_desc = cos.FontDescriptor(font, symbolic, font_file)
             if isinstance(font, Type1Font):
                 font_rsc = cos.Type1Font(font, font_desc)
             elif isinstance(font, OpenTypeFont):
                 cid_system_info = cos.CIDSystemInfo('Identity', 'Adobe', 0)
-                widths = font['hmtx']['advanceWidth']
-                w = cos.Array([cos.Integer(0),
-                               cos.Array(map(cos.Integer, widths))])
                 cf_cls = cos.CIDFontType0 if 'CFF' in font else cos.CIDFontType2
-                cid_font = cf_cls(font.name, cid_system_info, font_desc, w=w)
-                mapping = font['cmap'][(3, 1)].mapping
-                to_unicode = cos.ToUnicode(mapping, filter=FlateDecode())
-                font_rsc = cos.CompositeFont(cid_font, 'Identity-H', to_unicode)
+                cid_font = cf_cls(font.name, cid_system_info, font_desc)
+                font_rsc = cos.CompositeFont(cid_font, 'Identity-H')
+                self.used_glyphs[font] = set()
             font_number = self.get_unique_font_number()
             self.fonts[font] = font_number, font_rsc
         return font_number, font_rsc
 
+    def discard_pages(self, pages):
+        """Remove `pages` from this document, along with the named
+        destinations that point to them"""
+        discarded = set(pages)
+        self.pages = [page for page in self.pages if page not in discarded]
+        self._set_cos_pages()
+        discarded_cos_pages = set(id(page.cos_page) for page in discarded)
+        dests = self.cos_document.dests
+        for key, dest in list(dests.items()):
+            if id(dest[0]) in discarded_cos_pages:
+                del dests[key]
+
+    def reorder_pages(self, pages):
+        """Order the pages in this document according to `pages`"""
+        self.pages = list(pages)
+        self._set_cos_pages()
+
+    def _set_cos_pages(self):
+        cos_pages = self.cos_document.catalog['Pages']
+        cos_pages['Kids'] = cos.Array(page.cos_page for page in self.pages)
+        cos_pages['Count'] = cos.Integer(len(self.pages))
+
     def create_outlines(self, sections_tree):
         outlines = self.cos_document.catalog['Outlines'] = cos.Outlines()
         self._create_outline_level(sections_tree, outlines, True)
@@ -106,21 +152,106 @@ class Document(object):
             parent['Last'] = current
         parent['Count'] = cos.Integer(count if top_level else - count)
 
+    def flate_decode(self):
+        """Return a Flate filter using this document's compression level"""
+        return FlateDecode(level=self.compression_level)
+
+    def _map(self, function, *iterables):
+        """Return the results of applying `function` to the items of
+        `iterables`, computed in this document's compression threads
+
+        zlib releases the GIL while compressing, so that independent streams
+        are compressed in parallel."""
+        if self.compression_threads == 1:
+            return list(map(function, *iterables))
+        with ThreadPoolExecutor(self.compression_threads) as executor:
+            return list(executor.map(function, *iterables))
+
+    def write_page(self, page, file):
+        """Write the content stream of `page` to `file` right away
+
+        The content drawn on the page's canvas (and the canvases placed onto
+        it) is discarded afterwards. :meth:`write` needs to be passed the same
+        file; it writes out the remaining objects."""
+        contents = page.cos_page['Contents'] = page.content_stream()
+        self.cos_document.write_object(contents, file)
+        page.canvas.discard()
+
     def write(self, file):
         page_labels = self.cos_document.catalog['PageLabels']['Nums']
         last_number_format = None
-        for index, page in enumerate(self.pages):
-            contents = cos.Stream(filter=FlateDecode())
-            contents.write(page.canvas.getvalue())
+        pending = [page for page in self.pages      # not written yet
+                   if 'Contents' not in page.cos_page]
+        for page, contents in zip(pending, self._map(Page.content_stream,
+                                                     pending)):
             page.cos_page['Contents'] = contents
+        for index, page in enumerate(self.pages):
             if page.number_format != last_number_format:
                 pdf_number_format = PAGE_NUMBER_FORMATS[page.number_format]
                 page_labels.append(cos.Integer(index))
                 page_labels.append(cos.PageLabel(pdf_number_format,
                                                  start=page.number))
                 last_number_format = page.number_format
+        self._embed_fonts()
         self.cos_document.write(file)
 
+    def _embed_fonts(self):
+        """Embed the OpenType fonts, subsetted to the glyphs used in the
+        document, and add the widths and the ToUnicode CMap for these glyphs"""
+        self._map(self._embed_font, self.used_glyphs.keys(),
+                  self.used_glyphs.values())
+
+    def _embed_font(self, font, glyph_codes):
+        _, font_rsc = self.fonts[font]
+        cid_font = font_rsc['DescendantFonts'][0]
+        font_desc = cid_font['FontDescriptor']
+        ff_cls = (cos.OpenTypeFontFile if 'CFF' in font
+                  else cos.TrueTypeFontFile)
+        with open(font.filename, 'rb') as font_file:
+            font_data = font_file.read()
+        try:
+            font_data = subset(font_data, glyph_codes)
+        except (ValueError, IndexError, struct.error):
+            pass                # embed the complete font instead
+        else:
+            base_font = cos.Name('{}+{}'.format(subset_tag(glyph_codes),
+                                                font.name))
+            cid_font['BaseFont'] = font_desc['FontName'] = base_font
+            font_rsc['BaseFont'] = cid_font.composite_font_name(
+                font_rsc['Encoding'])
+        font_file = ff_cls(font_data, filter=self.flate_decode())
+        font_file.reset()           # compress all of the data now
+        font_desc[ff_cls.key] = font_file
+        widths = font['hmtx']['advanceWidth']
+        cid_font['W'] = cos.Array(widths_array(sorted(glyph_codes), widths))
+        mapping = {unicode: code for unicode, code
+                   in font['cmap'][(3, 1)].mapping.items()
+                   if code in glyph_codes}
+        font_rsc['ToUnicode'] = cos.ToUnicode(mapping,
+                                              filter=self.flate_decode())
+
+
+def subset_tag(glyph_codes):
+    """Return the six uppercase letters identifying a font subset"""
+    codes = ','.join(str(code) for code in sorted(glyph_codes))
+    digest = hashlib.md5(codes.encode('ascii')).digest()
+    return ''.join(chr(ord('A') + byte % 26) for byte in digest[:6])
+
+
+def widths_array(glyph_codes, widths):
+    """Yield the items of a CIDFont's W array listing `widths` for the
+    sorted `glyph_codes`, grouping the consecutive codes"""
+    group = []
+    for code in glyph_codes:
+        if group and code != group[-1] + 1:
+            yield cos.Integer(group[0])
+            yield cos.Array(cos.Integer(widths[code]) for code in group)
+            group = []
+        group.append(code)
+    if group:
+        yield cos.Integer(group[0])
+        yield cos.Array(cos.Integer(widths[code]) for code in group)
+
 
 PAGE_NUMBER_FORMATS = {'number': cos.DECIMAL_ARABIC,
                        'lowercase characters': cos.LOWERCASE_LETTERS,
@@ -146,26 +277,168 @@ class Page(object):
         fonts_dict = page_rsc.setdefault('Font', cos.Dictionary())
         fonts_dict[font_name] = font_rsc
 
+    def content_stream(self):
+        """Return a stream containing the content rendered to this page"""
+        contents = cos.Stream(filter=self.backend_document.flate_decode())
+        contents.write(self.canvas.getvalue())
+        contents.reset()                # compress all of the data now
+        return contents
+
+    def get_content(self):
+        """Return the content rendered to this page
+
+        Returns a tuple of the page's content stream, a mapping of the font
+        names used in the content stream to :class:`Font`\\ s, a mapping of
+        image numbers to :class:`Image`\\ s and the list of annotations. These
+        can be passed to :meth:`set_content` of a page in another document.
+
+        """
+        fonts_by_name = {'F{}'.format(font_number): font
+                         for font, (font_number, _)
+                         in self.backend_document.fonts.items()}
+        fonts = {font_name: fonts_by_name[font_name]
+                 for font_name in self.canvas.used_fonts()}
+        return (self.canvas.getvalue(), fonts, self.canvas.used_images(),
+                self.canvas.placed_annotations())
+
+    RE_RESOURCE = re.compile(rb'^/(F|Im)(\d+) (.* Tf|Do)$', re.MULTILINE)
+
+    def set_content(self, content, fonts, images, annotations):
+        """Replace the content of this page by content obtained from
+        :meth:`get_content`
+
+        The fonts and images are registered with this page's document, and the
+        references to them in `content` are renumbered accordingly.
+
+        """
+        backend_document = self.backend_document
+        canvas = self.canvas
+        canvas.clear()
+        font_names = {}
+        for font_name, font in fonts.items():
+            font_number, font_rsc = backend_document.register_font(font)
+            new_font_name = font_names[font_name] = 'F{}'.format(font_number)
+            canvas.fonts[new_font_name] = font_rsc
+        image_numbers = {}
+        for image_number, image in images.items():
+            new_image_number, image = backend_document.register_image(image)
+            image_numbers[str(image_number)] = str(new_image_number)
+            canvas.images[new_image_number] = image
+
+        def renumber(match):
+            kind, number, operator = match.groups()
+            if kind == b'F':
+                name = font_names['F' + number.decode('ascii')]
+            else:
+                name = 'Im' + image_numbers[number.decode('ascii')]
+            return b'/' + name.encode('ascii') + b' ' + operator
+
+        canvas.write(self.RE_RESOURCE.sub(renumber, content))
+        canvas.annotations.extend(annotations)
+        for match in self.RE_SHOW_GLYPHS.finditer(content):
+            font = fonts['F' + match.group(1).decode('ascii')]
+            used_glyphs = backend_document.used_glyphs.get(font)
+            if used_glyphs is not None:
+                used_glyphs.update(glyph_codes(match.group(2)))
+
+    RE_SHOW_GLYPHS = re.compile(rb'^/F(\d+) [^\n]* Tf$.*?^\[([^\n]*)\] TJ$',
+                                re.MULTILINE | re.DOTALL)
+
+
+class Canvas(object):
+    """A display list of PDF content stream operators
+
+    The operators drawn on a canvas are stored as a list of byte strings.
+    Placing the canvas onto its parent canvas (:meth:`append`) only stores a
+    reference to it in the parent's list. The content stream is serialized by
+    :meth:`getvalue`, which walks the tree of placed canvases once. The fonts,
+    images and annotations used by the placed canvases are collected in the
+    same way (:meth:`used_fonts`, :meth:`used_images` and
+    :meth:`placed_annotations`).
+
+    """
 
-class Canvas(BytesIO):
     def __init__(self, clip=False):
-        super().__init__()
+        self.items = []
         self.fonts = {}
         self.images = {}
         self.annotations = []
 
+    def clear(self):
+        """Remove all content from this canvas"""
+        self.items.clear()
+        self.fonts.clear()
+        self.images.clear()
+        self.annotations.clear()
+
+    def discard(self):
+        """Remove all content from this canvas and the canvases placed onto
+        it"""
+        for canvas, _ in list(self._walk()):
+            canvas.clear()
+
+    def write(self, data):
+        self.items.append(data)
+
     def append(self, parent_canvas, left, top):
         with parent_canvas.save_state():
             parent_canvas.translate(left, top)
-            parent_canvas.write(self.getvalue())
-        self.propagate_annotations(parent_canvas, left, top)
-
-    def propagate_annotations(self, parent_canvas, left, top):
-        translated_annotations = (annotation_location + (left, top)
-                                  for annotation_location in self.annotations)
-        parent_canvas.fonts.update(self.fonts)
-        parent_canvas.images.update(self.images)
-        parent_canvas.annotations.extend(translated_annotations)
+            parent_canvas.items.append(PlacedCanvas(self, left, top))
+
+    def getvalue(self):
+        """Return the content stream of this canvas and the canvases placed
+        onto it"""
+        chunks = []
+        stack = [iter(self.items)]
+        while stack:
+            for item in stack[-1]:
+                if isinstance(item, PlacedCanvas):
+                    stack.append(iter(item.canvas.items))
+                    break
+                chunks.append(item)
+            else:
+                stack.pop()
+        return b''.join(chunks)
+
+    def _walk(self):
+        """Yield this canvas and the canvases placed onto it (depth-first),
+        each along with the offsets of the canvases that contain it, starting
+        from the innermost one"""
+        stack = [(self, ())]
+        while stack:
+            canvas, offsets = stack.pop()
+            yield canvas, offsets
+            stack.extend((placed.canvas, ((placed.left, placed.top), )
+                                         + offsets)
+                         for placed in reversed(canvas.items)
+                         if isinstance(placed, PlacedCanvas))
+
+    def used_fonts(self):
+        """The fonts used by this canvas and the canvases placed onto it,
+        mapped by font name"""
+        fonts = {}
+        for canvas, _ in self._walk():
+            fonts.update(canvas.fonts)
+        return fonts
+
+    def used_images(self):
+        """The images placed on this canvas and the canvases placed onto it,
+        mapped by image number"""
+        images = {}
+        for canvas, _ in self._walk():
+            images.update(canvas.images)
+        return images
+
+    def placed_annotations(self):
+        """The annotations on this canvas and the canvases placed onto it,
+        translated to this canvas' coordinates"""
+        annotations = []
+        for canvas, offsets in self._walk():
+            for annotation_location in canvas.annotations:
+                for offset in offsets:
+                    annotation_location += offset
+                annotations.append(annotation_location)
+        return annotations
 
     def print(self, string):
         self.write(string.encode('ascii') + b'\n')
@@ -249,7 +522,9 @@ class Canvas(BytesIO):
         font = span.font(container)
         size = span.height(container)
         color = span.get_style('font_color', container)
-        font_name, font_rsc = self.register_font(container.document, font)
+        document = container.document
+        font_name, font_rsc = self.register_font(document, font)
+        used_glyphs = document.backend_document.used_glyphs.get(font)
         string = ''
         current_string = ''
         total_width = 0
@@ -262,6 +537,7 @@ class Canvas(BytesIO):
                 char = CODE_TO_CHAR[code]
             else:
                 code = glyph.code
+                used_glyphs.add(code)
                 high, low = code >> 8, code & 0xFF
                 char = CODE_TO_CHAR[high] + CODE_TO_CHAR[low]
             adjust = int(glyph.width - displ)
@@ -289,7 +565,7 @@ class Canvas(BytesIO):
 
     def place_image(self, image, left, top, document,
                     scale_width=1, scale_height=1, rotate=0):
-        image_number = document.backend_document.get_unique_image_number()
+        image_number, image = document.backend_document.register_image(image)
         self.images[image_number] = image
         rad = math.radians(rotate)
         sine, cosine = abs(math.sin(rad)), abs(math.cos(rad))
@@ -318,12 +594,12 @@ class PageCanvas(Canvas):
 
     def place_annotations(self):
         # fonts
-        for font_name, font_rsc in self.fonts.items():
+        for font_name, font_rsc in self.used_fonts().items():
             self.backend_page.add_font_resource(font_name, font_rsc)
 
         # images
         resources = self.backend_page.cos_page['Resources']
-        for image_number, image in self.images.items():
+        for image_number, image in self.used_images().items():
             xobjects = resources.setdefault('XObject', cos.Dictionary())
             xobjects['Im{}'.format(image_number)] = image.xobject
 
@@ -332,7 +608,7 @@ class PageCanvas(Canvas):
         cos_document = self.backend_page.backend_document.cos_document
         cos_page = self.backend_page.cos_page
         annots = cos_page.setdefault('Annots', cos.Array())
-        for annotation_location in self.annotations:
+        for annotation_location in self.placed_annotations():
             annotation = annotation_location.annotation
             left = annotation_location.left
             top = page_height - annotation_location.top
@@ -359,6 +635,9 @@ class PageCanvas(Canvas):
             annots.append(annot)
 
 
+PlacedCanvas = namedtuple('PlacedCanvas', 'canvas left top')
+
+
 class AnnotationLocation(object):
     def __init__(self, annotation, left, top, width, height):
         self.annotation = annotation
@@ -375,10 +654,13 @@ class AnnotationLocation(object):
 
 class Image(object):
     def __init__(self, filename_or_file):
+        self.filename = (filename_or_file if isinstance(filename_or_file, str)
+                         else None)
         try:
             file_position = filename_or_file.tell()
         except AttributeError:
             file_position = None
+        self.digest = self._digest(filename_or_file, file_position)
         for Reader in (PDFPageReader, PNGReader, JPEGReader):
             try:
                 self.xobject = Reader(filename_or_file)
@@ -404,6 +686,17 @@ class Image(object):
     def dpi(self):
         return self.xobject.dpi
 
+    @staticmethod
+    def _digest(filename_or_file, file_position):
+        """Hash of the image file's contents, identifying identical images"""
+        if file_position is None:
+            with open(filename_or_file, 'rb') as file:
+                return hashlib.sha1(file.read()).digest()
+        try:
+            return hashlib.sha1(filename_or_file.read()).digest()
+        finally:
+            filename_or_file.seek(file_position)
+
     def _convert_to_png(self, filename_or_file):
         from PIL import Image as PILImage
         png_image = BytesIO()
@@ -416,6 +709,24 @@ class Image(object):
         return png_image
 
 
+RE_STRING = re.compile(rb'\(((?:\\.|[^\\)])*)\)')
+RE_ESCAPE = re.compile(rb'\\([0-7]{3}|.)', re.DOTALL)
+
+
+def glyph_codes(text_array):
+    """Return the two-byte codes in the strings of the array of a TJ operator
+    written by :meth:`Canvas.show_glyphs`"""
+    def unescape(match):
+        escaped = match.group(1)
+        return bytes([int(escaped, 8)]) if len(escaped) == 3 else escaped
+
+    codes = set()
+    for string in RE_STRING.findall(text_array):
+        string = RE_ESCAPE.sub(unescape, string)
+        codes.update(struct.unpack('>{}H'.format(len(string) // 2), string))
+    return codes
+
+
 CODE_TO_CHAR = {}
 
 
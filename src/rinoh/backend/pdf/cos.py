@@ -56,6 +56,10 @@ class Object(object):
     def direct_bytes(self, document):
         return self.PREFIX + self._bytes(document) + self.POSTFIX
 
+    def write_direct(self, file, document):
+        """Write the direct representation of this object to `file`"""
+        file.write(self.direct_bytes(document))
+
     def _bytes(self, document):
         raise NotImplementedError
 
@@ -372,7 +376,7 @@ class Dictionary(Container, OrderedDict):
             yield item.object
 
 
-from .filter import PassThrough, FilterPipeline
+from .filter import PassThrough, FilterPipeline, FlateDecode
 
 
 class Stream(Dictionary):
@@ -387,7 +391,14 @@ class Stream(Dictionary):
         self._coder = None
 
     def direct_bytes(self, document):
-        out = bytearray()
+        out = BytesIO()
+        self.write_direct(out, document)
+        return out.getvalue()
+
+    def write_direct(self, file, document):
+        """Write the stream dictionary followed by the stream's data to `file`
+
+        The data is passed to `file` as a buffer, without copying it."""
         self.reset()
         if not isinstance(self.filter, PassThrough):
             self['Filter'] = self.filter.name
@@ -397,11 +408,11 @@ class Stream(Dictionary):
             self['Length'].delete(document)
         assert self._data.tell() == self._data.seek(0, SEEK_END)
         self['Length'] = Integer(self._data.tell())
-        out += super().direct_bytes(document)
-        out += b'\nstream\n'
-        out += self._data.getvalue()
-        out += b'\nendstream'
-        return out
+        file.write(super().direct_bytes(document))
+        file.write(b'\nstream\n')
+        with self._data.getbuffer() as data:
+            file.write(data)
+        file.write(b'\nendstream')
 
     def read(self, n=-1):
         try:
@@ -440,16 +451,15 @@ class ObjectStream(Stream):
             object_reader = self._object_reader
             offsets = self._offsets
         except AttributeError:
-            decompressed_data = BytesIO(self.read())
             from .reader import PDFObjectReader
-            object_reader = PDFObjectReader(decompressed_data, document)
+            object_reader = PDFObjectReader(self.read(), document)
             offsets = self._offsets = {}
             for i in range(self['N']):
                 object_number = int(object_reader.read_number())
                 offset = int(self['First'] + object_reader.read_number())
                 offsets[i] = offset
             self._object_reader = object_reader
-        object_reader.file.seek(offsets[index])
+        object_reader.position = offsets[index]
         return object_reader.next_item(indirect=True)
 
 
@@ -458,7 +468,7 @@ class Document(dict):
     PRODUCER = 'rinohtype v{} PDF backend ({})'.format(__version__,
                                                        __release_date__)
 
-    def __init__(self, creator):
+    def __init__(self, creator, object_streams=False):
         self.catalog = Catalog()
         self.catalog['PageLabels'] = Dictionary(indirect=True)
         self.catalog['PageLabels']['Nums'] = Array()
@@ -470,6 +480,10 @@ class Document(dict):
         self.id = None
         self.dests = {}
         self._by_object_id = {}
+        self._max_identifier = 0
+        self.object_streams = object_streams
+        self._file = None           # the file objects were written to early
+        self._written = {}          # object number -> address in self._file
 
     def get_page(self, index):
         for i, page in enumerate(self.catalog['Pages'].pages):
@@ -481,7 +495,8 @@ class Document(dict):
         try:
             reference = self._by_object_id[id(obj)]
         except KeyError:
-            identifier, generation = self.max_identifier + 1, 0
+            self._max_identifier += 1
+            identifier, generation = self._max_identifier, 0
             reference = Reference(self, identifier, generation)
             self._by_object_id[id(obj)] = reference
             self[identifier] = obj
@@ -489,25 +504,162 @@ class Document(dict):
 
     @property
     def max_identifier(self):
-        try:
-            identifier = max(self.keys())
-        except ValueError:
-            identifier = 0
-        return identifier
+        """The highest object number assigned so far
+
+        Object numbers are never reused, not even when objects are deleted."""
+        return self._max_identifier
+
+    def write_object(self, obj, file):
+        """Write out indirect object `obj` to `file` right away
+
+        The file header is written before the first object. :meth:`write`
+        needs to be passed the same file; it writes out the remaining objects
+        and lists the objects written earlier in the cross-reference table.
+        The data of a :class:`Stream` is discarded once it is written, so
+        `obj` should not change afterwards."""
+        if self._file is None:
+            self._file = file
+            self._write_header(file)
+        elif file is not self._file:
+            raise ValueError('Objects were written to another file already')
+        reference = self.register(obj)
+        self._written[reference.identifier] = file.tell()
+        self._write_object(file, reference.identifier, obj)
+        if isinstance(obj, Stream):
+            obj.close()
+
+    FREE_XREF_ENTRY = b'0000000000 65535 f \n'
+
+    def _write_objects(self, file):
+        """Write out all indirect objects and return the corresponding
+        cross-reference table entries
+
+        Objects registered while writing out other objects are included."""
+        xref_entries = [self.FREE_XREF_ENTRY]
+        identifier = 1
+        while identifier <= self._max_identifier:
+            if identifier in self._written:
+                xref_entries.append('{:010d} {:05d} n \n'
+                                    .format(self._written[identifier], 0)
+                                    .encode('utf_8'))
+            elif identifier in self:
+                obj = self[identifier]
+                xref_entries.append('{:010d} {:05d} n \n'
+                                    .format(file.tell(), 0).encode('utf_8'))
+                self._write_object(file, identifier, obj)
+            else:
+                xref_entries.append(self.FREE_XREF_ENTRY)
+            identifier += 1
+        return xref_entries
 
-    def _write_xref_table(self, file, addresses):
-        def out(string):
-            file.write(string + b'\n')
+    def _write_header(self, file):
+        file.write('%PDF-{}\n'.format(PDF_VERSION).encode('utf_8'))
+        file.write(b'%\xDC\xE1\xD8\xB7\n')
 
-        out(b'xref')
-        out('0 {}'.format(self.max_identifier + 1).encode('utf_8'))
-        out(b'0000000000 65535 f ')
-        for identifier in range(1, self.max_identifier + 1):
-            try:
-                address = addresses[identifier]
-                out('{:010d} {:05d} n '.format(address, 0).encode('utf_8'))
-            except KeyError:
-                out(b'0000000000 65535 f ')
+    def _write_xref_table(self, file, xref_entries):
+        file.write(b'xref\n')
+        file.write('0 {}\n'.format(len(xref_entries)).encode('utf_8'))
+        file.write(b''.join(xref_entries))
+
+    OBJECTS_PER_STREAM = 100
+
+    def _write_object(self, file, identifier, obj):
+        file.write('{} 0 obj\n'.format(identifier).encode('utf_8'))
+        obj.write_direct(file, self)
+        file.write(b'\nendobj\n')
+
+    def _write_compressed_objects(self, file):
+        """Write out all indirect objects, packing those that are not streams
+        into object streams (PDF 1.5)
+
+        Returns:
+            dict: the cross-reference stream fields (type, field 2, field 3)
+                for each of the written objects, by object number
+
+        """
+        xref_fields = {}
+        object_streams = set()
+        object_stream = None
+        packed = []
+
+        def write_object_stream():
+            header, offset = [], 0
+            for identifier, obj_bytes in packed:
+                header.append('{} {}'.format(identifier, offset))
+                offset += len(obj_bytes) + 1
+            header_bytes = ' '.join(header).encode('utf_8') + b'\n'
+            object_stream['N'] = Integer(len(packed))
+            object_stream['First'] = Integer(len(header_bytes))
+            object_stream.write(header_bytes)
+            for _, obj_bytes in packed:
+                object_stream.write(obj_bytes)
+                object_stream.write(b'\n')
+            reference = self._by_object_id[id(object_stream)]
+            xref_fields[reference.identifier] = 1, file.tell(), 0
+            self._write_object(file, reference.identifier, object_stream)
+            packed.clear()
+
+        identifier = 1
+        while identifier <= self._max_identifier:
+            if identifier in self._written:
+                xref_fields[identifier] = 1, self._written[identifier], 0
+            elif identifier in self and identifier not in object_streams:
+                obj = self[identifier]
+                if isinstance(obj, Stream):
+                    xref_fields[identifier] = 1, file.tell(), 0
+                    self._write_object(file, identifier, obj)
+                else:
+                    if object_stream is None:
+                        object_stream = ObjectStream(filter=FlateDecode())
+                        object_stream_identifier = \
+                            self.register(object_stream).identifier
+                        object_streams.add(object_stream_identifier)
+                    xref_fields[identifier] = (2, object_stream_identifier,
+                                               len(packed))
+                    packed.append((identifier, obj.direct_bytes(self)))
+                    if len(packed) == self.OBJECTS_PER_STREAM:
+                        write_object_stream()
+                        object_stream = None
+            identifier += 1
+        if packed:
+            write_object_stream()
+        return xref_fields
+
+    def _write_xref_stream(self, file, xref_fields):
+        """Write a cross-reference stream (PDF 1.5) for the objects listed in
+        `xref_fields` and return its address"""
+        xref_stream = XRefStream(filter=FlateDecode())
+        identifier = self.register(xref_stream).identifier
+        address = file.tell()
+        xref_fields[identifier] = 1, address, 0
+        rows = [xref_fields.get(number, (0, 0, 0))
+                for number in range(self._max_identifier + 1)]
+        rows[0] = 0, 0, 65535
+        widths = [max(1, (max(column).bit_length() + 7) // 8)
+                  for column in zip(*rows)]
+        self._set_trailer_entries(xref_stream, len(rows), file)
+        xref_stream['W'] = Array(Integer(width) for width in widths)
+        xref_stream.write(b''.join(value.to_bytes(width, 'big')
+                                   for row in rows
+                                   for value, width in zip(row, widths)))
+        self._write_object(file, identifier, xref_stream)
+        return address
+
+    def _set_trailer_entries(self, trailer, size, file):
+        trailer['Size'] = Integer(size)
+        trailer['Root'] = self.catalog
+        trailer['Info'] = self.info
+        md5sum = hashlib.md5()
+        md5sum.update(str(self.timestamp).encode())
+        md5sum.update(str(file.tell()).encode())
+        for value in self.info.values():
+            md5sum.update(value._bytes(self))
+        new_id = HexString(md5sum.digest())
+        if self.id:
+            self.id[1] = new_id
+        else:
+            self.id = Array([new_id, new_id])
+        trailer['ID'] = self.id
 
     def set_info(self, field, string):
         assert field in ('Creator', 'Producer',
@@ -531,6 +683,8 @@ class Document(dict):
         def out(string):
             file.write(string + b'\n')
 
+        if self._file is not None and file_or_filename is not self._file:
+            raise ValueError('Objects were written to another file already')
         try:
             file = open(file_or_filename, 'wb')
             close_file = True
@@ -545,36 +699,19 @@ class Document(dict):
             self.info['ModDate'].delete(self)
         self.info['ModDate'] = Date(self.timestamp)
 
-        out('%PDF-{}'.format(PDF_VERSION).encode('utf_8'))
-        file.write(b'%\xDC\xE1\xD8\xB7\n')
-        # write out indirect objects
-        addresses = {}
-        for identifier in range(1, self.max_identifier + 1):
-            if identifier in self:
-                obj = self[identifier]
-                addresses[identifier] = file.tell()
-                out('{} 0 obj'.format(identifier).encode('utf_8'))
-                out(obj.direct_bytes(self))
-                out(b'endobj')
-        xref_table_address = file.tell()
-        self._write_xref_table(file, addresses)
-        out(b'trailer')
-        trailer = Dictionary()
-        trailer['Size'] = Integer(self.max_identifier + 1)
-        trailer['Root'] = self.catalog
-        trailer['Info'] = self.info
-        md5sum = hashlib.md5()
-        md5sum.update(str(self.timestamp).encode())
-        md5sum.update(str(file.tell()).encode())
-        for value in self.info.values():
-            md5sum.update(value._bytes(self))
-        new_id = HexString(md5sum.digest())
-        if self.id:
-            self.id[1] = new_id
+        if self._file is None:
+            self._write_header(file)
+        if self.object_streams:
+            xref_fields = self._write_compressed_objects(file)
+            xref_table_address = self._write_xref_stream(file, xref_fields)
         else:
-            self.id = Array([new_id, new_id])
-        trailer['ID'] = self.id
-        out(trailer.bytes(self))
+            xref_entries = self._write_objects(file)
+            xref_table_address = file.tell()
+            self._write_xref_table(file, xref_entries)
+            out(b'trailer')
+            trailer = Dictionary()
+            self._set_trailer_entries(trailer, len(xref_entries), file)
+            out(trailer.bytes(self))
         out(b'startxref')
         out(str(xref_table_address).encode('utf_8'))
         out(b'%%EOF')
@@ -6,13 +6,19 @@
 # Public License v3. See the LICENSE file or http://www.gnu.org/licenses/.
 
 
-import struct, time
+import mmap
+import os
+import re
+import struct
+import time
 
 from binascii import unhexlify
-from io import SEEK_CUR, SEEK_END
+from bisect import bisect_right
+from functools import lru_cache
+from io import UnsupportedOperation
 from pathlib import Path
 
-from ...util import all_subclasses
+from ...util import all_subclasses, cached_property
 from . import cos
 from .filter import Filter
 from .xobject import XObjectForm
@@ -26,60 +32,91 @@ for cls in all_subclasses(cos.Dictionary):
 FILTER_SUBCLASSES = {cls.name: cls for cls in all_subclasses(Filter)}
 
 
+WHITESPACE = b'[' + re.escape(cos.WHITESPACE) + b']'
+REGULAR = b'[^' + re.escape(cos.WHITESPACE + cos.DELIMITERS) + b']'
+
+RE_WHITESPACE = re.compile(WHITESPACE + b'*')
+RE_REGULAR = re.compile(REGULAR + b'+')
+# a token, preceded by whitespace and comments
+RE_TOKEN = re.compile(b'(?:' + WHITESPACE + b'|%[^\r\n]*)*'
+                      b'(<<|>>|[' + re.escape(cos.DELIMITERS) + b']|'
+                      + REGULAR + b'*)')
+RE_REFERENCE = re.compile(WHITESPACE + b'+([0-9]+)' + WHITESPACE
+                          + b'+R(?!' + REGULAR + b')')
+RE_NUMBER = re.compile(rb'[+\-.0-9]*')
+RE_LINE = re.compile(rb'[^\r\n]*(?:\r\n|\r|\n)?')
+RE_NAME_ESCAPE = re.compile(rb'#([0-9A-Fa-f]{2})')
+RE_STRING_SPECIAL = re.compile(rb'[()\\]')
+RE_STRING_OCTAL = re.compile(rb'[0-7]{1,3}')
+
+STRING_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b',
+                  b'f': b'\f', b'(': b'(', b')': b')', b'\\': b'\\',
+                  b'\n': b'', b'\r': b''}
+
+
+def read_buffer(file_or_filename):
+    """Return the file object and the contents of the PDF data in
+    `file_or_filename`
+
+    `file_or_filename` can be a filename, a file object or a bytes object.
+    The contents of a file on disk are memory-mapped instead of read into
+    memory. The file object is `None` for a bytes object."""
+    if isinstance(file_or_filename, (bytes, bytearray)):
+        return None, file_or_filename
+    try:
+        file = Path(file_or_filename).open('rb')
+    except TypeError:
+        file = file_or_filename
+    try:
+        return file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, UnsupportedOperation, OSError, ValueError):
+        pass    # not backed by a file on disk, or an empty file
+    try:
+        return file, file.getvalue()
+    except AttributeError:
+        position = file.tell()
+        file.seek(0)
+        data = file.read()
+        file.seek(position)
+        return file, data
+
 
 class PDFObjectReader(object):
+    """Reads COS objects from PDF data
+
+    The data is accessed as a buffer, tracking the current position in
+    :attr:`position`. This is initialized to the position of the file object,
+    if any.
+
+    Args:
+        file_or_filename: see :func:`read_buffer`
+        document (cos.Document): the document indirect references refer to
+
+    """
+
     def __init__(self, file_or_filename, document=None):
-        try:
-            filename = Path(file_or_filename)
-            self.file = filename.open('rb')
-        except TypeError:
-            self.file = file_or_filename
+        self.file, self.data = read_buffer(file_or_filename)
+        self.position = self.file.tell() if self.file else 0
         self.document = document or self
 
     def jump_to_next_line(self):
-        while True:
-            char = self.file.read(1)
-            if char == b'\n':
-                break
-            elif char == b'\r':
-                next_char = self.file.read(1)
-                if next_char != b'\n':
-                    self.file.seek(-1, SEEK_CUR)
-                break
+        self.position = RE_LINE.match(self.data, self.position).end()
 
     def eat_whitespace(self):
-        while True:
-            char = self.file.read(1)
-            if char == b'':
-                break
-            if char not in cos.WHITESPACE:
-                self.file.seek(-1, SEEK_CUR)
-                break
+        self.position = RE_WHITESPACE.match(self.data, self.position).end()
 
     def next_token(self):
-        token = self.file.read(1)
-        if token in (cos.HexString.PREFIX, cos.HexString.POSTFIX):
-            # check for dict begin/end
-            char = self.file.read(1)
-            if char == token:
-                token += char
-            else:
-                self.file.seek(-1, SEEK_CUR)
-        elif token in cos.DELIMITERS + cos.WHITESPACE:
-            pass
-        else:
-            while True:
-                char = self.file.read(1)
-                if char in cos.DELIMITERS + cos.WHITESPACE:
-                    self.file.seek(-1, SEEK_CUR)
-                    break
-                token += char
-        return token
+        """Skip whitespace and return the next token, which is empty at the
+        end of the data"""
+        match = RE_TOKEN.match(self.data, self.position)
+        self.position = match.end()
+        return match.group(1)
 
     def next_item(self, indirect=False):
-        self.eat_whitespace()
-        restore_pos = self.file.tell()
-        token = self.next_token()
+        return self.read_item(self.next_token(), indirect)
+
+    def read_item(self, token, indirect=False):
+        """Read the item starting with `token`"""
         if token == cos.String.PREFIX:
             item = self.read_string(indirect)
         elif token == cos.HexString.PREFIX:
@@ -98,65 +135,54 @@ class PDFObjectReader(object):
             item = cos.Null(indirect=indirect)
         else:
             # number or indirect reference
-            self.file.seek(restore_pos)
-            item = self.read_number(indirect)
-            restore_pos = self.file.tell()
+            item = self.parse_number(token, indirect)
             if isinstance(item, cos.Integer):
-                try:
-                    generation = self.read_number()
-                    self.eat_whitespace()
-                    r = self.next_token()
-                    if isinstance(generation, cos.Integer) and r == b'R':
-                        item = cos.Reference(self.document, int(item),
-                                             int(generation))
-                    else:
-                        raise ValueError
-                except ValueError:
-                    self.file.seek(restore_pos)
+                match = RE_REFERENCE.match(self.data, self.position)
+                if match:
+                    item = cos.Reference(self.document, int(item),
+                                         int(match.group(1)))
+                    self.position = match.end()
         return item
 
     def peek(self, length=50):
-        restore_pos = self.file.tell()
-        print(self.file.read(length))
-        self.file.seek(restore_pos)
+        print(bytes(self.data[self.position:self.position + length]))
 
     # TODO: move reader function outside to simplify unit testing
     def read_array(self, indirect=False):
         array = cos.Array(indirect=indirect)
         while True:
-            self.eat_whitespace()
-            token = self.file.read(1)
+            token = self.next_token()
             if token == cos.Array.POSTFIX:
                 break
-            self.file.seek(-1, SEEK_CUR)
-            item = self.next_item()
-            array.append(item)
+            elif not token:
+                raise ValueError('Unterminated array')
+            array.append(self.read_item(token))
         return array
 
     def read_name(self, indirect=False):
-        name = b''
-        while True:
-            char = self.file.read(1)
-            if char in cos.DELIMITERS + cos.WHITESPACE:
-                self.file.seek(-1, SEEK_CUR)
-                break
-            elif char == b'#':
-                char_code = self.file.read(2)
-                char = chr(int(char_code.decode('ascii'), 16)).encode('ascii')
-            name += char
+        match = RE_REGULAR.match(self.data, self.position)
+        if match:
+            name = match.group()
+            self.position = match.end()
+            if b'#' in name:
+                name = RE_NAME_ESCAPE.sub(lambda match:
+                                          bytes([int(match.group(1), 16)]),
+                                          name)
+        else:
+            name = b''
         return cos.Name(name, indirect=indirect)
 
     def read_dictionary_or_stream(self, indirect=False):
         dictionary = cos.Dictionary(indirect=indirect)
         while True:
-            self.eat_whitespace()
             token = self.next_token()
             if token == cos.Dictionary.POSTFIX:
                 break
+            elif token != cos.Name.PREFIX:
+                raise ValueError('Expecting a name as dictionary key')
             key, value = self.read_name(), self.next_item()
             dictionary[key] = value
-        self.eat_whitespace()
-        dict_pos = self.file.tell()
+        dict_pos = self.position
         if self.next_token() == b'stream':
             self.jump_to_next_line()
             length = int(dictionary['Length'])
@@ -186,13 +212,14 @@ class PDFObjectReader(object):
             else:
                 stream_filter = None
             stream = cos.Stream(stream_filter)
-            stream.update(dictionary)
-            stream._data.write(self.file.read(length))
-            self.eat_whitespace()
+            stream.update(dict.items(dictionary))  # keep references as-is
+            end = self.position + length
+            stream._data.write(self.data[self.position:end])
+            self.position = end
             assert self.next_token() == b'endstream'
             dictionary = stream
         else:
-            self.file.seek(dict_pos)
+            self.position = dict_pos
         # try to map to specific Dictionary sub-class
         type = dictionary.get('Type', None)
         subtype = dictionary.get('Subtype', None)
@@ -201,68 +228,60 @@ class PDFObjectReader(object):
             dictionary.__class__ = DICTIONARY_SUBCLASSES[key]
         return dictionary
 
-    escape_chars = b'nrtbf()\\'
-
     def read_string(self, indirect=False):
-        string = b''
-        escape = False
-        parenthesis_level = 0   # TODO: is currently not used
+        data = self.data
+        position = self.position
+        parts = []
+        parenthesis_level = 0
         while True:
-            char = self.file.read(1)
-            if escape:
-                if char in self.escape_chars:
-                    string += char
-                elif char == b'\n':
-                    pass
-                elif char == b'\r' and self.file.read(1) != '\n':
-                    self.file.seek(-1, SEEK_CUR)
-                elif char.isdigit():
-                    for i in range(2):
-                        extra = self.file.read(1)
-                        if extra.isdigit():
-                            char += extra
-                        else:
-                            self.file.seek(-1, SEEK_CUR)
-                            break
-                    string += struct.pack('B', int(char, 8))
-                else:
-                    string += b'\\' + char
-                escape = False
-            elif char == b'\\':
-                escape = True
+            match = RE_STRING_SPECIAL.search(data, position)
+            if match is None:
+                raise ValueError('Unterminated string')
+            special_position = match.start()
+            parts.append(data[position:special_position])
+            char = match.group()
+            position = special_position + 1
+            if char == b'\\':
+                octal = RE_STRING_OCTAL.match(data, position)
+                if octal:
+                    parts.append(bytes([int(octal.group(), 8) & 0xFF]))
+                    position = octal.end()
+                    continue
+                escaped = data[position:position + 1]
+                position += 1
+                if escaped == b'\r' and data[position:position + 1] == b'\n':
+                    position += 1
+                parts.append(STRING_ESCAPES.get(escaped, escaped))
             elif char == b'(':
                 parenthesis_level += 1
-            elif char == b')' and parenthesis_level > 0:
+                parts.append(char)
+            elif parenthesis_level > 0:
                 parenthesis_level -= 1
-            elif char == cos.String.POSTFIX:
-                break
+                parts.append(char)
             else:
-                string += char
-        return cos.String(string, indirect=indirect)
+                break
+        self.position = position
+        return cos.String(b''.join(parts), indirect=indirect)
 
     def read_hex_string(self, indirect=False):
-        hex_string = b''
-        while True:
-            self.eat_whitespace()
-            char = self.file.read(1)
-            if char == cos.HexString.POSTFIX:
-                break
-            hex_string += char
+        end = self.data.find(cos.HexString.POSTFIX, self.position)
+        if end < 0:
+            raise ValueError('Unterminated hexadecimal string')
+        hex_string = bytes(self.data[self.position:end])
+        self.position = end + 1
+        hex_string = hex_string.translate(None, cos.WHITESPACE)
         if len(hex_string) % 2 > 0:
             hex_string += b'0'
         return cos.HexString(unhexlify(hex_string), indirect=indirect)
 
     def read_number(self, indirect=False):
         self.eat_whitespace()
-        number_string = b''
-        while True:
-            char = self.file.read(1)
-            if not char:
-                break
-            elif char not in b'+-.0123456789':
-                self.file.seek(-1, SEEK_CUR)
-                break
-            number_string += char
+        match = RE_NUMBER.match(self.data, self.position)
+        self.position = match.end()
+        return self.parse_number(match.group(), indirect)
+
+    @staticmethod
+    def parse_number(number_string, indirect=False):
         try:
             number = cos.Integer(number_string, indirect=indirect)
         except ValueError:
@@ -275,8 +294,7 @@ class PDFReader(PDFObjectReader, cos.Document):
 
     def __init__(self, file_or_filename):
         super().__init__(file_or_filename)
-        self.file.seek(0)
-        if self.file.read(len(self.PDF_SIGNATURE)) != self.PDF_SIGNATURE:
+        if self.data[:len(self.PDF_SIGNATURE)] != self.PDF_SIGNATURE:
             raise ValueError('Not a PDF file: missing %PDF signature')
         self.timestamp = time.time()
         self._by_object_id = {}
@@ -290,20 +308,60 @@ class PDFReader(PDFObjectReader, cos.Document):
         else:
             self.info = cos.Dictionary()
         self.id = trailer['ID'] if 'ID' in trailer else None
-        self._max_identifier_in_file = int(trailer['Size']) - 1
+        self._max_identifier = int(trailer['Size']) - 1
         self.catalog = trailer['Root']
-        self.dests = cos.Dictionary()
+        self._kid_offsets = {}     # page tree node ID -> kid page offsets
+
+    @cached_property
+    def dests(self):
+        """The named destinations, collected on first access"""
+        dests = cos.Dictionary()
         try:
             dests_names = iter(self.catalog['Names']['Dests']['Names'])
             for name in dests_names:
                 dest = next(dests_names)
-                self.dests[name] = dest
+                dests[name] = dest
         except KeyError:
             pass
+        return dests
 
-    @property
-    def max_identifier(self):
-        return max(super().max_identifier, self._max_identifier_in_file)
+    def get_page(self, index):
+        """Return the page with (zero-based) `index`
+
+        The page tree is descended from the root, using the page counts of
+        the nodes to select the kid containing the page. Only the kids of the
+        page tree nodes on this path are read. The offsets of these kids are
+        stored, so that looking up another page below the same nodes doesn't
+        require reading these again.
+
+        Raises:
+            IndexError: if there is no page with this index
+
+        """
+        node = self.catalog['Pages']
+        offset = 0
+        while 'Kids' in node:
+            offsets = self._get_kid_offsets(node)
+            if not offsets[0] <= index - offset < offsets[-1]:
+                raise IndexError('Page index out of range: {}'.format(index))
+            kid_index = bisect_right(offsets, index - offset) - 1
+            offset += offsets[kid_index]
+            node = node['Kids'][kid_index]
+        return node
+
+    def _get_kid_offsets(self, node):
+        """Return the index of the first page below each of the kids of page
+        tree `node`, relative to `node`, followed by the number of pages below
+        `node`"""
+        try:
+            return self._kid_offsets[id(node)]
+        except KeyError:
+            offsets = [0]
+            for kid in node['Kids']:
+                count = int(kid.object['Count']) if 'Kids' in kid.object else 1
+                offsets.append(offsets[-1] + count)
+            self._kid_offsets[id(node)] = offsets
+            return offsets
 
     def __getitem__(self, identifier):
         try:
@@ -329,32 +387,29 @@ class PDFReader(PDFObjectReader, cos.Document):
 ##ignored and considered missing.
 
     def parse_indirect_object(self, address):
-        # save file state
-        restore_pos = self.file.tell()
-        self.file.seek(address)
+        restore_pos = self.position
+        self.position = int(address)
         identifier = int(self.read_number())
         generation = int(self.read_number())
-        self.eat_whitespace()
         assert self.next_token() == b'obj'
-        self.eat_whitespace()
         obj = self.next_item(indirect=True)
         reference = cos.Reference(self, identifier, generation)
         self._by_object_id[id(obj)] = reference
-        self.eat_whitespace()
         assert self.next_token() == b'endobj'
-        self.file.seek(restore_pos)
+        self.position = restore_pos
         return identifier, obj
 
     def parse_xref_table(self, offset):
         xref = XRefTable(self)
-        self.file.seek(offset)
+        self.position = int(offset)
         assert self.next_token() == b'xref'
         while True:
             try:
                 first, total = int(self.read_number()), self.read_number()
                 self.jump_to_next_line()
                 for identifier in range(first, first + total):
-                    line = self.file.read(20)
+                    line = self.data[self.position:self.position + 20]
+                    self.position += 20
                     fields = identifier, int(line[:10]), int(line[11:16])
                     if line[17] == ord(b'n'):
                         xref[identifier] = IndirectObjectEntry(*fields)
@@ -388,24 +443,18 @@ class PDFReader(PDFObjectReader, cos.Document):
         if 'Index' in xref_stream:
             index = iter(int(value) for value in xref_stream['Index'])
         else:
-            index = (0, size)
+            index = iter((0, size))
         xref_stream.seek(0)
+        entries = decode_xref_stream(xref_stream.read(), widths)
         while True:
             try:
                 first, total = next(index), next(index)
             except StopIteration:
                 break
-            for identifier in range(first, first + total):
-                values = (xref_stream.read(width) for width in widths)
-                fields = [struct.unpack('>Q', value.rjust(8, b'\x00'))[0]
-                          for value in values]
-                if widths[0] == 0:
-                    field_type = 1
-                else:
-                    field_type = fields[0]
-                    fields = fields[1:]
+            for identifier, (field_type, field_2, field_3) \
+                    in zip(range(first, first + total), entries):
                 field_class = FIELD_CLASSES[field_type]
-                xref[identifier] = field_class(identifier, *fields)
+                xref[identifier] = field_class(identifier, field_2, field_3)
         assert identifier + 1 == size
         return xref, xref_stream
 
@@ -413,24 +462,20 @@ class PDFReader(PDFObjectReader, cos.Document):
     START_XREF = b'startxref'
 
     def find_xref_offset(self):
-        offset = self.file.seek(- len(self.EOF_MARKER), SEEK_END)
-        for i in range(10):
-            self.file.seek(offset)
-            if self.file.read(len(self.EOF_MARKER)) == self.EOF_MARKER:
-                break
-            offset -= 1
-        else:
+        """Return the offset of the last cross-reference section
+
+        The end-of-file marker needs to be present in the last 1024 bytes of
+        the file, as per the PDF specification's implementation notes."""
+        eof_offset = self.data.rfind(self.EOF_MARKER,
+                                     max(len(self.data) - 1024, 0))
+        if eof_offset < 0:
             raise ValueError('Not a PDF file: missing %%EOF')
-        offset -= len(self.START_XREF)
-        while True:
-            self.file.seek(offset)
-            value = self.file.read(len(self.START_XREF))
-            if value == self.START_XREF:
-                self.jump_to_next_line()
-                xref_offset = self.read_number()
-                break
-            offset -= 1
-        return int(xref_offset)
+        offset = self.data.rfind(self.START_XREF, 0, eof_offset)
+        if offset < 0:
+            raise ValueError('Not a PDF file: missing startxref')
+        self.position = offset + len(self.START_XREF)
+        self.jump_to_next_line()
+        return int(self.read_number())
 
     def iter_outlines(self, depth=float('+inf')):
         """Iterate over the outline entries up to a given depth
@@ -524,17 +569,126 @@ FIELD_CLASSES = {0: FreeObjectEntry,
                  2: CompressedObjectEntry}
 
 
+XREF_FIELD_FORMATS = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+XREF_FIELD_DEFAULTS = (1, 0, 0)
+
+
+def decode_xref_stream(data, widths):
+    """Iterate over the entries in the decoded data of a cross-reference
+    stream
+
+    Args:
+        data (bytes): the decoded cross-reference stream data
+        widths (list[int]): the width in bytes of each of the three fields
+            of an entry (the stream's /W entry)
+
+    Returns:
+        Iterator[(int, int, int)]: the fields of each entry, substituting
+            the default values for fields with a width of zero
+
+    """
+    entry_size = sum(widths)
+    data = data[:len(data) - len(data) % entry_size]
+    if all(width in XREF_FIELD_FORMATS for width in widths if width):
+        entry_format = ''.join(XREF_FIELD_FORMATS[width]
+                               for width in widths if width)
+        entries = struct.iter_unpack('>' + entry_format, data)
+    else:
+        spans, start = [], 0
+        for width in widths:
+            if width:
+                spans.append((start, start + width))
+            start += width
+        entries = (tuple(int.from_bytes(data[offset + start:offset + end],
+                                        'big')
+                         for start, end in spans)
+                   for offset in range(0, len(data), entry_size))
+    if all(widths):
+        return entries
+    return (tuple(next(fields) if width else default
+                  for width, default in zip(widths, XREF_FIELD_DEFAULTS))
+            for fields in map(iter, entries))
+
+
+READER_CACHE_SIZE = 16
+
+
+def get_reader(file_or_filename):
+    """Return a :class:`PDFReader` for `file_or_filename`
+
+    The readers for the most recently used files are cached, so that embedding
+    several pages of the same file parses it only once. Cached readers are
+    replaced when their file is modified. Readers for file objects are not
+    cached."""
+    try:
+        stat = os.stat(file_or_filename)
+    except TypeError:   # a file object
+        return PDFReader(file_or_filename)
+    return _cached_reader(os.path.realpath(file_or_filename),
+                          stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=READER_CACHE_SIZE)
+def _cached_reader(path, mtime, size):
+    return PDFReader(path)
+
+
+def inherited_attribute(page, key):
+    """Return the value for `key` in `page`, or the value inherited from its
+    ancestors in the page tree
+
+    Raises:
+        KeyError: if neither `page` nor its ancestors have a `key` entry
+
+    """
+    node = page
+    while key not in node:
+        if 'Parent' not in node:
+            raise KeyError(key)
+        node = node['Parent']
+    return node[key]
+
+
 class PDFPageReader(XObjectForm):
+    """Form XObject holding a copy of a page of a PDF file
+
+    Only the page's content stream is copied. The page's resources are
+    referenced from the output document; these and the objects referenced by
+    them are read from the PDF file only when they are written out.
+
+    Args:
+        file_or_filename: the PDF file (see :func:`get_reader`)
+        page_number (int): the (one-based) number of the page to copy
+
+    """
+
     def __init__(self, file_or_filename, page_number=1):
-        pdf_file = PDFReader(file_or_filename)
+        pdf_file = get_reader(file_or_filename)
         page = pdf_file.get_page(page_number - 1)
-        super().__init__(page['MediaBox'])
-        content_stream = page['Contents']
-        if 'Filter' in content_stream:
-            self['Filter'] = content_stream['Filter']
-        if 'Resources' in page:
-            self['Resources'] = page['Resources']
-        self.write(content_stream.getvalue())
+        super().__init__(inherited_attribute(page, 'MediaBox'))
+        contents = page['Contents']
+        if isinstance(contents, cos.Array):
+            content = b'\n'.join(self._decode(stream.object)
+                                 for stream in contents)
+        else:
+            for key in ('Filter', 'DecodeParms'):
+                if key in contents:
+                    self[key] = contents[key]
+            content = contents.getvalue()
+        try:
+            self['Resources'] = inherited_attribute(page, 'Resources')
+        except KeyError:
+            pass
+        self.write(content)
+
+    @staticmethod
+    def _decode(stream):
+        """Return the decoded data of `stream`"""
+        stream.reset()
+        try:
+            return stream.read()
+        finally:
+            stream.reset()
 
     @property
     def width(self):
@@ -23,11 +23,14 @@ Classes representing a document:
 from pathlib import Path
 
 import datetime
+import multiprocessing
+import os
 import pickle
-import sys
 import time
 
-from collections import OrderedDict
+from bisect import bisect_left
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
 from copy import copy
 from itertools import count
 
@@ -36,9 +39,11 @@ from .attribute import OptionSet
 from .backend import pdf
 from .flowable import StaticGroupedFlowables
 from .language import EN
+from .layoutcache import LayoutCache
 from .layout import (Container, ReflowRequired,
                      BACKGROUND, CONTENT, HEADER_FOOTER)
 from .number import format_number
+from .progress import ProgressBar, ProgressEvent
 from .strings import Strings
 from .style import StyleLog
 from .util import RefKeyDictionary
@@ -123,25 +128,12 @@ class Page(Container):
         return self
 
     def get_current_section(self, level):
-        current_section = None
-        for section in (section for section in self.document._sections
-                        if section.level == level):
-            if section.is_hidden(self):
-                continue
-            section_id = section.get_id(self.document)
-            try:
-                first_page = self.document.page_elements[section_id]
-            except KeyError:
-                break
-            if first_page.document_part is not self.document_part:
-                continue
-            elif first_page.number == self.number:
-                return section
-            elif first_page.number > self.number:
-                break
-            elif first_page.number <= self.number:
-                current_section = section
-        return current_section
+        section = self.document.page_elements.current_section(self, level)
+        page_record = self.document.page_record
+        if page_record:
+            section_id = section.get_id(self.document) if section else None
+            page_record.current_sections.setdefault(level, section_id)
+        return section
 
     @property
     def number_format(self):
@@ -196,6 +188,206 @@ class PartPageCount(object):
         return self
 
 
+class PageRecord(object):
+    """Records the inputs and side effects of rendering a sequence of pages
+
+    A record normally covers a single page. Pages replayed from the layout
+    cache (see :class:`LayoutCache`) are covered by a single record.
+
+    When rendering incrementally, the pages rendered in the previous rendering
+    pass are reused if their page numbers and the values they looked up
+    (page references, page counts, references, placed footnotes and floats)
+    are unchanged. Their side effects on the document are then replayed
+    instead of rendering the pages again.
+
+    Args:
+        pages (list[Page]): the rendered pages
+        new_chapter (bool): whether the first page starts a new chapter
+        chain_state: the state of the document part's chain before rendering
+            the first page (see :meth:`Chain.save_state`), or `None` if the
+            pages cannot be reused
+        position (tuple): the position of the document part's chain before
+            rendering the first page (see :func:`chain_position`), or `None`
+            if it is not stored in the layout cache
+
+    """
+
+    def __init__(self, pages, new_chapter, chain_state=None, position=None):
+        self.pages = pages
+        self.new_chapter = new_chapter
+        self.chain_state = chain_state
+        self.position = position
+        self.cached_run = None          # the CachedRun these pages came from
+        self.cacheable = True           # can be stored in the layout cache
+        self.break_type = None
+        self.continued = False          # the chain continues on the next page
+        self.lookups = {}               # (kind, key) -> value looked up
+        self.current_sections = {}      # section level -> current section ID
+        self.registered_ids = []        # (ID, page) for each placed element
+        self.floats = set()
+        self.placed_footnotes = set()
+        self.style_log_entries = []
+
+    @contextmanager
+    def recording(self, document):
+        """Record lookups and side effects while rendering this page"""
+        floats = set(document.floats)
+        placed_footnotes = set(document.placed_footnotes)
+        first_log_entry = len(document.style_log.entries)
+        document.page_record = self
+        try:
+            yield self
+        finally:
+            document.page_record = None
+        self.floats = document.floats - floats
+        self.placed_footnotes = document.placed_footnotes - placed_footnotes
+        self.style_log_entries = document.style_log.entries[first_log_entry:]
+        self.cacheable = all(entry.styled.layout_cacheable
+                             for entry in self.style_log_entries)
+
+    def is_reusable(self, page_number, document):
+        """Return `True` if rendering these pages starting from page
+        `page_number` would yield the same result as in the previous rendering
+        pass"""
+        if self.chain_state is None or self.pages[0].number != page_number:
+            return False
+        return all(document.lookup(kind, key) == value
+                   for (kind, key), value in self.lookups.items())
+
+    def replay(self, document):
+        """Apply the side effects of rendering these pages to `document`"""
+        for id, page in self.registered_ids:
+            document.page_elements[id] = page
+            document.page_references[id] = page.formatted_number
+        document.floats.update(self.floats)
+        document.placed_footnotes.update(self.placed_footnotes)
+        document.style_log.entries.extend(self.style_log_entries)
+
+
+class PageElements(dict):
+    """Maps the IDs of the placed document elements to the page they were
+    placed on
+
+    For each document part and section level, this also keeps an index of the
+    first pages of the placed sections, sorted by page number. This allows
+    looking up the current section for a page (:meth:`current_section`) in
+    logarithmic time.
+
+    Args:
+        document (Document): the document whose elements are mapped
+
+    """
+
+    def __init__(self, document):
+        super().__init__()
+        self.document = document
+        self._sections = {}     # section ID -> (document order, section)
+        self._index = {}        # (document part, level) -> (keys, sections)
+
+    def add_section(self, section):
+        """Include `section` in the index of first pages
+
+        Sections need to be added in document order."""
+        section_id = section.get_id(self.document)
+        self._sections[section_id] = len(self._sections), section
+
+    def __setitem__(self, id, page):
+        if id in self._sections:
+            if id in self:
+                self._unindex(id, self[id])
+            self._add_to_index(id, page)
+        super().__setitem__(id, page)
+
+    def update(self, *args, **kwargs):
+        for id, page in dict(*args, **kwargs).items():
+            self[id] = page
+
+    def clear(self):
+        super().clear()
+        self._index.clear()
+
+    def _add_to_index(self, id, page):
+        order, section = self._sections[id]
+        keys, sections = self._index.setdefault(
+            (page.document_part, section.level), ([], []))
+        key = page.number, order
+        index = bisect_left(keys, key)
+        keys.insert(index, key)
+        sections.insert(index, section)
+
+    def _unindex(self, id, page):
+        order, section = self._sections[id]
+        keys, sections = self._index[page.document_part, section.level]
+        index = bisect_left(keys, (page.number, order))
+        del keys[index]
+        del sections[index]
+
+    def current_section(self, page, level):
+        """Return the section at `level` that is current on `page`
+
+        This is the first section starting on `page`, or else the last
+        section starting on a preceding page of the same document part.
+        Hidden sections are skipped. Returns `None` if there is no such
+        section.
+
+        """
+        try:
+            keys, sections = self._index[page.document_part, level]
+        except KeyError:
+            return None
+        first = bisect_left(keys, (page.number, ))
+        for index in range(first, len(keys)):
+            if keys[index][0] != page.number:
+                break
+            if not sections[index].is_hidden(page):
+                return sections[index]
+        for index in reversed(range(first)):
+            if not sections[index].is_hidden(page):
+                return sections[index]
+        return None
+
+
+_worker_document = None      # the document rendered by a worker process
+
+
+def _init_render_worker(document):
+    global _worker_document
+    _worker_document = document
+    document.progress_reporters = []
+    document.style_log = StyleLog(document.stylesheet)
+    document.floats = set()
+    document.placed_footnotes = set()
+    document._rendering_pass = 1
+
+
+def _render_chapters(chapter_range):
+    return _worker_document._render_chapters(*chapter_range)
+
+
+# lookups of state that is reset at the start of each rendering pass; these
+# don't carry over to the next pass, so they are not checked for convergence
+PASS_LOOKUP_KINDS = ('footnote', 'float')
+
+
+class ChangedLookup(namedtuple('ChangedLookup',
+                               'kind key value current_value page')):
+    """A value looked up during a rendering pass that has changed since
+
+    Args:
+        kind (str): the kind of lookup (see :meth:`Document.lookup`)
+        key: identifies the looked-up value
+        value: the value looked up during the rendering pass
+        current_value: the value at the end of the rendering pass
+        page (str): the formatted number of the page that looked up the
+            value, or `None` if it was not looked up while rendering a page
+
+    """
+
+    def __str__(self):
+        location = ' on page {}'.format(self.page) if self.page else ''
+        return '{} {!r}{}: {!r} -> {!r}'.format(self.kind, self.key, location,
+                                                self.value, self.current_value)
+
 
 class Document(object):
     """Renders a document tree to pages
@@ -212,6 +404,9 @@ class Document(object):
     CREATOR = 'rinohtype v{} ({})'.format(__version__, __release_date__)
 
     CACHE_EXTENSION = '.rtc'
+    LAYOUT_CACHE_EXTENSION = '.rtl'
+
+    MAX_RENDERING_PASSES = 10
 
     # FIXME: get backend document metadata from Document metadata
     title = BackendDocumentMetadata('title')
@@ -220,8 +415,9 @@ class Document(object):
     keywords = BackendDocumentMetadata('keywords')
 
     def __init__(self, document_tree, stylesheet, language, strings=None,
-                 backend=None):
-        """`backend` specifies the backend to use for rendering the document."""
+                 backend=None, backend_options=None):
+        """`backend` specifies the backend to use for rendering the document.
+        `backend_options` are passed to the backend's document class."""
         super().__init__()
         self._print_version_and_license()
         self.front_matter = []
@@ -230,16 +426,21 @@ class Document(object):
         self.language = language
         self._strings = strings or Strings()
         self.backend = backend or pdf
-        self.backend_document = self.backend.Document(self.CREATOR)
-        self._flowables = list(id(element)
-                               for element in document_tree.elements)
+        self.backend_options = backend_options or {}
+        self.backend_document = self.backend.Document(self.CREATOR,
+                                                      **self.backend_options)
+        self._flowable_positions = {}   # id(flowable) -> index
+        for index, element in enumerate(document_tree.elements):
+            self._flowable_positions.setdefault(id(element), index)
+        self.progress_reporters = []
+        self._rendering_pass = 0
 
         self.metadata = dict(date=datetime.date.today())
         self.counters = {}             # counters for Headings, Figures, Tables
         self.elements = OrderedDict()  # mapping id's to flowables
         self.ids_by_element = RefKeyDictionary()    # mapping elements to id's
         self.references = {}           # mapping id's to reference data
-        self.page_elements = {}        # mapping id's to pages
+        self.page_elements = PageElements(self)   # mapping id's to pages
         self.page_references = {}      # mapping id's to page numbers
         self._sections = []
         self.index_entries = {}
@@ -247,6 +448,16 @@ class Document(object):
         self._glossary_first = {}
         self._unique_id = 0
         self.error = False
+        self.incremental = False
+        self.layout_cache = None
+        self.page_record = None        # records lookups for the current page
+        self._document_parts = {}
+        self._images = {}              # backend images by file (see get_image)
+        self._cached_results = {}      # see cached_result
+        self._lookup_records = []      # lookups recorded by cached_result
+        self._unrecorded_lookups = {}  # lookups made outside of page records
+        self.changed_lookups = []      # the ChangedLookups for each pass
+        self._output_file = None       # the file pages are streamed to
 
     def _print_version_and_license(self):
         print('rinohtype {} ({})  Copyright (c) Brecht Machiels'
@@ -265,6 +476,27 @@ to the terms of the GNU Affero General Public License version 3.''')
     def get_metadata(self, key):
         return copy(self.metadata.get(key))
 
+    def get_image(self, filename_or_file):
+        """Return the backend image for `filename_or_file`
+
+        Image files are loaded only once for all rendering passes, unless
+        they are modified. File objects are loaded on each call.
+
+        Raises:
+            OSError: if the image file cannot be opened
+
+        """
+        if not isinstance(filename_or_file, str):
+            return self.backend.Image(filename_or_file)
+        stat = os.stat(filename_or_file)
+        key = (os.path.realpath(filename_or_file), stat.st_mtime_ns,
+               stat.st_size)
+        try:
+            return self._images[key]
+        except KeyError:
+            image = self._images[key] = self.backend.Image(filename_or_file)
+            return image
+
     def register_element(self, element):
         primary_id = (element.get_id(self, create=False)
                       or self._get_unique_id())
@@ -278,14 +510,119 @@ to the terms of the GNU Affero General Public License version 3.''')
         for id in element.get_ids(self):
             self.page_elements[id] = page
             self.page_references[id] = page.formatted_number
+            if self.page_record:
+                self.page_record.registered_ids.append((id, page))
+
+    def get_page_reference(self, id):
+        """Return the formatted number of the page the element identified by
+        `id` was placed on in the current or the previous rendering pass
+
+        Raises:
+            KeyError: if no element with this ID has been placed yet
+
+        """
+        page_reference = self.page_references.get(id)
+        self._record_lookup('page reference', id, page_reference)
+        if page_reference is None:
+            raise KeyError(id)
+        return page_reference
+
+    def get_part_page_count(self, part_name):
+        """Return the number of pages the document part named `part_name`
+        counted in the previous rendering pass"""
+        try:
+            count = self.part_page_counts[part_name].count
+        except KeyError:
+            count = 0
+        self._record_lookup('part page count', part_name, count)
+        return count
 
     def set_reference(self, id, reference_type, value):
         id_references = self.references.setdefault(id, {})
         id_references[reference_type] = value
 
     def get_reference(self, id, reference_type):
+        key = id, reference_type
+        self._record_lookup('reference', key, self.lookup('reference', key))
         return self.references[id][reference_type]
 
+    def is_footnote_placed(self, id):
+        """Return `True` if the footnote identified by `id` has already been
+        placed on a page"""
+        placed = id in self.placed_footnotes
+        self._record_lookup('footnote', id, placed)
+        return placed
+
+    def is_float_placed(self, id):
+        """Return `True` if the float identified by `id` has already been
+        placed on a page"""
+        placed = id in self.floats
+        self._record_lookup('float', id, placed)
+        return placed
+
+    def _record_lookup(self, kind, key, value):
+        lookups = (self.page_record.lookups if self.page_record
+                   else self._unrecorded_lookups)
+        lookups.setdefault((kind, key), value)
+        for lookups in self._lookup_records:
+            lookups.setdefault((kind, key), value)
+
+    def cached_result(self, key, function, *args):
+        """Return the result of ``function(*args)``, cached under `key`
+
+        The result is reused in subsequent calls (also in later rendering
+        passes) as long as the values `function` looked up (page references,
+        references, placed footnotes and floats; see :meth:`lookup`) are
+        unchanged. These lookups are recorded again each time the cached
+        result is reused.
+
+        """
+        try:
+            lookups, result = self._cached_results[key]
+        except KeyError:
+            pass
+        else:
+            if all(self.lookup(kind, lookup_key) == value
+                   for (kind, lookup_key), value in lookups.items()):
+                for (kind, lookup_key), value in lookups.items():
+                    self._record_lookup(kind, lookup_key, value)
+                return result
+        lookups = {}
+        self._lookup_records.append(lookups)
+        try:
+            result = function(*args)
+        finally:
+            self._lookup_records.pop()
+        self._cached_results[key] = lookups, result
+        return result
+
+    def lookup(self, kind, key):
+        """Return the current value for a lookup recorded in a
+        :class:`PageRecord`
+
+        References are represented by their :func:`repr` so that they can be
+        compared with those stored in the layout cache.
+
+        """
+        if kind == 'page reference':
+            return self.page_references.get(key)
+        elif kind == 'part page count':
+            try:
+                return self.part_page_counts[key].count
+            except KeyError:
+                return 0
+        elif kind == 'reference':
+            id, reference_type = key
+            try:
+                return repr(self.references[id][reference_type])
+            except KeyError:
+                return None
+        elif kind == 'footnote':
+            return key in self.placed_footnotes
+        elif kind == 'float':
+            return key in self.floats
+        raise ValueError("Unknown lookup kind '{}'".format(kind))
+
     def set_glossary(self, term, definition):
         try:
             existing_definition = self._glossary[term]
@@ -303,21 +640,31 @@ to the terms of the GNU Affero General Public License version 3.''')
         return self._glossary[term], first_id
 
     def _load_cache(self, filename):
-        """Load the cached page references from `<filename>.ptc`."""
+        """Load the cached page references from `<filename>.ptc`, along with
+        the page counts and chapter starts of the document parts"""
         cache_path = filename.with_suffix(self.CACHE_EXTENSION)
         try:
             with cache_path.open('rb') as file:
-                prev_number_of_pages, prev_page_references = pickle.load(file)
+                (prev_number_of_pages, prev_page_references,
+                 *chapter_starts) = pickle.load(file)
             print('References cache read from {}'.format(cache_path))
-        except (IOError, TypeError):
+        except (IOError, TypeError, ValueError):
             prev_number_of_pages, prev_page_references = {}, {}
-        return prev_number_of_pages, prev_page_references
+            chapter_starts = []
+        prev_chapter_starts = chapter_starts[0] if chapter_starts else {}
+        return prev_number_of_pages, prev_page_references, prev_chapter_starts
 
     def _save_cache(self, filename, section_number_of_pages, page_references):
-        """Save the current state of the page references to `<filename>.rtc`"""
+        """Save the current state of the page references to `<filename>.rtc`
+
+        The chapter starts of each document part are stored along with these
+        (see :attr:`DocumentPart.chapter_starts`)."""
         cache_path = Path(filename).with_suffix(self.CACHE_EXTENSION)
+        chapter_starts = {name: part.chapter_starts
+                          for name, part in self._document_parts.items()
+                          if part is not None}
         with cache_path.open('wb') as file:
-            cache = (section_number_of_pages, page_references)
+            cache = (section_number_of_pages, page_references, chapter_starts)
             pickle.dump(cache, file)
 
     def set_string(self, strings_class, key, value):
@@ -336,10 +683,65 @@ to the terms of the GNU Affero General Public License version 3.''')
                                                   self.language.code))
             return EN.strings[strings_class][key]
 
-    def render(self, filename_root=None, file=None):
+    def render(self, filename_root=None, file=None, incremental=False,
+               layout_cache=False, progress_reporters=None, processes=None,
+               stream=False):
         """Render the document repeatedly until the output no longer changes due
-        to cross-references that need some iterations to converge."""
+        to cross-references that need some iterations to converge.
+
+        The rendering has converged when none of the values looked up during
+        the last rendering pass (page references, page counts and references)
+        changed by the end of that pass. When the page references cached in
+        `<filename_root>.rtc` are still valid, a single rendering pass
+        suffices. The looked-up values that changed during each rendering
+        pass are printed and stored in :attr:`changed_lookups` as lists of
+        :class:`ChangedLookup`\\ s. Rendering stops with a warning after
+        :attr:`MAX_RENDERING_PASSES` passes if it has not converged by then.
+
+        If `incremental` is `True`, each rendering iteration after the first
+        reuses the pages that are not affected by changed page references or
+        page counts, rendering each document part again only from the first
+        affected page onwards.
+
+        If `layout_cache` is `True`, the rendered pages are stored in
+        `<filename_root>.rtl` at the end of rendering. When rendering the
+        document again, pages stored for flowables whose source and
+        looked-up values are unchanged are reused instead of rendering these
+        flowables again (see :class:`LayoutCache`).
+
+        `progress_reporters` is a list of :class:`ProgressReporter`\\ s that
+        receive progress events while rendering. By default, a
+        :class:`ProgressBar` is displayed.
+
+        If `processes` is larger than 1, the document parts are first rendered
+        in this number of worker processes, each split up into ranges of
+        chapters. Each range is numbered starting from the page number it
+        started at in the previous build, as stored in `<filename_root>.rtc`.
+        The first rendering pass then reuses these pages where their page
+        numbers and looked-up values turn out to be correct, rendering only
+        the remaining pages again (see :class:`LayoutCache`). This requires
+        a platform that supports forking processes.
+
+        If `stream` is `True`, the content of each page is written to the
+        output file as soon as the page is placed, and is then discarded
+        instead of being held in memory until all rendering passes are done.
+        When a rendering pass turns out not to have converged, the output file
+        is truncated and written again during the next pass. The output file
+        needs to be seekable. Streaming cannot be combined with `incremental`
+        or `layout_cache`, since these reuse the content of the pages rendered
+        before."""
+        if stream and (incremental or layout_cache):
+            raise ValueError("'stream' cannot be combined with 'incremental' "
+                             "or 'layout_cache'")
         self.error = False
+        self.progress_reporters = (progress_reporters
+                                   if progress_reporters is not None
+                                   else [ProgressBar()])
+        self._rendering_pass = 0
+        self.changed_lookups = []
+        self.incremental = incremental
+        self.layout_cache = None
+        self._document_parts.clear()
         filename_root = Path(filename_root) if filename_root else None
         if filename_root and file is None:
             extension = self.backend_document.extension
@@ -350,48 +752,102 @@ to the terms of the GNU Affero General Public License version 3.''')
         else:
             raise ValueError("You need to specify either 'filename_root' or "
                              "'file'.")
-
-        def has_converged(part_page_counts):
-            """Return `True` if the last rendering iteration converged to a
-            stable result.
-
-            Practically, this tests whether the total number of pages and page
-            references to document elements have changed since the previous
-            rendering iteration."""
-            nonlocal prev_number_of_pages, prev_page_references
-            return (part_page_counts == prev_number_of_pages and
-                    self.page_references == prev_page_references)
+        self._output_file = file if stream else None
+        output_start = file.tell() if stream else None
 
         fake_container = FakeContainer(self)
         try:
             self.document_tree.build_document(fake_container)
-            (prev_number_of_pages,
-             prev_page_references) = self._load_cache(filename_root)
+            (prev_number_of_pages, prev_page_references,
+             prev_chapter_starts) = self._load_cache(filename_root)
 
             self.part_page_counts = prev_number_of_pages
             self.prepare(fake_container)
+            if layout_cache and filename_root:
+                layout_cache_path = filename_root.with_suffix(
+                    self.LAYOUT_CACHE_EXTENSION)
+                self.layout_cache = LayoutCache.load(layout_cache_path, self)
             self.page_elements.clear()
             self.page_references = prev_page_references.copy()
+            if processes and processes > 1 and prev_chapter_starts:
+                self._render_in_parallel(processes, prev_chapter_starts)
             self.part_page_counts = self._render_pages()
-            while not has_converged(self.part_page_counts):
-                prev_number_of_pages = self.part_page_counts
-                prev_page_references = self.page_references.copy()
+            while self._report_changed_lookups():
+                if self._rendering_pass >= self.MAX_RENDERING_PASSES:
+                    warn('The rendering did not converge after {} passes'
+                         .format(self._rendering_pass))
+                    break
                 print('Not yet converged, rendering again...')
-                del self.backend_document
-                self.backend_document = self.backend.Document(self.CREATOR)
+                if not incremental:
+                    del self.backend_document
+                    self.backend_document = self.backend.Document(
+                        self.CREATOR, **self.backend_options)
+                if stream:
+                    file.seek(output_start)
+                    file.truncate()
                 self.part_page_counts = self._render_pages()
             self.create_outlines()
             if filename:
                 self._save_cache(filename_root, self.part_page_counts,
                                  self.page_references)
+                if layout_cache and self.layout_cache and not self.error:
+                    parts = [part for part in self._document_parts.values()
+                             if part is not None]
+                    self.layout_cache.save(layout_cache_path, parts)
                 self.style_log.write_log(filename_root)
                 print('Writing output: {}'.format(filename))
             self.backend_document.write(file)
         finally:
+            self._output_file = None
             if filename_root:
                 file.close()
         return not self.error
 
+    def write_page(self, page):
+        """Write the content of `page`, which has been placed, to the output
+        file right away when streaming the output (see :meth:`render`)"""
+        if self._output_file is not None:
+            self.backend_document.write_page(page.backend_page,
+                                             self._output_file)
+
+    def _changed_lookups(self):
+        """Return a :class:`ChangedLookup` for each value looked up during the
+        last rendering pass that has changed since
+
+        Whether footnotes and floats have been placed is tracked separately
+        for each rendering pass (see :data:`PASS_LOOKUP_KINDS`); these
+        lookups are not included."""
+        records = [(record.pages[0].formatted_number, record.lookups)
+                   for part in self._document_parts.values()
+                   if part is not None
+                   for record in part._page_records]
+        records.append((None, self._unrecorded_lookups))
+        return [ChangedLookup(kind, key, value, current_value, page)
+                for page, lookups in records
+                for (kind, key), value in lookups.items()
+                if kind not in PASS_LOOKUP_KINDS
+                for current_value in [self.lookup(kind, key)]
+                if current_value != value]
+
+    def _report_changed_lookups(self, maximum=10):
+        """Print the values looked up during the last rendering pass that have
+        changed since and return `True` if there are any
+
+        The rendering has converged when all looked-up values are unchanged;
+        the pages are then rendered using the final values. At most `maximum`
+        changed lookups are printed. All of these are stored in
+        :attr:`changed_lookups`."""
+        changed_lookups = self._changed_lookups()
+        if changed_lookups:
+            self.changed_lookups.append(changed_lookups)
+            print('{} looked-up values changed during rendering pass {}:'
+                  .format(len(changed_lookups), self._rendering_pass))
+            for changed_lookup in changed_lookups[:maximum]:
+                print('  {}'.format(changed_lookup))
+            if len(changed_lookups) > maximum:
+                print('  ...')
+        return bool(changed_lookups)
+
     def create_outlines(self):
         """Create an outline in the output file that allows for easy navigation
         of the document. The outline is a hierarchical tree of all the sections
@@ -429,13 +885,17 @@ to the terms of the GNU Affero General Public License version 3.''')
         self.style_log = StyleLog(self.stylesheet)
         self.floats = set()
         self.placed_footnotes = set()
+        self._unrecorded_lookups = {}
         self._start_time = time.time()
+        self._rendering_pass += 1
+        self._report_progress('pass started')
 
         part_page_counts = {}
         part_page_count = PartPageCount()
         last_number_format = None
+        pages = []
         for part_template in self.part_templates:
-            part = part_template.document_part(self)
+            part = self._document_part(part_template)
             if part is None:
                 continue
             if part_template.page_number_format != last_number_format:
@@ -443,31 +903,88 @@ to the terms of the GNU Affero General Public License version 3.''')
             part_page_count += part.render(part_page_count.count + 1)
             part_page_counts[part_template.name] = part_page_count
             last_number_format = part_template.page_number_format
-        sys.stdout.write('\n')     # for the progress indicator
+            pages.extend(part.pages)
+        if self.incremental:    # newly rendered pages were appended at the end
+            self.backend_document.reorder_pages(page.backend_page
+                                                for page in pages)
+        self._report_progress('pass finished')
         return part_page_counts
 
-    PROGRESS_TEMPLATE = \
-        '\r{:3d}% [{}{}] ETA {:02d}:{:02d} ({:02d}:{:02d}) page {}'
-    PROGRESS_BAR_WIDTH = 40
+    def _render_in_parallel(self, processes, chapter_starts):
+        """Render the document parts in `processes` worker processes and
+        store the rendered pages in the layout cache
+
+        The document parts are split up at the chapter starts recorded in the
+        previous build (`chapter_starts`). The layout cache is enabled for
+        this rendering run, if it isn't already, so that the rendering passes
+        can reuse the pages rendered by the workers."""
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            warn('Rendering in parallel requires forking processes, which is '
+                 'not supported on this platform')
+            return
+        if self.layout_cache is None:
+            self.layout_cache = LayoutCache(None)
+        ranges = []
+        for part_template in self.part_templates:
+            starts = chapter_starts.get(part_template.name, [])
+            ends = [position for position, _ in starts[1:]] + [None]
+            for (position, page_number), end in zip(starts, ends):
+                ranges.append((part_template.name, position, page_number, end))
+        print('Rendering {} chapter ranges in {} processes...'
+              .format(len(ranges), processes))
+        context = multiprocessing.get_context('fork')
+        with context.Pool(processes, initializer=_init_render_worker,
+                          initargs=(self, )) as pool:
+            for runs in pool.map(_render_chapters, ranges):
+                for run in runs:
+                    self.layout_cache.runs[run.key] = run
+
+    def _render_chapters(self, part_name, position, first_page_number, end):
+        """Render the chapters of document part `part_name` following chain
+        position `position`, up to the chapter starting at position `end`,
+        and return the rendered pages as :class:`CachedRun`\\ s"""
+        part_template, = (part_template
+                          for part_template in self.part_templates
+                          if part_template.name == part_name)
+        part = part_template.document_part(self)
+        if part is None:
+            return []
+        part.render_from(position, first_page_number, end)
+        final_position = end if part._page_records[-1].continued else None
+        return list(self.layout_cache._create_runs(part, final_position))
+
+    def _document_part(self, part_template):
+        """Return the document part for `part_template`
+
+        When rendering incrementally, the document part created in the first
+        rendering pass is returned, so that its pages can be reused."""
+        name = part_template.name
+        if not (self.incremental and name in self._document_parts):
+            self._document_parts[name] = part_template.document_part(self)
+        return self._document_parts[name]
 
     def progress(self, flowable, container):
+        """Report that `flowable` has been placed in `container`
+
+        Only top-level flowables are reported."""
         try:
-            index = self._flowables.index(id(flowable))
-        except ValueError:
-            pass
-        else:
-            percent = 100 * (index + 1) / len(self._flowables)
-            time_passed = time.time() - self._start_time
-            passed = int(time_passed)
-            eta = int(time_passed / percent * (100 - percent))
-            filled = int(self.PROGRESS_BAR_WIDTH * percent / 100)
-            sys.stdout.write(self.PROGRESS_TEMPLATE
-                             .format(int(percent), filled * '=',
-                                     (self.PROGRESS_BAR_WIDTH - filled) * ' ',
-                                     eta // 60, eta % 60,
-                                     passed // 60, passed % 60,
-                                     container.page.formatted_number))
-            sys.stdout.flush()
+            index = self._flowable_positions[id(flowable)]
+        except KeyError:
+            return
+        page = container.page
+        self._report_progress('flowable placed',
+                              part=page.document_part.template.name,
+                              page=page.formatted_number, index=index,
+                              total=len(self._flowable_positions))
+
+    def _report_progress(self, type, **kwargs):
+        if not self.progress_reporters:
+            return
+        event = ProgressEvent(type, self._rendering_pass,
+                              elapsed=time.time() - self._start_time,
+                              **kwargs)
+        for reporter in self.progress_reporters:
+            reporter.report(event)
 
 
 class FakeContainer(object):    # TODO: clean up
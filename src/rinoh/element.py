@@ -22,6 +22,11 @@ class DocumentElement(object):
     """An element that is directly or indirectly part of a :class:`Document`
     and is eventually rendered to the output."""
 
+    # whether the pages this element is rendered to can be stored in the
+    # layout cache; this is not the case for elements whose output depends on
+    # the document as a whole, such as a table of contents
+    layout_cacheable = True
+
     def __init__(self, id=None, parent=None, source=None):
         """Initialize this document element as as a child of `parent`
         (:class:`DocumentElement`) if it is not a top-level :class:`Flowable`
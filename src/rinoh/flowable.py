@@ -162,6 +162,46 @@ class Flowable(Styled):
     def _width(self, container):
         return self.width or self.get_style('width', container)
 
+    def content_widths(self, container):
+        """Return the minimum and maximum width of this flowable
+
+        The minimum width is the width this flowable takes up when its lines
+        are broken at every opportunity, which is the width of its widest
+        unbreakable part (e.g. a word). The maximum width is the width it
+        takes up when its lines are not wrapped. Both include the flowable's
+        margins, padding and borders.
+
+        This implementation flows the flowable into a zero-width and an
+        infinitely wide virtual container. Subclasses can determine these
+        widths without laying out their contents.
+
+        """
+        def flowed_width(width):
+            buffer = VirtualContainer(container, width=width)
+            width, _, _ = self.flow(buffer, None)
+            return float(width)
+
+        return flowed_width(0), flowed_width(float('+inf'))
+
+    def _frame_width(self, container):
+        """The horizontal space taken up by this flowable's margins, padding
+        and borders"""
+        def style(attribute, default=0):
+            return self.get_style(attribute, container) or default
+
+        def border_width(attribute, default=0):
+            border = self.get_style(attribute, container)
+            return (border.width if border else 0) or default
+
+        padding = style('padding')
+        border = border_width('border')
+        widths = (style('margin_left'), style('margin_right'),
+                  style('padding_left', padding),
+                  style('padding_right', padding),
+                  border_width('border_left', border),
+                  border_width('border_right', border))
+        return sum(float(width) for width in widths)
+
     def _align(self, container, bordered_width):
         align = self.align or self.get_style('horizontal_align', container)
         if align == HorizontalAlignment.LEFT:
@@ -478,6 +518,18 @@ class GroupedFlowables(Flowable):
     def mark_page_nonempty(self, container):
         pass   # only the children place content on the page
 
+    def content_widths(self, container):
+        min_width = max_width = 0
+        for flowable in self.initial_state(container).flowables:
+            if flowable.is_hidden(container):
+                continue
+            flowable.parent = self
+            minimum, maximum = flowable.content_widths(container)
+            min_width = max(min_width, minimum)
+            max_width = max(max_width, maximum)
+        frame_width = self._frame_width(container)
+        return min_width + frame_width, max_width + frame_width
+
     def render(self, container, descender, state, first_line_only=False,
                **kwargs):
         max_flowable_width = 0
@@ -774,6 +826,8 @@ class GroupedLabeledFlowables(GroupedFlowables):
                 max_width = max(max_width, width)
         return max_width
 
+    content_widths = Flowable.content_widths  # labels share a column
+
     def render(self, container, descender, state, **kwargs):
         if state.initial:
             max_label_width = self._calculate_label_width(container)
@@ -808,7 +862,7 @@ class Float(Flowable):
     def flow(self, container, last_descender, state=None, **kwargs):
         if self.get_style('float', container):
             id = self.get_id(container.document)
-            if id not in container.document.floats:
+            if not container.document.is_float_placed(id):
                 super().flow(container.float_space, None)
                 container.document.floats.add(id)
                 if not container.page.check_overflow():
@@ -818,6 +872,11 @@ class Float(Flowable):
             return super().flow(container, last_descender, state=state,
                                 **kwargs)
 
+    def content_widths(self, container):
+        if self.get_style('float', container):
+            return 0, 0
+        return super().content_widths(container)
+
 
 class Break(OptionSet):
     values = None, 'any', 'left', 'right'
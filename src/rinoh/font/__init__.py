@@ -88,6 +88,7 @@ class Font(object):
         self.weight = FontWeight.validate(weight)
         self.slant = FontSlant.validate(slant)
         self.width = FontWidth.validate(width)
+        self.typeface = None    # set when this font is added to a Typeface
         # font metrics in Postscript points
         self.ascender_in_pt = self.ascender / self.units_per_em
         self.descender_in_pt = self.descender / self.units_per_em
@@ -171,6 +172,8 @@ class Typeface(Resource, dict):
     def __init__(self, name, *fonts):
         self.name = name
         for font in fonts:
+            if font.typeface is None:
+                font.typeface = self
             slants = self.setdefault(font.width, {})
             weights = slants.setdefault(font.slant, {})
             weights[font.weight] = font
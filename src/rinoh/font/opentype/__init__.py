@@ -6,17 +6,35 @@
 # Public License v3. See the LICENSE file or http://www.gnu.org/licenses/.
 
 
+from functools import wraps
 from warnings import warn
 
 from ...font.style import FontVariant
-from ...util import cached
+from ...util import cached_property
 from ...warnings import RinohWarning
 from .. import Font, GlyphMetrics, LeafGetter, MissingGlyphException
 
 from .parse import OpenTypeParser
+from .gpos import PairAdjustmentSubtable
+from .gsub import SingleSubTable, LigatureSubTable
 from .ids import NAME_PS_NAME, PLATFORM_WINDOWS, LANGUAGE_WINDOWS_EN_US
 
 
+def shared(method):
+    """Method decorator caching the returned values in the tables shared by
+    all fonts loaded from the same file"""
+    @wraps(method)
+    def function_wrapper(font, *args):
+        key = (method.__name__, ) + args
+        derived = font._tables.derived
+        try:
+            return derived[key]
+        except KeyError:
+            with font._tables.lock:
+                return derived.setdefault(key, method(font, *args))
+    return function_wrapper
+
+
 class OpenTypeFont(Font, OpenTypeParser):
     units_per_em = LeafGetter('head', 'unitsPerEm')
     encoding = None
@@ -43,46 +61,17 @@ class OpenTypeFont(Font, OpenTypeParser):
                  weight='medium', slant='upright', width='normal'):
         OpenTypeParser.__init__(self, filename)
         super().__init__(filename, weight, slant, width)
-        self._glyphs_by_code = self._create_glyph_metrics()
-        self._glyphs = self._create_glyphs_by_char(self._glyphs_by_code)
+        # the glyph metrics are shared by all fonts loaded from this file
+        derived = self._tables.derived
+        self._glyphs_by_code = derived.setdefault('glyphs by code',
+                                                  GlyphsByCode(self._tables))
+        self._glyphs = derived.setdefault('glyphs by char',
+                                          GlyphsByChar(self._glyphs_by_code,
+                                                       self._tables))
         self._suffixes = {}
         self._ligatures = {}
         self._kerning_pairs = {}
 
-    def _create_glyph_metrics(self):
-        glyphs_by_code = {}
-        # TODO: extract bboxes from CFF: www.tug.org/TUGboat/tb24-3/bella.pdf
-        advance_width_table = self['hmtx']['advanceWidth']
-        glyf_table = self['glyf'] if 'glyf' in self else None
-        for glyph_index, width in enumerate(advance_width_table):
-            bbox = (glyf_table[glyph_index].bounding_box
-                    if glyf_table and glyph_index in glyf_table
-                    else None)
-            glyph_metrics = GlyphMetrics(None, width, bbox, glyph_index)
-            glyphs_by_code[glyph_index] = glyph_metrics
-        return glyphs_by_code
-
-    def _create_glyphs_by_char(self, glyphs_by_code):
-        # TODO: support symbol/wingdings
-        #       "The 'cmap' subtable (platform 3, encoding 0) must use format 4.
-        #       The character codes should start at 0xF000, which is in the
-        #       Private Use Area of Unicode. It is suggested to derive the
-        #       format 4 encodings by simply adding 0xF000 to the format 0
-        #       (Macintosh) encodings."
-        # TODO: properly handle encodings
-        glyphs_by_char = {}
-        cmap_tables = self['cmap']
-        for encoding in [(0, 0), (0, 1), (0, 2), (0, 3), (3, 1)]:
-            try:
-                for ordinal, index in cmap_tables[encoding].mapping.items():
-                    glyphs_by_char[chr(ordinal)] = glyphs_by_code[index]
-                break
-            except KeyError:
-                continue
-        if not glyphs_by_char:
-            raise Exception
-        return glyphs_by_char
-
     _VARIANTS = {FontVariant.SMALL_CAPITAL: 'smcp',
                  FontVariant.OLDSTYLE_FIGURES: 'onum'}
 
@@ -94,15 +83,13 @@ class OpenTypeFont(Font, OpenTypeParser):
                  .format(self.name, ord(char), char), RinohWarning)
             raise MissingGlyphException(char)
 
-        if variant in self._VARIANTS and 'GSUB' in self:
-            feature = self._VARIANTS[variant]
-            lookup_tables = self._get_lookup_tables('GSUB', feature, 'latn')
-            for lookup_table in lookup_tables:
-                try:
-                    code = lookup_table.lookup(glyph.code)
-                    return self._glyphs_by_code[code]
-                except KeyError:
-                    pass
+        if variant in self._VARIANTS:
+            substitutions = self._get_substitutions(self._VARIANTS[variant],
+                                                    'latn')
+            try:
+                return self._glyphs_by_code[substitutions[glyph.code]]
+            except KeyError:
+                pass
         return glyph
 
     def _get_lookup_tables(self, table, feature, script='DFLT', language=None):
@@ -139,32 +126,119 @@ class OpenTypeFont(Font, OpenTypeParser):
                         for lookup_list_index in lookup_list_indices]
         return []
 
-    @cached
+    def _get_subtables(self, table, feature, script='DFLT', language=None):
+        """Return the subtables of the lookups for `feature`, in order"""
+        if table not in self:
+            return []
+        lookup_tables = self._get_lookup_tables(table, feature, script,
+                                                language)
+        return [getattr(subtable, 'subtable', subtable)   # extension lookups
+                for lookup_table in lookup_tables
+                for subtable in lookup_table['SubTable']]
+
+    @shared
+    def _get_substitutions(self, feature, script, language=None):
+        """Map glyph IDs to their substitute for a single substitution
+        `feature`"""
+        substitutions = {}
+        for subtable in self._get_subtables('GSUB', feature, script, language):
+            if isinstance(subtable, SingleSubTable):
+                for glyph_id, substitute in subtable.substitutions.items():
+                    substitutions.setdefault(glyph_id, substitute)
+        return substitutions
+
+    @shared
+    def _get_ligatures(self, feature, script, language=None):
+        """Map pairs of glyph IDs to their ligature for a ligature
+        substitution `feature`"""
+        ligatures = {}
+        for subtable in self._get_subtables('GSUB', feature, script, language):
+            if isinstance(subtable, LigatureSubTable):
+                for pair, ligature in subtable.ligatures.items():
+                    ligatures.setdefault(pair, ligature)
+        return ligatures
+
+    @shared
+    def _get_pair_adjustments(self, feature, script, language=None):
+        """Return the pair adjustment subtables for a positioning
+        `feature`"""
+        return [subtable for subtable
+                in self._get_subtables('GPOS', feature, script, language)
+                if isinstance(subtable, PairAdjustmentSubtable)]
+
     def get_ligature(self, glyph, successor_glyph):
-        if 'GSUB' in self:
-            lookup_tables = self._get_lookup_tables('GSUB', 'liga', 'latn')
-            for lookup_table in lookup_tables:
-                try:
-                    code = lookup_table.lookup(glyph.code, successor_glyph.code)
-                    return self._glyphs_by_code[code]
-                except KeyError:
-                    pass
-        return None
+        ligatures = self._get_ligatures('liga', 'latn')
+        try:
+            code = ligatures[glyph.code, successor_glyph.code]
+        except KeyError:
+            return None
+        return self._glyphs_by_code[code]
 
-    @cached
     def get_kerning(self, a, b):
-        if 'GPOS' in self:
-            lookup_tables = self._get_lookup_tables('GPOS', 'kern', 'latn')
-            # TODO: 'kern' lookup list indices can point to pair adjustment (2)
-            #       or Chained Context positioning (8) lookup subtables
-            for lookup_table in lookup_tables:
-                try:
-                    return lookup_table.lookup(a.code, b.code)
-                except KeyError:
-                    pass
+        # TODO: 'kern' lookup list indices can point to pair adjustment (2)
+        #       or Chained Context positioning (8) lookup subtables
+        for subtable in self._get_pair_adjustments('kern', 'latn'):
+            try:
+                return subtable.lookup(a.code, b.code)
+            except KeyError:
+                pass
         if 'kern' in self:
             try:
                 return self['kern'][0].pairs[a.code][b.code]
             except KeyError:
                 pass
         return 0.0
+
+
+class GlyphsByCode(dict):
+    """Maps glyph IDs to :class:`GlyphMetrics`, looking up the metrics of a
+    glyph in the font's tables when it is first requested"""
+
+    def __init__(self, tables):
+        super().__init__()
+        self._tables = tables
+
+    def __missing__(self, glyph_index):
+        # TODO: extract bboxes from CFF: www.tug.org/TUGboat/tb24-3/bella.pdf
+        try:
+            width = self._tables['hmtx']['advanceWidth'][glyph_index]
+        except IndexError:
+            raise KeyError(glyph_index)
+        glyf_table = self._tables['glyf'] if 'glyf' in self._tables else None
+        bbox = (glyf_table[glyph_index].bounding_box
+                if glyf_table is not None and glyph_index in glyf_table
+                else None)
+        glyph_metrics = GlyphMetrics(None, width, bbox, glyph_index)
+        return self.setdefault(glyph_index, glyph_metrics)
+
+
+class GlyphsByChar(dict):
+    """Maps characters to :class:`GlyphMetrics` using the font's cmap table"""
+
+    def __init__(self, glyphs_by_code, tables):
+        super().__init__()
+        self._glyphs_by_code = glyphs_by_code
+        self._tables = tables
+
+    @cached_property
+    def mapping(self):
+        # TODO: support symbol/wingdings
+        #       "The 'cmap' subtable (platform 3, encoding 0) must use format 4.
+        #       The character codes should start at 0xF000, which is in the
+        #       Private Use Area of Unicode. It is suggested to derive the
+        #       format 4 encodings by simply adding 0xF000 to the format 0
+        #       (Macintosh) encodings."
+        # TODO: properly handle encodings
+        cmap_tables = self._tables['cmap']
+        for encoding in [(0, 0), (0, 1), (0, 2), (0, 3), (3, 1)]:
+            try:
+                mapping = cmap_tables[encoding].mapping
+            except KeyError:
+                continue
+            if mapping:
+                return mapping
+        raise Exception
+
+    def __missing__(self, char):
+        glyph = self._glyphs_by_code[self.mapping[ord(char)]]
+        return self.setdefault(char, glyph)
@@ -166,15 +166,24 @@ class PairAdjustmentSubtable(MultiFormatTable):
                 class_1_record.append(class_2_record)
             self['Class1Record'] = class_1_record
 
+    @cached_property
+    def pairs(self):
+        """Maps pairs of glyph IDs to the advance adjustment of the first glyph
+        (format 1 only)"""
+        pairs = {}
+        for a_id, index in self['Coverage'].glyph_indices.items():
+            pair_set = self['PairSet'][index]
+            for b_id, record in pair_set.by_second_glyph_id.items():
+                if 'XAdvance' in record['Value1']:
+                    pairs[a_id, b_id] = record['Value1']['XAdvance']
+        return pairs
+
     def lookup(self, a_id, b_id):
         if self['PosFormat'] == 1:
-            try:
-                index = self['Coverage'].index(a_id)
-            except ValueError:
-                raise KeyError
-            pair_value_record = self['PairSet'][index].by_second_glyph_id[b_id]
-            return pair_value_record['Value1']['XAdvance']
+            return self.pairs[a_id, b_id]
         elif self['PosFormat'] == 2:
+            if a_id not in self['Coverage'].glyph_indices:
+                raise KeyError
             a_class = self['ClassDef1'].class_number(a_id)
             b_class = self['ClassDef2'].class_number(b_id)
             class_2_record = self['Class1Record'][a_class][b_class]
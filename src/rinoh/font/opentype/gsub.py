@@ -11,6 +11,7 @@ from .parse import uint16, ushort, ulong, glyph_id, array, indirect
 from .parse import context_array, indirect_array
 from .layout import LayoutTable
 from .layout import Coverage
+from ...util import cached_property
 
 
 # Single substitution (subtable format 1)
@@ -21,15 +22,20 @@ class SingleSubTable(MultiFormatTable):
                2: [('GlyphCount', uint16),
                    ('Substitute', context_array(glyph_id, 'GlyphCount'))]}
 
-    def lookup(self, glyph_id):
-        try:
-            index = self['Coverage'].index(glyph_id)
-        except ValueError:
-            raise KeyError
+    @cached_property
+    def substitutions(self):
+        """Maps the covered glyph IDs to the ID of their substitute"""
+        glyph_indices = self['Coverage'].glyph_indices
         if self['SubstFormat'] == 1:
-            return index + self['DeltaGlyphID']
+            delta = self['DeltaGlyphID']
+            return {glyph_id: (glyph_id + delta) % 0x10000
+                    for glyph_id in glyph_indices}
         else:
-            return self['Substitute'][index]
+            return {glyph_id: self['Substitute'][index]
+                    for glyph_id, index in glyph_indices.items()}
+
+    def lookup(self, glyph_id):
+        return self.substitutions[glyph_id]
 
 
 # Multiple subtitution (subtable format 2)
@@ -78,16 +84,19 @@ class LigatureSubTable(OpenTypeTable):
                ('LigSetCount', uint16),
                ('LigatureSet', indirect_array(LigatureSet, 'LigSetCount'))]
 
+    @cached_property
+    def ligatures(self):
+        """Maps pairs of glyph IDs to the ID of the ligature replacing them"""
+        ligatures = {}
+        for a_id, index in self['Coverage'].glyph_indices.items():
+            for ligature in self['LigatureSet'][index]['Ligature']:
+                if len(ligature['Component']) == 1:
+                    b_id, = ligature['Component']
+                    ligatures.setdefault((a_id, b_id), ligature['LigGlyph'])
+        return ligatures
+
     def lookup(self, a_id, b_id):
-        try:
-            index = self['Coverage'].index(a_id)
-        except ValueError:
-            raise KeyError
-        ligature_set = self['LigatureSet'][index]
-        for ligature in ligature_set['Ligature']:
-            if ligature['Component'] == [b_id]:
-                return ligature['LigGlyph']
-        raise KeyError
+        return self.ligatures[a_id, b_id]
 
 
 # Chaining contextual substitution (subtable format 6)
@@ -8,6 +8,7 @@
 
 from .parse import OpenTypeTable, MultiFormatTable, Record, context_array
 from .parse import fixed, array, uint16, tag, glyph_id, offset, indirect, Packed
+from ...util import cached_property
 
 
 class ListRecord(Record):
@@ -89,14 +90,23 @@ class Coverage(MultiFormatTable):
                2: [('RangeCount', uint16),
                    ('RangeRecord', context_array(RangeRecord, 'RangeCount'))]}
 
-    def index(self, glyph_id):
+    @cached_property
+    def glyph_indices(self):
+        """Maps the covered glyph IDs to their coverage index"""
         if self['CoverageFormat'] == 1:
-            return self['GlyphArray'].index(glyph_id)
-        else:
-            for record in self['RangeRecord']:
-                if record['Start'] <= glyph_id <= record['End']:
-                    return (record['StartCoverageIndex']
-                            + glyph_id - record['Start'])
+            return {glyph_id: index
+                    for index, glyph_id in enumerate(self['GlyphArray'])}
+        glyph_indices = {}
+        for record in self['RangeRecord']:
+            start, start_index = record['Start'], record['StartCoverageIndex']
+            for glyph_id in range(start, record['End'] + 1):
+                glyph_indices[glyph_id] = start_index + glyph_id - start
+        return glyph_indices
+
+    def index(self, glyph_id):
+        try:
+            return self.glyph_indices[glyph_id]
+        except KeyError:
             raise ValueError
 
 
@@ -115,16 +125,21 @@ class ClassDefinition(MultiFormatTable):
                    ('ClassRangeRecord', context_array(ClassRangeRecord,
                                                       'ClassRangeCount'))]}
 
-    def class_number(self, glyph_id):
+    @cached_property
+    def classes(self):
+        """Maps glyph IDs to their class (glyphs not listed are in class 0)"""
         if self['ClassFormat'] == 1:
-            index = glyph_id - self['StartGlyph']
-            if 0 <= index < self['GlyphCount']:
-                return self['ClassValueArray'][index]
-        else:
-            for record in self['ClassRangeRecord']:
-                if record['Start'] <= glyph_id <= record['End']:
-                    return record['Class']
-        return 0
+            return {self['StartGlyph'] + index: class_number
+                    for index, class_number
+                    in enumerate(self['ClassValueArray'])}
+        classes = {}
+        for record in self['ClassRangeRecord']:
+            for glyph_id in range(record['Start'], record['End'] + 1):
+                classes.setdefault(glyph_id, record['Class'])
+        return classes
+
+    def class_number(self, glyph_id):
+        return self.classes.get(glyph_id, 0)
 
 
 def subtables(subtable_type, file, file_offset, offsets):
@@ -6,7 +6,7 @@
 # Public License v3. See the LICENSE file or http://www.gnu.org/licenses/.
 
 
-import hashlib, math, io, struct
+import hashlib, math, io, mmap, os, struct, threading, weakref
 from datetime import datetime, timedelta
 from collections import OrderedDict
 
@@ -172,42 +172,124 @@ from .cff import CompactFontFormat
 from . import truetype, gpos, gsub, other
 
 
-class OpenTypeParser(dict):
+class OpenTypeTables(dict):
+    """The tables of the OpenType font file `filename`
+
+    The file is memory-mapped and each table is parsed only when it is first
+    looked up. Use :meth:`for_file` to obtain the instance shared by all fonts
+    loaded from a particular file.
+
+    """
+
+    CACHE_SIZE = 32     # the number of font files kept open by for_file
+
+    _instances = OrderedDict()
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def for_file(cls, filename, user):
+        """Return the tables for `filename`, sharing them with previous
+        requests for the same (unmodified) file
+
+        The tables for the :attr:`CACHE_SIZE` most recently requested files
+        are cached. The tables for a file that was modified since and those
+        evicted from the cache are closed as soon as they are no longer used.
+        They are in use until `user` (a font) is garbage-collected."""
+        stat = os.stat(filename)
+        path = os.path.realpath(filename)
+        key = path, stat.st_mtime_ns, stat.st_size
+        with cls._instances_lock:
+            try:
+                tables = cls._instances[key]
+                cls._instances.move_to_end(key)
+            except KeyError:
+                tables = cls._instances[key] = cls(filename)
+                tables._cached = True
+                for outdated_key in [other_key for other_key in cls._instances
+                                     if other_key[0] == path
+                                     and other_key != key]:
+                    cls._evict(outdated_key)
+                while len(cls._instances) > cls.CACHE_SIZE:
+                    cls._evict(next(iter(cls._instances)))
+            tables._users += 1
+        weakref.finalize(user, cls._release, tables)
+        return tables
+
+    @classmethod
+    def _evict(cls, key):
+        tables = cls._instances.pop(key)
+        tables._cached = False
+        if not tables._users:
+            tables.close()
+
+    @classmethod
+    def _release(cls, tables):
+        with cls._instances_lock:
+            tables._users -= 1
+            if not (tables._users or tables._cached):
+                tables.close()
+
     def __init__(self, filename):
-        disk_file = open(filename, 'rb')
-        file = io.BytesIO(disk_file.read())
-        disk_file.close()
-        offset_table = OffsetTable(file)
-        table_records = OrderedDict()
+        super().__init__()
+        with open(filename, 'rb') as disk_file:
+            self._file = mmap.mmap(disk_file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        self._users = 0         # the number of fonts using these tables
+        self._cached = False    # whether for_file can still return these
+        self.lock = threading.RLock()
+        offset_table = OffsetTable(self._file)
+        self.records = OrderedDict()
         for i in range(offset_table['numTables']):
-            record = TableRecord(file)
-            table_records[record['tag']] = record
-        for tag, record in table_records.items():
-            record.check_sum(file)
-
-        for tag in ('head', 'hhea', 'cmap', 'maxp', 'name', 'post', 'OS/2'):
-            self[tag] = self._parse_table(file, table_records[tag])
-
-        self['hmtx'] = HmtxTable(file, table_records['hmtx']['offset'],
-                                 self['hhea']['numberOfHMetrics'],
-                                 self['maxp']['numGlyphs'])
-        try:
-            self['CFF'] = CompactFontFormat(file,
-                                            table_records['CFF']['offset'])
-        except KeyError:
-            self['loca'] = truetype.LocaTable(file,
-                                              table_records['loca']['offset'],
-                                              self['head']['indexToLocFormat'],
-                                              self['maxp']['numGlyphs'])
-            self['glyf'] = truetype.GlyfTable(file,
-                                              table_records['glyf']['offset'],
-                                              self['loca'])
-        for tag in ('kern', 'GPOS', 'GSUB'):
-            if tag in table_records:
-                self[tag] = self._parse_table(file, table_records[tag])
+            record = TableRecord(self._file)
+            self.records[record['tag']] = record
+        self.derived = {}   # data derived from the tables, shared by fonts
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def close(self):
+        """Unmap the font file"""
+        self._file.close()
+
+    def __contains__(self, tag):
+        return tag in self.records
+
+    def __missing__(self, tag):
+        record = self.records[tag]
+        file, offset = self._file, record['offset']
+        with self.lock:
+            if tag == 'hmtx':
+                table = HmtxTable(file, offset,
+                                  self['hhea']['numberOfHMetrics'],
+                                  self['maxp']['numGlyphs'])
+            elif tag == 'CFF':
+                table = CompactFontFormat(file, offset)
+            elif tag == 'loca':
+                table = truetype.LocaTable(file, offset,
+                                           self['head']['indexToLocFormat'],
+                                           self['maxp']['numGlyphs'])
+            elif tag == 'glyf':
+                table = truetype.GlyfTable(file, offset, self['loca'])
+            else:
+                table = self._parse_table(file, record)
+            return self.setdefault(tag, table)
 
     @staticmethod
     def _parse_table(file, table_record):
         for cls in all_subclasses(OpenTypeTable):
             if cls.tag == table_record['tag']:
                 return cls(file, table_record['offset'])
+
+
+class OpenTypeParser(object):
+    """Provides access to the tables of an OpenType font file by tag"""
+
+    def __init__(self, filename):
+        self._tables = OpenTypeTables.for_file(filename, self)
+
+    def __getitem__(self, tag):
+        return self._tables[tag]
+
+    def __contains__(self, tag):
+        return tag in self._tables
@@ -0,0 +1,408 @@
+# This file is part of rinohtype, the Python document preparation system.
+#
+# Copyright (c) Brecht Machiels.
+#
+# Use of this source code is subject to the terms of the GNU Affero General
+# Public License v3. See the LICENSE file or http://www.gnu.org/licenses/.
+
+"""
+Subsetting of OpenType fonts for embedding in documents.
+
+The subset font keeps the glyph IDs of the original font, so the glyph codes
+used in the document's content remain valid. The outlines of the glyphs that
+are not used are dropped from the ``glyf`` (TrueType) or ``CFF`` table, and
+the tables that are not needed to render the glyphs (such as the layout
+tables) are left out.
+
+"""
+
+import struct
+
+from collections import OrderedDict
+
+
+__all__ = ['subset']
+
+
+# tables to retain in the subset font; the other tables are only required
+# for text layout (performed by rinohtype) or for installing the font
+KEEP_TABLES = {'head', 'hhea', 'maxp', 'hmtx', 'vhea', 'vmtx', 'cmap', 'name',
+               'OS/2', 'post', 'cvt ', 'fpgm', 'prep', 'loca', 'glyf', 'CFF '}
+
+
+def subset(data, glyph_ids):
+    """Return the data of the font file `data` (:class:`bytes`), reduced to
+    the glyphs with the IDs in `glyph_ids` (and the glyphs these depend on)
+
+    Raises:
+        ValueError: if the font cannot be subsetted; the caller can embed the
+            complete font instead
+
+    """
+    glyph_ids = set(glyph_ids) | {0}     # always include .notdef
+    tables = _read_tables(data)
+    tables = OrderedDict((tag, table_data) for tag, table_data in tables.items()
+                         if tag in KEEP_TABLES)
+    if 'CFF ' in tables:
+        tables['CFF '] = subset_cff(tables['CFF '], glyph_ids)
+    elif 'glyf' in tables:
+        tables['loca'], tables['glyf'] = subset_glyf(tables, glyph_ids)
+    else:
+        raise ValueError('Font contains no glyf or CFF table')
+    if 'post' in tables:    # drop the glyph names (post table format 3)
+        tables['post'] = struct.pack('>L', 0x00030000) + tables['post'][4:32]
+    return _write_tables(data[:4], tables)
+
+
+# sfnt wrapper
+
+def _read_tables(data):
+    num_tables, = struct.unpack_from('>H', data, 4)
+    tables = OrderedDict()
+    for index in range(num_tables):
+        tag, _, offset, length = struct.unpack_from('>4sLLL', data,
+                                                    12 + 16 * index)
+        tables[tag.decode('latin-1')] = data[offset:offset + length]
+    return tables
+
+
+def _write_tables(sfnt_version, tables):
+    num_tables = len(tables)
+    entry_selector = num_tables.bit_length() - 1
+    search_range = 16 * 2**entry_selector
+    directory = bytearray(sfnt_version)
+    directory += struct.pack('>HHHH', num_tables, search_range,
+                             entry_selector, 16 * num_tables - search_range)
+    tables_data = bytearray()
+    offset = 12 + 16 * num_tables
+    head_offset = None
+    for tag in sorted(tables):
+        table_data = tables[tag]
+        if tag == 'head':               # clear checkSumAdjustment
+            table_data = table_data[:8] + bytes(4) + table_data[12:]
+            head_offset = offset + len(tables_data)
+        directory += struct.pack('>4sLLL', tag.encode('latin-1'),
+                                 _checksum(table_data),
+                                 offset + len(tables_data), len(table_data))
+        tables_data += _pad(table_data, 4)
+    font_data = directory + tables_data
+    if head_offset is not None:
+        adjustment = (0xB1B0AFBA - _checksum(font_data)) & 0xFFFFFFFF
+        struct.pack_into('>L', font_data, head_offset + 8, adjustment)
+    return bytes(font_data)
+
+
+def _pad(data, multiple):
+    return data + bytes(-len(data) % multiple)
+
+
+def _checksum(data):
+    data = _pad(data, 4)
+    return sum(struct.unpack('>{}L'.format(len(data) // 4), data)) & 0xFFFFFFFF
+
+
+# TrueType outlines
+
+ARG_1_AND_2_ARE_WORDS = 0x0001
+WE_HAVE_A_SCALE = 0x0008
+MORE_COMPONENTS = 0x0020
+WE_HAVE_AN_X_AND_Y_SCALE = 0x0040
+WE_HAVE_A_TWO_BY_TWO = 0x0080
+
+
+def subset_glyf(tables, glyph_ids):
+    """Return the ``loca`` and ``glyf`` tables holding only the outlines of
+    the glyphs in `glyph_ids` and the components of these glyphs"""
+    num_glyphs, = struct.unpack_from('>H', tables['maxp'], 4)
+    long_offsets, = struct.unpack_from('>h', tables['head'], 50)
+    if long_offsets:
+        offsets = struct.unpack_from('>{}L'.format(num_glyphs + 1),
+                                     tables['loca'])
+    else:
+        offsets = [2 * offset for offset in
+                   struct.unpack_from('>{}H'.format(num_glyphs + 1),
+                                      tables['loca'])]
+    glyf = tables['glyf']
+
+    def glyph_data(glyph_id):
+        return glyf[offsets[glyph_id]:offsets[glyph_id + 1]]
+
+    keep = set()
+    remaining = [glyph_id for glyph_id in glyph_ids if glyph_id < num_glyphs]
+    while remaining:
+        glyph_id = remaining.pop()
+        if glyph_id not in keep:
+            keep.add(glyph_id)
+            remaining.extend(_glyph_components(glyph_data(glyph_id)))
+    new_glyf = bytearray()
+    new_offsets = []
+    for glyph_id in range(num_glyphs):
+        new_offsets.append(len(new_glyf))
+        if glyph_id in keep:
+            new_glyf += _pad(glyph_data(glyph_id), 4 if long_offsets else 2)
+    new_offsets.append(len(new_glyf))
+    if long_offsets:
+        loca = struct.pack('>{}L'.format(num_glyphs + 1), *new_offsets)
+    else:
+        loca = struct.pack('>{}H'.format(num_glyphs + 1),
+                           *(offset // 2 for offset in new_offsets))
+    return loca, bytes(new_glyf)
+
+
+def _glyph_components(data):
+    """Yield the glyph IDs of the components of the composite glyph described
+    by `data`"""
+    if not data or struct.unpack_from('>h', data)[0] >= 0:
+        return      # empty or simple glyph
+    offset = 10     # skip the glyph header
+    while True:
+        flags, glyph_id = struct.unpack_from('>HH', data, offset)
+        yield glyph_id
+        offset += 8 if flags & ARG_1_AND_2_ARE_WORDS else 6
+        if flags & WE_HAVE_A_SCALE:
+            offset += 2
+        elif flags & WE_HAVE_AN_X_AND_Y_SCALE:
+            offset += 4
+        elif flags & WE_HAVE_A_TWO_BY_TWO:
+            offset += 8
+        if not flags & MORE_COMPONENTS:
+            break
+
+
+# Compact Font Format outlines
+
+ENDCHAR = b'\x0e'
+
+CHARSET = 15
+ENCODING = 16
+CHARSTRINGS = 17
+PRIVATE = 18
+SUBRS = 19
+FDARRAY = (12, 36)
+FDSELECT = (12, 37)
+
+
+def subset_cff(data, glyph_ids):
+    """Return the CFF table `data` with the charstrings of the glyphs not in
+    `glyph_ids` replaced by an empty glyph
+
+    The tables referenced from the Top DICT are written again one after the
+    other, dropping the space taken up by the unused charstrings. Subroutines
+    are retained in full.
+
+    """
+    header_size = data[2]
+    _, names_end = _read_index(data, header_size)
+    top_dicts, top_dicts_end = _read_index(data, names_end)
+    if len(top_dicts) != 1:
+        raise ValueError('CFF table contains more than one font')
+    _, strings_end = _read_index(data, top_dicts_end)
+    _, global_subrs_end = _read_index(data, strings_end)
+    prefix = data[:names_end]
+    strings_and_subrs = data[top_dicts_end:global_subrs_end]
+
+    top_dict = _parse_dict(top_dicts[0])
+    top_operands = {operator: values for operator, values in top_dict}
+    charstrings, _ = _read_index(data, top_operands[CHARSTRINGS][0])
+    num_glyphs = len(charstrings)
+
+    tables = OrderedDict()        # the tables following the global subrs
+    charset_offset = top_operands.get(CHARSET, [0])[0]
+    if charset_offset > 2:        # 0-2 are predefined charsets
+        length = _charset_length(data, charset_offset, num_glyphs)
+        tables[CHARSET] = data[charset_offset:charset_offset + length]
+    encoding_offset = top_operands.get(ENCODING, [0])[0]
+    if encoding_offset > 1:       # 0-1 are predefined encodings
+        length = _encoding_length(data, encoding_offset)
+        tables[ENCODING] = data[encoding_offset:encoding_offset + length]
+    if FDSELECT in top_operands:
+        fd_select_offset = top_operands[FDSELECT][0]
+        length = _fd_select_length(data, fd_select_offset, num_glyphs)
+        tables[FDSELECT] = data[fd_select_offset:fd_select_offset + length]
+    tables[CHARSTRINGS] = _index_bytes(
+        [charstring if glyph_id in glyph_ids else ENDCHAR
+         for glyph_id, charstring in enumerate(charstrings)])
+    font_dicts = []
+    if FDARRAY in top_operands:
+        raw_font_dicts, _ = _read_index(data, top_operands[FDARRAY][0])
+        font_dicts = [_parse_dict(raw) for raw in raw_font_dicts]
+        tables[FDARRAY] = None      # written below, depends on the offsets
+    private_sizes = {}
+    for dict_entries in [top_dict] + font_dicts:
+        for operator, values in dict_entries:
+            if operator == PRIVATE:
+                size, offset = values
+                private_sizes[offset] = size
+                tables[(PRIVATE, offset)] = _private_bytes(data, offset, size)
+
+    offsets = {key: 0 for key in tables}
+    for _ in range(2):      # the sizes don't depend on the offsets
+        replace = {key: [offsets[key]] for key in (CHARSET, ENCODING,
+                                                   CHARSTRINGS, FDARRAY,
+                                                   FDSELECT)
+                   if key in tables}
+
+        def dict_bytes(entries):
+            private = {PRIVATE: [private_sizes[values[1]],
+                                 offsets[(PRIVATE, values[1])]]
+                       for operator, values in entries if operator == PRIVATE}
+            return _dict_bytes(entries, {**replace, **private})
+
+        if font_dicts:
+            tables[FDARRAY] = _index_bytes([dict_bytes(font_dict)
+                                            for font_dict in font_dicts])
+        cff_data = bytearray(prefix)
+        cff_data += _index_bytes([dict_bytes(top_dict)])
+        cff_data += strings_and_subrs
+        for key, table_data in tables.items():
+            offsets[key] = len(cff_data)
+            cff_data += table_data
+    return bytes(cff_data)
+
+
+def _read_index(data, offset):
+    """Return the items in the INDEX at `offset` and the offset of the byte
+    following the INDEX"""
+    count, = struct.unpack_from('>H', data, offset)
+    if count == 0:
+        return [], offset + 2
+    offset_size = data[offset + 2]
+    offsets_start = offset + 3
+    offsets = [int.from_bytes(data[start:start + offset_size], 'big')
+               for start in range(offsets_start,
+                                  offsets_start + (count + 1) * offset_size,
+                                  offset_size)]
+    data_start = offsets_start + (count + 1) * offset_size - 1
+    items = [data[data_start + start:data_start + end]
+             for start, end in zip(offsets, offsets[1:])]
+    return items, data_start + offsets[-1]
+
+
+def _index_bytes(items):
+    if not items:
+        return bytes(2)
+    offsets = [1]
+    for item in items:
+        offsets.append(offsets[-1] + len(item))
+    offset_size = max(1, (offsets[-1].bit_length() + 7) // 8)
+    index = bytearray(struct.pack('>HB', len(items), offset_size))
+    for offset in offsets:
+        index += offset.to_bytes(offset_size, 'big')
+    for item in items:
+        index += item
+    return bytes(index)
+
+
+def _parse_dict(data):
+    """Return a list of (operator, operands) tuples for the DICT `data`
+
+    The operands are stored as a list of the integer values (`None` for real
+    numbers), with the list's `raw` attribute holding their encoded form.
+
+    """
+    entries = []
+    operands, raw = Operands(), bytearray()
+    index = 0
+    while index < len(data):
+        b0 = data[index]
+        start = index
+        if b0 <= 21:                    # operator
+            if b0 == 12:
+                operator = (12, data[index + 1])
+                index += 2
+            else:
+                operator = b0
+                index += 1
+            operands.raw = bytes(raw)
+            entries.append((operator, operands))
+            operands, raw = Operands(), bytearray()
+            continue
+        elif b0 == 28:
+            value, = struct.unpack_from('>h', data, index + 1)
+            index += 3
+        elif b0 == 29:
+            value, = struct.unpack_from('>i', data, index + 1)
+            index += 5
+        elif b0 == 30:                  # real number
+            value = None
+            index += 1
+            while (data[index] >> 4) != 0xf and (data[index] & 0xf) != 0xf:
+                index += 1
+            index += 1
+        elif 32 <= b0 <= 246:
+            value = b0 - 139
+            index += 1
+        elif 247 <= b0 <= 250:
+            value = (b0 - 247) * 256 + data[index + 1] + 108
+            index += 2
+        elif 251 <= b0 <= 254:
+            value = - (b0 - 251) * 256 - data[index + 1] - 108
+            index += 2
+        else:
+            raise ValueError('Invalid DICT data (byte {})'.format(b0))
+        operands.append(value)
+        raw += data[start:index]
+    return entries
+
+
+class Operands(list):
+    raw = b''
+
+
+def _dict_bytes(entries, replace):
+    """Encode the DICT `entries`, replacing the operands of the operators in
+    `replace` by the given integers (encoded in 5 bytes, so that the size of
+    the DICT doesn't depend on their values)"""
+    dict_data = bytearray()
+    for operator, operands in entries:
+        if operator in replace:
+            for value in replace[operator]:
+                dict_data += b'\x1d' + struct.pack('>i', value)
+        else:
+            dict_data += operands.raw
+        dict_data += bytes(operator if isinstance(operator, tuple)
+                           else (operator, ))
+    return bytes(dict_data)
+
+
+def _private_bytes(data, offset, size):
+    """Return the Private DICT at `offset` followed by its local subroutines,
+    which are located relative to the Private DICT"""
+    end = offset + size
+    for operator, values in _parse_dict(data[offset:end]):
+        if operator == SUBRS:
+            _, subrs_end = _read_index(data, offset + values[0])
+            end = max(end, subrs_end)
+    return data[offset:end]
+
+
+def _charset_length(data, offset, num_glyphs):
+    charset_format = data[offset]
+    if charset_format == 0:
+        return 1 + 2 * (num_glyphs - 1)
+    n_left_size = 1 if charset_format == 1 else 2
+    index = offset + 1
+    covered = 1     # .notdef is not included in the charset
+    while covered < num_glyphs:
+        n_left = int.from_bytes(data[index + 2:index + 2 + n_left_size], 'big')
+        covered += n_left + 1
+        index += 2 + n_left_size
+    return index - offset
+
+
+def _encoding_length(data, offset):
+    encoding_format = data[offset]
+    if encoding_format & 0x7f == 0:
+        length = 2 + data[offset + 1]
+    else:
+        length = 2 + 2 * data[offset + 1]
+    if encoding_format & 0x80:      # supplements
+        length += 1 + 3 * data[offset + length]
+    return length
+
+
+def _fd_select_length(data, offset, num_glyphs):
+    if data[offset] == 0:
+        return 1 + num_glyphs
+    num_ranges, = struct.unpack_from('>H', data, offset + 1)
+    return 1 + 2 + 3 * num_ranges + 2
@@ -8,6 +8,8 @@
 
 import struct
 
+from io import BytesIO
+
 from .parse import OpenTypeTable, MultiFormatTable, short
 
 
@@ -17,11 +19,23 @@ class GlyfTable(OpenTypeTable):
 
     def __init__(self, file, file_offset, loca_table):
         super().__init__(file, file_offset)
+        self._file = file
         self._file_offset = file_offset
-        for index, glyph_offset in enumerate(loca_table.offsets()):
-            if glyph_offset is not None:
-                self[index] = GlyphHeader(file, file_offset + glyph_offset)
-                # the glyph header is followed by the glyph description
+        self._glyph_offsets = list(loca_table.offsets())
+
+    def __contains__(self, index):
+        return (0 <= index < len(self._glyph_offsets)
+                and self._glyph_offsets[index] is not None)
+
+    def __missing__(self, index):
+        """Parse the header of glyph `index` when it is first looked up"""
+        if index not in self:
+            raise KeyError(index)
+        # the glyph header is followed by the glyph description
+        start = self._file_offset + self._glyph_offsets[index]
+        header_data = self._file[start:start + GLYPH_HEADER_SIZE]
+        glyph_header = self[index] = GlyphHeader(BytesIO(header_data), 0)
+        return glyph_header
 
 
 class GlyphHeader(OpenTypeTable):
@@ -36,6 +50,9 @@ class GlyphHeader(OpenTypeTable):
         return (self['xMin'], self['yMin'], self['xMax'], self['yMax'])
 
 
+GLYPH_HEADER_SIZE = 10
+
+
 class LocaTable(OpenTypeTable):
     """Glyph location table"""
     tag = 'loca'
@@ -6,6 +6,8 @@
 # Public License v3. See the LICENSE file or http://www.gnu.org/licenses/.
 
 
+import hashlib
+
 from itertools import chain
 
 from ..attribute import AttributesDictionary
@@ -36,19 +38,17 @@ class TreeNode(object):
         self.context = context
 
     def __getattr__(self, name):
-        for child in self.getchildren():
-            if child.tag_name == name:
-                return child
+        children = self._children_by_tag_name().get(name)
+        if children:
+            return children[0]
         raise AttributeError('No such element: {} in {}'.format(name, self))
 
     def __iter__(self):
-        try:
-            for child in self.parent.getchildren():
-                if child.tag_name == self.tag_name:
-                    yield child
-        except AttributeError:
-            # this is the root element
+        parent = self.parent
+        if parent is None:      # this is the root element
             yield self
+        else:
+            yield from parent._children_by_tag_name()[self.tag_name]
 
     @property
     def tag_name(self):
@@ -56,19 +56,58 @@ class TreeNode(object):
 
     @property
     def parent(self):
-        node_parent = self.node_parent(self.node)
-        if node_parent is not None:
-            return self.map_node(node_parent, **self.context)
+        try:
+            return vars(self)['_parent']
+        except KeyError:
+            node_parent = self.node_parent(self.node)
+            parent = (self.map_node(node_parent, **self.context)
+                      if node_parent is not None else None)
+            self._parent = parent
+            return parent
 
     def getchildren(self):
-        return [self.map_node(child, **self.context)
-                for child in self.node_children(self.node)]
+        """Return the list of child nodes, mapped to :class:`TreeNode`\\ s
+
+        The children are mapped only once; later calls return the same list,
+        which should not be modified."""
+        try:
+            return vars(self)['_children']
+        except KeyError:
+            children = self._children = [self.map_node(child, **self.context)
+                                         for child in
+                                         self.node_children(self.node)]
+            for child in children:
+                child._parent = self
+            return children
+
+    def _children_by_tag_name(self):
+        """Return a dictionary mapping tag names to the list of children with
+        this tag name (see :meth:`getchildren`)"""
+        try:
+            return vars(self)['_tag_index']
+        except KeyError:
+            index = self._tag_index = {}
+            for child in self.getchildren():
+                index.setdefault(child.tag_name, []).append(child)
+            return index
 
     @property
     def location(self):
         source_file, line, tag_name = self.node_location(self.node)
         return '{}:{} <{}>'.format(source_file, line, tag_name)
 
+    @property
+    def digest(self):
+        """A hash of the content of this node and its descendants
+
+        Used by the layout cache to detect changes to the input."""
+        try:
+            return vars(self)['_digest']
+        except KeyError:
+            content = self.node_content(self.node)
+            digest = self._digest = hashlib.sha1(content).hexdigest()
+            return digest
+
     @staticmethod
     def node_tag_name(node):
         raise NotImplementedError
@@ -85,6 +124,12 @@ class TreeNode(object):
     def node_location(node):
         raise NotImplementedError
 
+    @staticmethod
+    def node_content(node):
+        """Return a serialization (:class:`bytes`) of `node` including its
+        attributes and descendants"""
+        raise NotImplementedError
+
     @property
     def text(self):
         raise NotImplementedError
@@ -41,6 +41,10 @@ class DocutilsNode(TreeNode, metaclass=TreeNodeMeta):
     def node_location(node):
         return node.source, node.line, node.tagname
 
+    @staticmethod
+    def node_content(node):
+        return node.pformat().encode('utf-8')
+
     @property
     def _ids(self):
         return self.get('ids')
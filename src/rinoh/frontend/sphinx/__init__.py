@@ -7,6 +7,8 @@
 
 
 import os
+import warnings
+
 from os import path
 
 import docutils
@@ -20,6 +22,7 @@ from sphinx.util.console import bold, darkgreen, brown
 from sphinx.util.nodes import inline_all_toctrees
 from sphinx.util.osutil import ensuredir, os_path, SEP
 from sphinx.util import logging
+from sphinx.util.parallel import ParallelTasks, SerialTasks, parallel_available
 from sphinx.util.i18n import format_date
 
 from rinoh.flowable import StaticGroupedFlowables
@@ -208,7 +211,11 @@ class RinohBuilder(Builder):
         return document_data
 
     def write(self, *ignored):
-        document_data = self.init_document_data()
+        document_data = self.init_document_data() or []
+        nproc = min(self.app.parallel, len(document_data))
+        parallel = (nproc > 1 and parallel_available
+                    and self.app.is_parallel_allowed('write'))
+        tasks = ParallelTasks(nproc) if parallel else SerialTasks()
         for entry in document_data:
             docname, targetname, title, author = entry[:4]
             toctree_only = entry[4] if len(entry) > 4 else False
@@ -221,10 +228,33 @@ class RinohBuilder(Builder):
             doctree.settings.author = author
             doctree.settings.title = title
             doctree.settings.docname = docname
-            self.write_doc(docname, doctree, docnames, targetname)
-            logger.info("done")
-
-    def write_doc(self, docname, doctree, docnames, targetname):
+            args = docname, doctree, docnames, targetname
+            if parallel:
+                tasks.add_task(self._write_doc_in_worker, args,
+                               self._write_doc_in_worker_done)
+            else:
+                self.write_doc(*args)
+                logger.info("done")
+        tasks.join()
+
+    def _write_doc_in_worker(self, args):
+        """Render a document in a worker process
+
+        Warnings are returned to the main process instead of being printed
+        in between the output of the other workers."""
+        with warnings.catch_warnings(record=True) as caught:
+            self.write_doc(*args, progress_reporters=[])
+        return [(str(warning.message), warning.category, warning.filename,
+                 warning.lineno) for warning in caught]
+
+    def _write_doc_in_worker_done(self, args, caught_warnings):
+        docname, doctree, docnames, targetname = args
+        for message, category, filename, lineno in caught_warnings:
+            warnings.warn_explicit(message, category, filename, lineno)
+        logger.info(darkgreen(targetname) + " done")
+
+    def write_doc(self, docname, doctree, docnames, targetname,
+                  progress_reporters=None):
         config = self.config
         rinoh_tree = from_doctree(doctree['source'], doctree,
                                   sphinx_builder=self)
@@ -244,7 +274,8 @@ class RinohBuilder(Builder):
         rinoh_document.metadata['date'] = date
         outfilename = path.join(self.outdir, os_path(targetname))
         ensuredir(path.dirname(outfilename))
-        rinoh_document.render(outfilename)
+        rinoh_document.render(outfilename,
+                              progress_reporters=progress_reporters)
 
 
 def template_from_config(config, confdir, warn):
@@ -344,4 +375,6 @@ def setup(app):
     app.add_config_value('rinoh_logo', default_logo, 'html')
     app.add_config_value('rinoh_domain_indices', default_domain_indices, 'html')
     app.add_config_value('rinoh_template', 'book', 'html')
-    return dict(version=rinoh_version)
+    return dict(version=rinoh_version,
+                parallel_read_safe=True,
+                parallel_write_safe=True)
@@ -38,11 +38,13 @@ RE_WHITESPACE = re.compile('[\t\r\n ]+')
 
 
 def ends_with_space(node):
-    while node.getchildren():
-        node = node.getchildren()[-1]
+    children = node.getchildren()
+    while children:
+        node = children[-1]
         if node.tail:
             text = node.tail
             break
+        children = node.getchildren()
     else:
         text = node.text or ''
     return text.endswith(' ')
@@ -108,6 +110,13 @@ class ElementTreeNode(TreeNode):
         return (node._root._filename, node.sourceline,
                 __class__.node_tag_name(node))
 
+    @staticmethod
+    def node_content(node):
+        return ''.join(repr((element.tag, sorted(element.attrib.items()),
+                             element.text, element.tail))
+                       for element in node.iter()
+                       if isinstance(element.tag, str)).encode('utf-8')
+
     @property
     def _id(self):
         return self.get('id')
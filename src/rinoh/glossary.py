@@ -29,6 +29,7 @@ class GlossaryTermStyle(TextStyle):
 # TODO: inherit from Reference(Base) to hyperlink to the glossary entry
 class GlossaryTerm(MixedStyledTextBase):
     style_class = GlossaryTermStyle
+    layout_cacheable = False
 
     def __init__(self, term, definition=None, id=None, style=None, parent=None):
         super().__init__(id=id, style=style, parent=parent)
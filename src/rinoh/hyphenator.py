@@ -18,8 +18,17 @@ License: LGPL. More info: http://python-hyphenator.googlecode.com/
 
 """
 
-import sys
+import json
+import mmap
+import os
 import re
+import struct
+import sys
+
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from hashlib import md5
 
 __all__ = ("Hyphenator")
 
@@ -75,15 +84,13 @@ class dint(int):
         return obj
 
 
-class Hyph_dict(object):
+def read_patterns(filename):
     """
-    Reads a hyph_*.dic file and stores the hyphenation patterns.
-    Parameters:
-    -filename : filename of hyph_*.dic to read
+    Reads a hyph_*.dic file and returns the hyphenation patterns as a
+    dictionary mapping each pattern's letters to a (start, values) tuple.
     """
-    def __init__(self, filename):
-        self.patterns = {}
-        f = open(filename, 'rb')
+    patterns = {}
+    with open(filename, 'rb') as f:
         charset = f.readline().strip().decode('ASCII')
         if charset.startswith('charset '):
             charset = charset[8:].strip()
@@ -106,10 +113,223 @@ class Hyph_dict(object):
             start, end = 0, len(value)
             while not value[start]: start += 1
             while not value[end-1]: end -= 1
-            self.patterns[''.join(tag)] = start, value[start:end]
-        f.close()
-        self.cache = {}
-        self.maxlen = max(map(len, self.patterns.keys()))
+            patterns[''.join(tag)] = start, value[start:end]
+    return patterns
+
+
+# compiled pattern tries (see compile_patterns)
+COMPILED_EXTENSION = '.rhyph'
+COMPILED_MAGIC = b'RHYPH1' + sys.byteorder[0].encode('ascii') + b'\0'
+COMPILED_HEADER = struct.Struct('=8sqqIIIII')
+
+
+def compile_patterns(patterns, mtime_ns=0, size=0):
+    """
+    Compiles the patterns returned by read_patterns into a trie, serialized
+    as a number of arrays that can be used directly from a memory-mapped
+    file. The modification time and size of the dictionary file are stored
+    in the header so that an outdated compiled file can be detected.
+    """
+    root = {}
+    for tag, value in patterns.items():
+        node = root
+        for char in tag:
+            node = node.setdefault(char, {})
+        node[None] = value
+
+    edge_start, node_value = array('I'), array('i')
+    edge_char, edge_child = array('I'), array('I')
+    value_start, value_offset, digits = array('I', [0]), array('I'), array('B')
+    alternatives = {}
+    nodes = [root]
+    for node in nodes:      # breadth-first; nodes is extended while iterating
+        edge_start.append(len(edge_char))
+        value = node.get(None)
+        if value is None:
+            node_value.append(-1)
+        else:
+            offset, values = value
+            index = len(value_offset)
+            node_value.append(index)
+            value_offset.append(offset)
+            digits.extend(values)
+            value_start.append(len(digits))
+            data = [getattr(v, 'data', None) for v in values]
+            if any(data):
+                alternatives[index] = data
+        for char in sorted(char for char in node if char is not None):
+            edge_char.append(ord(char))
+            edge_child.append(len(nodes))
+            nodes.append(node[char])
+    edge_start.append(len(edge_char))
+    header = COMPILED_HEADER.pack(COMPILED_MAGIC, mtime_ns, size, len(nodes),
+                                  len(edge_char), len(value_offset),
+                                  len(digits), len(alternatives))
+    return b''.join([header, edge_start.tobytes(), node_value.tobytes(),
+                     edge_char.tobytes(), edge_child.tobytes(),
+                     value_start.tobytes(), value_offset.tobytes(),
+                     digits.tobytes(),
+                     json.dumps(alternatives).encode('utf-8')])
+
+
+def user_cache_directory():
+    """
+    Returns the directory in which rinohtype stores the compiled hyphenation
+    dictionaries for the current user.
+    """
+    if sys.platform == 'win32':
+        cache_dir = os.environ.get('LOCALAPPDATA', os.path.expanduser('~'))
+    elif sys.platform == 'darwin':
+        cache_dir = os.path.expanduser('~/Library/Caches')
+    else:
+        cache_dir = (os.environ.get('XDG_CACHE_HOME')
+                     or os.path.expanduser('~/.cache'))
+    return os.path.join(cache_dir, 'rinohtype', 'hyphen')
+
+
+def compiled_filenames(filename, next_to_dictionary=False):
+    """
+    Yields the candidate locations of the compiled version of the hyphenation
+    dictionary `filename`: in the user's cache directory and, if
+    `next_to_dictionary` is true, next to the dictionary. The dictionary's
+    directory is typically part of an installed package, so it is not written
+    to by default.
+    """
+    root, _ = os.path.splitext(filename)
+    path_hash = md5(os.path.realpath(filename).encode('utf-8')).hexdigest()
+    yield os.path.join(user_cache_directory(),
+                       '{}-{}{}'.format(os.path.basename(root), path_hash[:8],
+                                        COMPILED_EXTENSION))
+    if next_to_dictionary:
+        yield root + COMPILED_EXTENSION
+
+
+class PatternTrie(object):
+    """
+    Hyphenation patterns compiled by compile_patterns, read from `buffer`
+    (a bytes object or a memory-mapped file) without copying.
+    """
+    def __init__(self, buffer):
+        view = memoryview(buffer)
+        (magic, self.mtime_ns, self.size, num_nodes, num_edges, num_values,
+         num_digits, _) = COMPILED_HEADER.unpack_from(view)
+        if magic != COMPILED_MAGIC:
+            raise ValueError('Not a compiled hyphenation dictionary')
+        offset = COMPILED_HEADER.size
+        arrays_size = (4 * (2 * num_nodes + 2 * num_edges + 2 * num_values + 2)
+                       + num_digits)
+        if len(view) < offset + arrays_size:
+            raise ValueError('Truncated compiled hyphenation dictionary')
+
+        def section(count, typecode):
+            nonlocal offset
+            end = offset + count * (1 if typecode == 'B' else 4)
+            data = view[offset:end].cast(typecode)
+            offset = end
+            return data
+
+        self.edge_start = section(num_nodes + 1, 'I')
+        self.node_value = section(num_nodes, 'i')
+        self.edge_char = section(num_edges, 'I')
+        self.edge_child = section(num_edges, 'I')
+        self.value_start = section(num_values + 1, 'I')
+        self.value_offset = section(num_values, 'I')
+        self.digits = section(num_digits, 'B')
+        self.alternatives = {int(index): [tuple(d) if d else None
+                                          for d in data]
+                             for index, data
+                             in json.loads(bytes(view[offset:])).items()}
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Memory-maps the compiled dictionary `filename`.
+        """
+        with open(filename, 'rb') as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer)
+
+    def positions(self, word):
+        """
+        Returns the hyphenation points for word (see Hyph_dict.positions).
+        """
+        prepWord = '.%s.' % word
+        codes = [ord(char) for char in prepWord]
+        length = len(codes)
+        res = [0] * (length + 1)
+        data = [None] * (length + 1)
+        edge_start, edge_char = self.edge_start, self.edge_char
+        edge_child, node_value = self.edge_child, self.node_value
+        for i in range(length - 1):
+            node = 0
+            for code in codes[i:]:
+                lo, hi = edge_start[node], edge_start[node + 1]
+                k = bisect_left(edge_char, code, lo, hi)
+                if k == hi or edge_char[k] != code:
+                    break
+                node = edge_child[k]
+                index = node_value[node]
+                if index >= 0:
+                    self._apply(index, i, res, data)
+        return [dint(i - 1, data[i]) for i, r in enumerate(res) if r % 2]
+
+    def _apply(self, index, i, res, data):
+        start = i + self.value_offset[index]
+        values = self.digits[self.value_start[index]:
+                             self.value_start[index + 1]]
+        alternatives = self.alternatives.get(index)
+        for j, value in enumerate(values, start):
+            if value >= res[j]:
+                res[j] = value
+                data[j] = alternatives[j - start] if alternatives else None
+
+
+# maximum number of words for which Hyph_dict caches the hyphenation points
+POSITIONS_CACHE_SIZE = 16384
+
+
+class Hyph_dict(object):
+    """
+    Reads a hyph_*.dic file and stores the hyphenation patterns.
+    The patterns are compiled into a trie, which is stored in the user's
+    cache directory. On subsequent runs, the compiled trie is memory-mapped
+    instead of parsing the patterns.
+    Parameters:
+    -filename : filename of hyph_*.dic to read
+    -next_to_dictionary: if true, store the compiled trie next to the
+        dictionary file when the cache directory is not writable
+    """
+    def __init__(self, filename, next_to_dictionary=False):
+        self.trie = self._load_trie(filename, next_to_dictionary)
+        self._positions = lru_cache(maxsize=POSITIONS_CACHE_SIZE)(
+            self.trie.positions)
+
+    @staticmethod
+    def _load_trie(filename, next_to_dictionary):
+        stat = os.stat(filename)
+        candidates = list(compiled_filenames(filename, next_to_dictionary))
+        for compiled_filename in candidates:
+            try:
+                trie = PatternTrie.load(compiled_filename)
+            except (OSError, ValueError, struct.error):
+                continue
+            if (trie.mtime_ns, trie.size) == (stat.st_mtime_ns,
+                                              stat.st_size):
+                return trie
+        compiled = compile_patterns(read_patterns(filename),
+                                    stat.st_mtime_ns, stat.st_size)
+        for compiled_filename in candidates:
+            try:
+                os.makedirs(os.path.dirname(compiled_filename),
+                            exist_ok=True)
+                temp_filename = '{}.{}'.format(compiled_filename, os.getpid())
+                with open(temp_filename, 'wb') as file:
+                    file.write(compiled)
+                os.replace(temp_filename, compiled_filename)
+                break
+            except OSError:
+                continue
+        return PatternTrie(compiled)
 
     def positions(self, word):
         """
@@ -128,23 +348,10 @@ class Hyph_dict(object):
             point
         cut: how many characters to remove while substituting the nonstandard
             hyphenation
+
+        The positions for the most recently hyphenated words are cached.
         """
-        word = word.lower()
-        points = self.cache.get(word)
-        if points is None:
-            prepWord = '.%s.' % word
-            res = [0] * (len(prepWord) + 1)
-            for i in range(len(prepWord) - 1):
-                for j in range(i + 1, min(i + self.maxlen, len(prepWord)) + 1):
-                    p = self.patterns.get(prepWord[i:j])
-                    if p:
-                        offset, value = p
-                        s = slice(i + offset, i + offset + len(value))
-                        res[s] = map(max, value, res[s])
-
-            points = [dint(i - 1, ref=r) for i, r in enumerate(res) if r % 2]
-            self.cache[word] = points
-        return points
+        return self._positions(word.lower())
 
 
 class Hyphenator(object):
@@ -237,7 +237,7 @@ class ImageBase(Flowable):
                 source_root = container.document.document_tree.source_root
                 abs_filename = source_root / posix_filename
                 filename_or_file = os.path.normpath(str(abs_filename))
-            image = container.document.backend.Image(filename_or_file)
+            image = container.document.get_image(filename_or_file)
         except OSError as err:
             container.document.error = True
             message = "Error opening image file: {}".format(err)
@@ -40,6 +40,7 @@ class IndexStyle(GroupedFlowablesStyle):
 class Index(GroupedFlowables):
     style_class = IndexStyle
     location = 'index'
+    layout_cacheable = False
 
     def __init__(self, id=None, style=None, parent=None):
         super().__init__(id=id, style=style, parent=parent)
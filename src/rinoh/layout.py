@@ -531,7 +531,7 @@ class FootnoteContainer(UpExpandingContainer):
         while self.footnote_queue:
             footnote = self.footnote_queue.popleft()
             footnote_id = footnote.get_id(self.document)
-            if footnote_id not in self.document.placed_footnotes:
+            if not self.document.is_footnote_placed(footnote_id):
                 _, _, descender = footnote.flow(maybe_container,
                                                 self._descenders[-1])
                 self._descenders.append(descender)
@@ -575,6 +575,29 @@ class Chain(FlowableTarget):
     def last_container(self):
         return self.containers[-1]
 
+    def save_state(self):
+        """Return a snapshot of this chain's rendering state that can be passed
+        to :meth:`restore_state` to resume rendering from this point."""
+        return (copy(self._state), copy(self._fresh_page_state),
+                self._rerendering, self.done, len(self.containers))
+
+    def restore_state(self, saved_state):
+        """Restore the rendering state saved by :meth:`save_state`, dropping
+        the containers that were added to this chain since."""
+        (state, fresh_page_state, self._rerendering, self.done,
+         number_of_containers) = saved_state
+        self._state = copy(state)
+        self._fresh_page_state = copy(fresh_page_state)
+        del self.containers[number_of_containers:]
+
+    def set_state(self, state):
+        """Continue rendering from `state` in the next container. If `state`
+        is `None`, all flowables are considered rendered."""
+        self._state = state
+        self._fresh_page_state = copy(state)
+        self._rerendering = False
+        self.done = state is None
+
     def render(self, container, rerender=False):
         """Flow the flowables into the containers that have been added to this
         chain."""
@@ -0,0 +1,553 @@
+# This file is part of rinohtype, the Python document preparation system.
+#
+# Copyright (c) Brecht Machiels.
+#
+# Use of this source code is subject to the terms of the GNU Affero General
+# Public License v3. See the LICENSE file or http://www.gnu.org/licenses/.
+
+"""
+Persistent cache of the pages rendered for a document, reused across builds.
+
+The pages of each document part are grouped into runs. A run starts on a page
+where the part's chain resumes rendering at the start of a flowable (typically
+a chapter or section) and ends where the next run starts. Each run is stored
+along with:
+
+* a hash of the source of the flowables rendered to it,
+* the values its pages looked up while rendering (page references, page
+  counts, references, current sections and placed footnotes and floats), and
+* fingerprints of the elements referenced by these pages.
+
+When rendering the document again, a run is reused when the chain arrives at
+the same position on the same page number and none of the above have changed.
+The run's pages are then recreated from the stored page contents instead of
+rendering the flowables again.
+
+The cache is discarded as a whole when the rinohtype version, the document
+template or its configuration, the style sheet, the language or the document
+metadata change.
+
+"""
+
+import hashlib
+import pickle
+
+from . import __version__
+from .attribute import RuleSet
+from .element import DocumentElement
+from .flowable import GroupedFlowables, GroupedFlowablesState
+from .font import Typeface
+from .resource import ResourceNotInstalled
+from .style import Selector, DocumentLocationSelector
+
+
+__all__ = ['LayoutCache', 'CachedRun', 'CachedPage', 'chain_position',
+           'set_chain_position', 'document_signature']
+
+
+def chain_position(chain):
+    """Return the position of the next flowable to be rendered by `chain`
+
+    The position is a tuple holding an (index, initial) pair for each level
+    of nested :class:`GroupedFlowables`, pointing to the flowable to render
+    next. Returns `None` if the chain is halfway rendering a flowable that is
+    not a :class:`GroupedFlowables`.
+
+    """
+    state = chain._state
+    position = []
+    while state is not None:
+        if not isinstance(state, GroupedFlowablesState):
+            return None
+        position.append((state._index, state.initial))
+        child_state = state.first_flowable_state
+        if child_state is None or child_state.initial:
+            break
+        state = child_state
+    return tuple(position)
+
+
+def _position_groups(chain, position, container):
+    """Return the :class:`GroupedFlowables` along `position` in `chain`, each
+    with the list of flowables it groups, or `None` if `position` does not
+    match the chain's flowables"""
+    group = chain.flowables
+    groups = []
+    for level in range(max(len(position), 1)):
+        flowables = group.initial_state(container).flowables
+        groups.append((group, flowables))
+        if level + 1 < len(position):
+            index, _ = position[level]
+            try:
+                group = flowables[index]
+            except IndexError:
+                return None
+            if not isinstance(group, GroupedFlowables):
+                return None
+    return groups
+
+
+def _position_state(groups, position):
+    """Create the chain state that resumes rendering at `position`"""
+    top_state = parent_state = None
+    for (group, flowables), (index, initial) in zip(groups, position):
+        state = GroupedFlowablesState(group, flowables, _initial=initial,
+                                      _index=index)
+        if parent_state:
+            parent_state.first_flowable_state = state
+        else:
+            top_state = state
+        parent_state = state
+    return top_state
+
+
+def set_chain_position(chain, position, container):
+    """Make `chain` resume rendering at `position` (see
+    :func:`chain_position`)
+
+    Returns `False` if `position` does not match the chain's flowables.
+
+    """
+    groups = _position_groups(chain, position, container)
+    if not groups:
+        return False
+    if position:
+        chain.set_state(_position_state(groups, position))
+    return True
+
+
+def _source_digest(element):
+    try:
+        return element.source.digest
+    except (AttributeError, NotImplementedError):
+        return None
+
+
+def _flowables_digest(groups, start, end):
+    """Return a hash of the sources of the flowables rendered from position
+    `start` up to position `end`, or up to the end of the chain if `end` is
+    `None`
+
+    The hashes of the sources of the :class:`GroupedFlowables` containing
+    these flowables are included, since these can affect the flowables'
+    styling. Returns `None` if any of the flowables has no source.
+
+    """
+    indices = [index for index, _ in start] or [0]
+    descriptions = ['{}:{}'.format(type(group).__name__, _source_digest(group))
+                    for group, _ in groups[:-1]]
+    _, flowables = groups[-1]
+    if (end is not None and len(end) == len(indices)
+            and [index for index, _ in end[:-1]] == indices[:-1]):
+        covered = flowables[indices[-1]:end[-1][0]]
+    else:
+        covered = list(flowables[indices[-1]:])
+        for (_, group_flowables), index in zip(reversed(groups[:-1]),
+                                               reversed(indices[:-1])):
+            covered.extend(group_flowables[index + 1:])
+    for flowable in covered:
+        digest = _source_digest(flowable)
+        if digest is None:
+            return None
+        descriptions.append('{}:{}'.format(type(flowable).__name__, digest))
+    return hashlib.sha1('\n'.join(descriptions).encode('utf-8')).hexdigest()
+
+
+def element_fingerprint(document, id):
+    """Return the type of the element identified by `id` and a hash of its
+    source, or `None` if no such element exists
+
+    Identifiers generated by the frontend or by rinohtype can refer to
+    another element after the input was modified. Comparing fingerprints
+    detects this.
+
+    """
+    element = document.elements.get(id)
+    if element is None and isinstance(id, str) and id.isdigit():
+        element = document.elements.get(int(id))     # named destination
+    if element is None:
+        return None
+    return type(element).__name__, _source_digest(element)
+
+
+def _describe_selector(selector):
+    """Return a reproducible description of a style selector"""
+    if isinstance(selector, type):
+        return '{}.{}'.format(selector.__module__, selector.__qualname__)
+    elif isinstance(selector, (list, tuple)):
+        items = (_describe_selector(item) for item in selector)
+        return '({})'.format(', '.join(items))
+    elif isinstance(selector, dict):
+        items = ('{}={}'.format(key, _describe_selector(value))
+                 for key, value in sorted(selector.items()))
+        return '{{{}}}'.format(', '.join(items))
+    elif isinstance(selector, (Selector, DocumentLocationSelector)):
+        items = ('{}={}'.format(name, _describe_selector(value))
+                 for name, value in sorted(vars(selector).items()))
+        return '{}({})'.format(type(selector).__name__, ', '.join(items))
+    return repr(selector)
+
+
+def _describe_ruleset(ruleset):
+    while isinstance(ruleset, RuleSet):
+        yield '{}({!r})'.format(type(ruleset).__name__, ruleset.name)
+        for name, value in ruleset.variables.items():
+            yield '${} = {!r}'.format(name, value)
+        for name, entry in ruleset.items():
+            yield '[{}] {!r}'.format(name, getattr(entry, 'base', None))
+            for attribute, value in entry.items():
+                yield '{}.{} = {!r}'.format(name, attribute, value)
+        matcher = getattr(ruleset, 'matcher', None)
+        if matcher is not None:
+            from .stylesheets import matcher as default_matcher
+            if matcher is not default_matcher:
+                for name, selector in matcher.by_name.items():
+                    yield '{}: {}'.format(name, _describe_selector(selector))
+        ruleset = ruleset.base
+    yield repr(ruleset)
+
+
+def _describe_value(value):
+    if isinstance(value, DocumentElement):
+        digest = _source_digest(value)
+        if digest:
+            return '{}:{}'.format(type(value).__name__, digest)
+    return repr(value)
+
+
+def document_signature(document):
+    """Return a hash of everything but the document tree that affects the
+    rendered output
+
+    This covers the rinohtype version, the document template and its
+    configuration, the style sheet, the language and the document metadata.
+    Returns `None` if some of these cannot be represented reproducibly.
+
+    """
+    items = [__version__, type(document).__module__,
+             type(document).__qualname__, document.backend.__name__,
+             repr(document.language.code)]
+    configuration = getattr(document, 'configuration', None)
+    if configuration is not None:
+        items.extend(_describe_ruleset(configuration))
+    items.extend(_describe_ruleset(document.stylesheet))
+    for key, value in sorted(document.metadata.items()):
+        items.append('{} = {}'.format(key, _describe_value(value)))
+    signature = '\n'.join(items)
+    if ' at 0x' in signature:   # default object representation
+        return None
+    return hashlib.sha1(signature.encode('utf-8')).hexdigest()
+
+
+def _find_font(typeface_name, filename):
+    typeface = Typeface(typeface_name)
+    for slants in typeface.values():
+        for weights in slants.values():
+            for font in weights.values():
+                if font.filename == filename:
+                    return font
+    raise KeyError(filename)
+
+
+class CachedPage(object):
+    """The stored content of a page and the values looked up to render it
+
+    Fonts are stored by the name of the typeface they belong to and their
+    filename and images by their filename, so that these can be loaded again
+    when the page is reused.
+
+    """
+
+    def __init__(self, number, new_chapter, content, fonts, images,
+                 annotations, lookups, current_sections, registered_ids,
+                 floats, placed_footnotes):
+        self.number = number
+        self.new_chapter = new_chapter
+        self.content = content
+        self.fonts = fonts
+        self.images = images
+        self.annotations = annotations
+        self.lookups = lookups
+        self.current_sections = current_sections
+        self.registered_ids = registered_ids
+        self.floats = floats
+        self.placed_footnotes = placed_footnotes
+
+    @classmethod
+    def from_record(cls, record):
+        """Create a :class:`CachedPage` for the single page covered by
+        `record` (:class:`PageRecord`), or return `None` if the page's fonts
+        or images cannot be stored"""
+        page, = record.pages
+        content, fonts, images, annotations = page.backend_page.get_content()
+        font_keys = {}
+        for font_name, font in fonts.items():
+            if font.encoding is not None or font.typeface is None:
+                return None     # the font's encoding is built incrementally
+            font_keys[font_name] = font.typeface.name, font.filename
+        image_filenames = {}
+        for image_number, image in images.items():
+            if image.filename is None:
+                return None
+            image_filenames[image_number] = image.filename
+        registered_ids = [id for id, _ in record.registered_ids]
+        return cls(page.number, record.new_chapter, content, font_keys,
+                   image_filenames, annotations, dict(record.lookups),
+                   dict(record.current_sections), registered_ids,
+                   set(record.floats), set(record.placed_footnotes))
+
+    @property
+    def referenced_ids(self):
+        """The IDs of the elements placed on or referenced by this page"""
+        ids = set(self.registered_ids) | self.floats | self.placed_footnotes
+        ids.update(id for id in self.current_sections.values()
+                   if id is not None)
+        for kind, key in self.lookups:
+            if kind == 'reference':
+                ids.add(key[0])
+            elif kind != 'part page count':
+                ids.add(key)
+        for annotation_location in self.annotations:
+            annotation = annotation_location.annotation
+            if annotation.type == 'NamedDestination':
+                ids.update(annotation.names)
+            elif annotation.type == 'NamedDestinationLink':
+                ids.add(annotation.name)
+        return ids
+
+    def load_resources(self, document):
+        """Return the fonts and images used on this page, mapped to their
+        name and number in :attr:`content` respectively"""
+        fonts = {font_name: _find_font(*font_key)
+                 for font_name, font_key in self.fonts.items()}
+        images = {image_number: document.get_image(filename)
+                  for image_number, filename in self.images.items()}
+        return fonts, images
+
+
+class CachedRun(object):
+    """A sequence of pages rendered for the flowables between two positions
+    in the chain of a document part
+
+    Args:
+        part_name (str): name of the document part's template
+        start (tuple): the chain position (see :func:`chain_position`) the
+            first page starts at
+        end (tuple): the chain position the page following the run starts at,
+            or `None` if the chain ends on the run's last page
+        new_chapter (bool): whether the first page starts a new chapter
+        digest (str): hash of the sources of the flowables rendered to the run
+        fingerprints (dict): the fingerprints of the elements referenced by the
+            run's pages (see :func:`element_fingerprint`), by ID
+        pages (list[CachedPage]): the pages in this run
+        break_type: the page break requested by the last page
+        continued (bool): whether the chain continues on the next page
+
+    """
+
+    def __init__(self, part_name, start, end, new_chapter, digest,
+                 fingerprints, pages, break_type, continued):
+        self.part_name = part_name
+        self.start = start
+        self.end = end
+        self.new_chapter = new_chapter
+        self.digest = digest
+        self.fingerprints = fingerprints
+        self.pages = pages
+        self.break_type = break_type
+        self.continued = continued
+
+    @property
+    def key(self):
+        first_page_number = self.pages[0].number
+        return self.part_name, self.start, first_page_number, self.new_chapter
+
+
+class LayoutCache(object):
+    """Stores the pages rendered for a document, so that these can be reused
+    when the document is rendered again
+
+    Args:
+        signature (str): the document's signature (see
+            :func:`document_signature`); the cache is disabled if `None`
+        runs (dict): :class:`CachedRun`\\ s stored by a previous build, by key
+
+    """
+
+    def __init__(self, signature, runs=None):
+        self.signature = signature
+        self.runs = runs or {}
+        self.reused_pages = 0
+
+    @classmethod
+    def load(cls, path, document):
+        """Load the cached runs stored in the file at `path` if they were
+        stored for a document with the same signature as `document`"""
+        signature = document_signature(document)
+        try:
+            with path.open('rb') as file:
+                cached_signature, runs = pickle.load(file)
+        except (IOError, EOFError, TypeError, ValueError, AttributeError,
+                ImportError, pickle.UnpicklingError):
+            runs = {}
+        else:
+            if signature is None or cached_signature != signature:
+                runs = {}
+            else:
+                print('Layout cache read from {}'.format(path))
+        return cls(signature, runs)
+
+    def save(self, path, document_parts):
+        """Store the runs of pages rendered for `document_parts` in the file
+        at `path`"""
+        if self.signature is None:
+            return
+        runs = {}
+        for part in document_parts:
+            for run in self._create_runs(part):
+                runs[run.key] = run
+        with path.open('wb') as file:
+            pickle.dump((self.signature, runs), file)
+
+    def _create_runs(self, part, final_position=None):
+        """Create runs for the pages rendered for `part`
+
+        `final_position` is the chain position following the last page, if
+        rendering was stopped before the end of the chain."""
+        records = part._page_records
+        starts = [index for index, record in enumerate(records)
+                  if record.position is not None]
+        for start, end in zip(starts, starts[1:] + [len(records)]):
+            first_record = records[start]
+            if first_record.cached_run:
+                yield first_record.cached_run
+                continue
+            end_position = (records[end].position if records[end:]
+                            else final_position)
+            run = self._create_run(part, records[start:end], end_position)
+            if run:
+                yield run
+
+    def _create_run(self, part, records, end):
+        if not all(record.cacheable for record in records):
+            return None
+        first_record, last_record = records[0], records[-1]
+        start = first_record.position
+        groups = _position_groups(part.chain, start, first_record.pages[0])
+        digest = groups and _flowables_digest(groups, start, end)
+        if digest is None:
+            return None
+        pages = []
+        for record in records:
+            page = CachedPage.from_record(record)
+            if page is None:
+                return None
+            pages.append(page)
+        document = part.document
+        fingerprints = {id: element_fingerprint(document, id)
+                        for page in pages for id in page.referenced_ids}
+        if any(fingerprint is None or fingerprint[1] is None
+               for fingerprint in fingerprints.values()):
+            return None
+        return CachedRun(part.template.name, start, end,
+                         first_record.new_chapter, digest, fingerprints, pages,
+                         last_record.break_type, last_record.continued)
+
+    def replay(self, part, page, new_chapter):
+        """Reuse the pages stored for the flowables at the current position of
+        the chain of `part` (:class:`DocumentPart`)
+
+        `page` is the page that was created to render these flowables. It
+        becomes the first page of the replayed run.
+
+        Returns:
+            PageRecord: a record covering the replayed pages, or `None` if no
+                (valid) pages were stored for this position
+
+        """
+        chain = part.chain
+        position = chain_position(chain)
+        if position is None:
+            return None
+        run = self.runs.get((part.template.name, position, page.number,
+                             new_chapter))
+        if run is None:
+            return None
+        document = part.document
+        groups = _position_groups(chain, position, page)
+        if (not groups
+                or _flowables_digest(groups, position, run.end) != run.digest
+                or any(element_fingerprint(document, id) != fingerprint
+                       for id, fingerprint in run.fingerprints.items())):
+            return None
+        end_groups = None
+        if run.continued:
+            end_groups = _position_groups(chain, run.end, page)
+            if not end_groups:
+                return None
+        try:
+            resources = [cached_page.load_resources(document)
+                         for cached_page in run.pages]
+        except (KeyError, IOError, ResourceNotInstalled):
+            return None
+        from .document import PageRecord
+        chain_state = chain.save_state()
+        page_elements = dict(document.page_elements)
+        page_references = dict(document.page_references)
+        floats = set(document.floats)
+        placed_footnotes = set(document.placed_footnotes)
+        record = PageRecord([], new_chapter,
+                            chain_state if document.incremental else None,
+                            position)
+        record.cached_run = run
+        if not self._replay_pages(part, page, run, record):
+            chain.restore_state(chain_state)
+            part._discard_pages(record.pages[1:])
+            document.page_elements.clear()
+            document.page_elements.update(page_elements)
+            document.page_references.clear()
+            document.page_references.update(page_references)
+            document.floats.intersection_update(floats)
+            document.placed_footnotes.intersection_update(placed_footnotes)
+            return None
+        for replayed_page, cached_page, (fonts, images) \
+                in zip(record.pages, run.pages, resources):
+            replayed_page.backend_page.set_content(cached_page.content, fonts,
+                                                   images,
+                                                   cached_page.annotations)
+            replayed_page.canvas.place_annotations()
+        chain.set_state(_position_state(end_groups, run.end)
+                        if run.continued else None)
+        record.break_type = run.break_type
+        record.continued = run.continued
+        self.reused_pages += len(record.pages)
+        return record
+
+    def _replay_pages(self, part, first_page, run, record):
+        """Create the pages for `run`, checking the values they looked up and
+        applying their side effects to the document. Return `False` if a
+        looked up value changed."""
+        document = part.document
+        for cached_page in run.pages:
+            page = (part.new_page(cached_page.number, cached_page.new_chapter)
+                    if record.pages else first_page)
+            record.pages.append(page)
+            if any(document.lookup(kind, key) != value
+                   for (kind, key), value in cached_page.lookups.items()):
+                return False
+            for id in cached_page.registered_ids:
+                document.page_elements[id] = page
+                document.page_references[id] = page.formatted_number
+                record.registered_ids.append((id, page))
+            for level, section_id in cached_page.current_sections.items():
+                section = page.get_current_section(level)
+                current_id = section.get_id(document) if section else None
+                if current_id != section_id:
+                    return False
+            document.floats.update(cached_page.floats)
+            document.placed_footnotes.update(cached_page.placed_footnotes)
+            for lookup, value in cached_page.lookups.items():
+                record.lookups.setdefault(lookup, value)
+            record.floats.update(cached_page.floats)
+            record.placed_footnotes.update(cached_page.placed_footnotes)
+        return True
@@ -15,7 +15,7 @@ import re
 
 from ast import literal_eval
 from copy import copy
-from functools import partial
+from functools import partial, lru_cache
 from itertools import tee, chain, groupby, count
 from os import path
 
@@ -28,7 +28,7 @@ from .flowable import Flowable, FlowableStyle, FlowableState, FlowableWidth
 from .font import MissingGlyphException
 from .hyphenator import Hyphenator
 from .inline import InlineFlowableException
-from .layout import EndOfContainer, ContainerOverflow
+from .layout import EndOfContainer, ContainerOverflow, VirtualContainer
 from .text import TextStyle, MixedStyledText, SingleStyledText, ESCAPE
 from .util import all_subclasses, ReadAliasAttribute
 
@@ -387,29 +387,54 @@ def kern(chars_and_glyphs, get_kerning):
     yield prev_char, prev_glyph, 0.0
 
 
+class GlyphSequence(tuple):
+    """An immutable sequence of :class:`Glyph`\\ s, along with their total
+    width (:attr:`width`)"""
+
+    def __new__(cls, glyphs):
+        glyph_sequence = super().__new__(cls, glyphs)
+        glyph_sequence.width = sum(glyph.width for glyph in glyph_sequence)
+        return glyph_sequence
+
+
+# maximum number of shaped strings held by the cache used by `shape`
+SHAPING_CACHE_SIZE = 32768
+
+
+@lru_cache(maxsize=SHAPING_CACHE_SIZE)
+def shape(font, size, variant, kerning, ligatures, chars):
+    """Look up the glyphs for `chars`, forming ligatures and applying kerning
+
+    The results are cached, so the shared :class:`Glyph` objects should not
+    be modified.
+
+    Returns:
+        GlyphSequence: the glyphs, scaled to the font `size`
+
+    """
+    scale = size / font.units_per_em
+    glyphs = (font.get_glyph(char, variant) for char in chars)
+    chars_and_glyphs = zip(chars, glyphs)
+    if ligatures:
+        chars_and_glyphs = form_ligatures(chars_and_glyphs, font.get_ligature)
+    if kerning:
+        glyphs_kern = kern(chars_and_glyphs, font.get_kerning)
+    else:
+        glyphs_kern = [(char, glyph, 0.0) for char, glyph in chars_and_glyphs]
+    return GlyphSequence(Glyph(glyph, scale * (glyph.width + kern_adjust),
+                               char)
+                         for char, glyph, kern_adjust in glyphs_kern)
+
+
 def create_lig_kern(span, flowable_target):
     font = span.font(flowable_target)
-    scale = span.height(flowable_target) / font.units_per_em
+    size = span.height(flowable_target)
     variant = span.get_style('font_variant', flowable_target)
     kerning = span.get_style('kerning', flowable_target)
     ligatures = span.get_style('ligatures', flowable_target)
     get_glyph = partial(font.get_glyph, variant=variant)
     # TODO: handle ligatures at span borders
-    def lig_kern(chars, glyphs=None):
-        if glyphs is None:
-            glyphs = (get_glyph(char) for char in chars)
-        chars_and_glyphs = zip(chars, glyphs)
-        if ligatures:
-            chars_and_glyphs = form_ligatures(chars_and_glyphs,
-                                              font.get_ligature)
-        if kerning:
-            glyphs_kern = kern(chars_and_glyphs, font.get_kerning)
-        else:
-            glyphs_kern = [(char, glyph, 0.0)
-                           for char, glyph in chars_and_glyphs]
-        return [Glyph(glyph, scale * (glyph.width + kern_adjust), char)
-                for char, glyph, kern_adjust in glyphs_kern]
-
+    lig_kern = partial(shape, font, size, variant, kerning, ligatures)
     return get_glyph, lig_kern
 
 
@@ -525,7 +550,7 @@ def spans_to_words(spans, container):
                 else:
                     part = ''.join(characters)
                     try:
-                        glyphs = [get_glyph(char) for char in part]
+                        glyphs_and_widths = lig_kern(part)
                     except MissingGlyphException:
                         rest = ''.join(char for _, group in groups
                                        for char in group)
@@ -535,7 +560,6 @@ def spans_to_words(spans, container):
                                                           container)
                         spans = chain(new_spans, spans)
                         break
-                    glyphs_and_widths = lig_kern(part, glyphs)
                     glyphs_span = GlyphsSpan(span, lig_kern, glyphs_and_widths)
                     word.append(glyphs_span)
         except InlineFlowableException:
@@ -612,6 +636,52 @@ class ParagraphBase(Flowable):
     def text(self, container):
         raise NotImplementedError('{}.text()'.format(self.__class__.__name__))
 
+    def content_widths(self, container):
+        """Determine the minimum and maximum width from the shaped words
+
+        This mimics :meth:`render` for a zero-width (narrow) and an infinitely
+        wide line, without typesetting the lines. Falls back to flowing the
+        paragraph if it contains tabs, since their width depends on the
+        position of the tab stops.
+
+        """
+        buffer = VirtualContainer(container)
+        spans = self.text(buffer).wrapped_spans(buffer)
+        indent_first = float(self.get_style('indent_first', container))
+        min_width = max_width = 0
+        narrow = wide = indent_first        # cursors of the current lines
+        narrow_empty = wide_empty = True
+        for item in spans_to_words(spans, buffer):
+            if isinstance(item, Tab):
+                return super().content_widths(container)
+            elif isinstance(item, NewLine):
+                min_width = max(min_width, narrow)
+                max_width = max(max_width, wide)
+                narrow = wide = 0
+                narrow_empty = wide_empty = True
+                continue
+            width = item.width
+            if isinstance(item, Space) and not self.significant_whitespace:
+                if not wide_empty:
+                    wide += width
+                if not narrow_empty:        # wraps; dropped on the next line
+                    min_width = max(min_width, narrow)
+                    narrow, narrow_empty = 0, True
+                continue
+            wide += width
+            wide_empty = False
+            if not narrow_empty and narrow + width > 0:
+                min_width = max(min_width, narrow)
+                narrow = 0
+            narrow += width
+            narrow_empty = False
+        if not narrow_empty:
+            min_width = max(min_width, narrow)
+        if not wide_empty:
+            max_width = max(max_width, wide)
+        frame_width = self._frame_width(container)
+        return min_width + frame_width, max_width + frame_width
+
     def render(self, container, descender, state, space_below=0,
                first_line_only=False):
         """Typeset the paragraph
@@ -779,14 +849,22 @@ class GlyphsSpan(list):
         self.span = span
         self.filled_tabs = {}
         self.chars_to_glyphs = chars_to_glyphs
-        self.space, = chars_to_glyphs(' ')
+        space, = chars_to_glyphs(' ')
+        self.space = copy(space)    # its width is adjusted when justifying
         super().__init__(glyphs_and_widths)
+        self._width = getattr(glyphs_and_widths, 'width', None)
 
     def __str__(self):
         return ''.join(glyph_and_width.char for glyph_and_width in self)
 
+    def append(self, glyph_and_width):
+        super().append(glyph_and_width)
+        self._width = None
+
     @property
     def width(self):
+        if self._width is not None:     # precomputed GlyphSequence width
+            return self._width
         return sum(glyph_and_width.width for glyph_and_width in self)
 
     @property
@@ -0,0 +1,145 @@
+# This file is part of rinohtype, the Python document preparation system.
+#
+# Copyright (c) Brecht Machiels.
+#
+# Use of this source code is subject to the terms of the GNU Affero General
+# Public License v3. See the LICENSE file or http://www.gnu.org/licenses/.
+
+"""
+Reporting of the progress of rendering a document.
+
+While rendering, the document emits a :class:`ProgressEvent` to each of its
+progress reporters:
+
+* at the start of each rendering pass,
+* each time a top-level flowable has been placed on a page, and
+* at the end of each rendering pass.
+
+A :class:`ProgressReporter` can display these events in the terminal
+(:class:`ProgressBar`), write them to a file (:class:`JSONLinesProgressLog`)
+or pass them on to a function (:class:`ProgressCallback`).
+
+"""
+
+import json
+import sys
+
+
+__all__ = ['ProgressEvent', 'ProgressReporter', 'ProgressBar',
+           'JSONLinesProgressLog', 'ProgressCallback']
+
+
+class ProgressEvent(object):
+    """Describes the progress of rendering a document
+
+    Args:
+        type (str): 'pass started', 'flowable placed' or 'pass finished'
+        rendering_pass (int): the 1-based number of the rendering pass
+        part (str): name of the document part being rendered
+        page (str): formatted number of the page being rendered
+        index (int): index of the flowable that was placed in the list of all
+            top-level flowables
+        total (int): the number of top-level flowables in the document
+        elapsed (float): number of seconds since the start of the pass
+
+    """
+
+    def __init__(self, type, rendering_pass, part=None, page=None, index=None,
+                 total=None, elapsed=0.0):
+        self.type = type
+        self.rendering_pass = rendering_pass
+        self.part = part
+        self.page = page
+        self.index = index
+        self.total = total
+        self.elapsed = elapsed
+
+    @property
+    def fraction(self):
+        """The fraction of the top-level flowables placed, or `None`"""
+        if self.index is None or not self.total:
+            return None
+        return (self.index + 1) / self.total
+
+    def as_dict(self):
+        return dict(type=self.type, rendering_pass=self.rendering_pass,
+                    part=self.part, page=self.page, index=self.index,
+                    total=self.total, elapsed=round(self.elapsed, 3))
+
+
+class ProgressReporter(object):
+    """Receives the progress events emitted while rendering a document"""
+
+    def report(self, event):
+        """Handle `event` (:class:`ProgressEvent`)"""
+        raise NotImplementedError
+
+    def close(self):
+        """Called when rendering has finished"""
+
+
+class ProgressBar(ProgressReporter):
+    """Displays a progress bar and estimates the remaining time
+
+    Args:
+        file: the file to write the progress bar to (default: stdout)
+
+    """
+
+    TEMPLATE = '\r{:3d}% [{}{}] ETA {:02d}:{:02d} ({:02d}:{:02d}) page {}'
+    WIDTH = 40
+
+    def __init__(self, file=None):
+        self.file = file
+
+    def report(self, event):
+        file = self.file or sys.stdout
+        if event.type == 'pass finished':
+            file.write('\n')
+            return
+        fraction = event.fraction
+        if fraction is None:
+            return
+        passed = int(event.elapsed)
+        eta = int(event.elapsed / fraction * (1 - fraction))
+        filled = int(self.WIDTH * fraction)
+        file.write(self.TEMPLATE.format(int(100 * fraction), filled * '=',
+                                        (self.WIDTH - filled) * ' ',
+                                        eta // 60, eta % 60,
+                                        passed // 60, passed % 60,
+                                        event.page))
+        file.flush()
+
+
+class JSONLinesProgressLog(ProgressReporter):
+    """Writes each progress event as a JSON object on a separate line
+
+    Args:
+        file (str, Path or file): the file to write to; if a filename is
+            passed, the file is created (or overwritten)
+
+    """
+
+    def __init__(self, file):
+        if hasattr(file, 'write'):
+            self.file, self._owns_file = file, False
+        else:
+            self.file, self._owns_file = open(file, 'w'), True
+
+    def report(self, event):
+        self.file.write(json.dumps(event.as_dict()) + '\n')
+        self.file.flush()
+
+    def close(self):
+        if self._owns_file:
+            self.file.close()
+
+
+class ProgressCallback(ProgressReporter):
+    """Passes each progress event to `callback`"""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def report(self, event):
+        self.callback(event)
@@ -77,7 +77,8 @@ class ReferenceBase(MixedStyledTextBase):
                     text = ''
             elif self.type == ReferenceType.PAGE:
                 try:
-                    text = str(container.document.page_references[target_id])
+                    page_ref = container.document.get_page_reference(target_id)
+                    text = str(page_ref)
                 except KeyError:
                     text = '??'
             elif self.type == ReferenceType.TITLE:
@@ -131,7 +131,11 @@ class Heading(NumberedParagraph):
     def prepare(self, flowable_target):
         document = flowable_target.document
         document._sections.append(self.section)
+        document.page_elements.add_section(self.section)
         section_id = self.section.get_id(document)
+        # a destination is created for the heading on a chapter title page;
+        # assign its ID now so that it doesn't depend on the rendering order
+        self.get_id(document)
         numbering_style = self.get_style('number_format', flowable_target)
         if self.get_style('custom_label', flowable_target):
             assert self.custom_label is not None
@@ -164,6 +168,8 @@ class Heading(NumberedParagraph):
         number = self.number(container)
         return MixedStyledText(number + self.content, parent=self)
 
+    content_widths = Flowable.content_widths  # flow() can skip the heading
+
     def flow(self, container, last_descender, state=None, **kwargs):
         if self.level == 1 and container.page.chapter_title:
             container.page.create_chapter_title(self)
@@ -264,6 +270,7 @@ class TableOfContentsSection(Section):
 class TableOfContents(GroupedFlowables):
     style_class = TableOfContentsStyle
     location = 'table of contents'
+    layout_cacheable = False
 
     def __init__(self, local=False, id=None, style=None, parent=None):
         super().__init__(id=id, style=style, parent=parent)
@@ -339,6 +346,7 @@ class ListOfStyle(GroupedFlowablesStyle, ParagraphStyle):
 class ListOf(GroupedFlowables):
     category = NotImplementedAttribute()
     style_class = ListOfStyle
+    layout_cacheable = False
 
     def __init__(self, local=False, id=None, style=None, parent=None):
         super().__init__(id=id, style=style, parent=parent)
@@ -572,6 +572,216 @@ class StyledMatcher(dict):
                         yield Match(name, specificity)
 
 
+class SelectorIndex(object):
+    """The selectors of a style sheet and its base style sheets, compiled for
+    matching against :class:`Styled` elements
+
+    For each combination of styled class and style name, the selectors that
+    can possibly match are collected once, in the order in which
+    :meth:`StyledMatcher.match` would try them. The selectors are flattened
+    beforehand and the specificity of selectors that match based on the
+    element's class and style name alone is precomputed. Matching an element
+    then only needs to evaluate the remaining selectors.
+
+    The index also memoizes the style name found for elements, keyed on
+    their structural signature (see :meth:`signature`). Elements that look
+    the same to the selectors, such as the cells of a large table, are then
+    matched against the selectors only once.
+
+    The index needs to be recreated when selectors or styles are added to any
+    of the style sheets (see :meth:`is_current`).
+
+    Args:
+        stylesheet (StyleSheet): the style sheet to index
+
+    """
+
+    def __init__(self, stylesheet):
+        self.stylesheets = []
+        while stylesheet is not None:
+            self.stylesheets.append(stylesheet)
+            stylesheet = stylesheet.base
+        self._size = self._get_size()
+        self._candidates = {}
+        self._styles = {}
+        self._attributes, self._context_depth = self._inspect_selectors()
+
+    def _get_size(self):
+        return tuple((len(stylesheet.matcher.by_name)
+                      if stylesheet.matcher is not None else None,
+                      len(stylesheet))
+                     for stylesheet in self.stylesheets)
+
+    def is_current(self):
+        """Return `True` if no selectors or styles were added to the style
+        sheets since this index was created"""
+        return self._get_size() == self._size
+
+    def _inspect_selectors(self):
+        """Determine the element attributes the selectors check and the
+        number of ancestors of an element they inspect (`None` if unbound)"""
+        attributes = set()
+        depth = 0
+        for stylesheet in self.stylesheets:
+            if stylesheet.matcher is None:
+                continue
+            for selector in stylesheet.matcher.by_name.values():
+                selectors = context_selectors(selector.flatten(stylesheet))
+                if any(isinstance(selector, EllipsisSelector)
+                       for selector in selectors):
+                    depth = None
+                elif depth is not None:
+                    depth = max(depth, len(selectors) - 1)
+                for selector in selectors:
+                    attributes.update(selector_attributes(selector))
+        return sorted(attributes), depth
+
+    def signature(self, styled):
+        """Return a key that is equal for elements the selectors cannot tell
+        apart, or `None` if no such key can be determined for `styled`
+
+        The key includes the class, style name and the checked attributes of
+        `styled` and of the ancestors inspected by context selectors.
+
+        """
+        items = []
+        element = styled
+        while element is not None:
+            if (self._context_depth is not None
+                    and len(items) > self._context_depth):
+                break
+            style = getattr(element, 'style', None)
+            items.append((type(element),
+                          style if isinstance(style, str) else None,
+                          tuple(attribute_key(element, name)
+                                for name in self._attributes)))
+            element = element.parent
+        signature = tuple(items)
+        try:
+            hash(signature)
+        except TypeError:
+            return None
+        return signature
+
+    def find_style(self, styled, stylesheet):
+        """Return the name of the style in `stylesheet` to apply to `styled`
+        (`None` if no matching style is found) and whether multiple
+        selectors match with the same specificity"""
+        signature = self.signature(styled)
+        try:
+            style_name, ambiguous = self._styles[signature]
+        except KeyError:
+            style_name, ambiguous = self._find_style(styled, stylesheet)
+            if signature is not None:
+                self._styles[signature] = style_name, ambiguous
+        return style_name, ambiguous
+
+    def _find_style(self, styled, stylesheet):
+        matches = sorted(self.match(styled),
+                         key=attrgetter('specificity'), reverse=True)
+        ambiguous = False
+        last_match = Match(None, ZERO_SPECIFICITY)
+        for match in matches:
+            if (match.specificity == last_match.specificity
+                    and match.style_name != last_match.style_name):
+                ambiguous = True
+            if stylesheet.contains(match.style_name):
+                return match.style_name, ambiguous
+            last_match = match
+        return None, ambiguous
+
+    def match(self, styled):
+        """Generate a :class:`Match` for each selector matching `styled`"""
+        style_name = styled.style if isinstance(styled.style, str) else None
+        for name, selector, stylesheet, specificity \
+                in self.candidates(type(styled), style_name):
+            if specificity is None:
+                specificity = selector.match(styled, stylesheet)
+            if specificity:
+                yield Match(name, specificity)
+
+    def candidates(self, styled_class, style_name):
+        """Return the selectors that can match an instance of `styled_class`
+        with style `style_name`
+
+        Returns:
+            list: (name, flattened selector, style sheet, specificity) tuples,
+                where specificity is `None` unless it can be determined from
+                the styled class and style name alone
+
+        """
+        key = styled_class, style_name
+        try:
+            return self._candidates[key]
+        except KeyError:
+            candidates = self._candidates[key] = list(
+                self._collect_candidates(styled_class, style_name))
+            return candidates
+
+    def _collect_candidates(self, styled_class, style_name):
+        style_names = (style_name, None) if style_name else (None, )
+        for stylesheet in self.stylesheets:
+            matcher = stylesheet.matcher
+            if matcher is None:
+                continue
+            for cls in styled_class.__mro__:
+                if cls not in matcher:
+                    continue
+                for style in style_names:
+                    selectors = matcher[cls].get(style, {})
+                    for name, selector in selectors.items():
+                        selector = selector.flatten(stylesheet)
+                        specificity = static_specificity(selector,
+                                                         styled_class)
+                        yield name, selector, stylesheet, specificity
+
+
+def static_specificity(selector, styled_class):
+    """Return the specificity with which `selector` matches instances of
+    `styled_class` (with a matching style name), or `None` if this depends
+    on the attributes or the context of the instance"""
+    priority = 0
+    while isinstance(selector, SelectorWithPriority):
+        priority += selector.priority
+        selector = selector.selector
+    if not isinstance(selector, ClassSelectorBase) or selector.attributes:
+        return None
+    class_match = 2 if styled_class == selector.cls else 1
+    style_match = 0 if selector.style_name is None else 1
+    return Specificity(priority, 0, style_match, 0, class_match)
+
+
+def context_selectors(selector):
+    """Return the selectors a (flattened) selector matches against an
+    element and its ancestors"""
+    while isinstance(selector, SelectorWithPriority):
+        selector = selector.selector
+    return selector.selectors
+
+
+def selector_attributes(selector):
+    """Return the names of the element attributes checked by `selector`"""
+    while isinstance(selector, SelectorWithPriority):
+        selector = selector.selector
+    if isinstance(selector, ClassSelectorBase):
+        return selector.attributes.keys()
+    return ()
+
+
+MISSING = object()
+
+
+def attribute_key(styled, name):
+    """Return the value of `styled`'s attribute `name` as it is compared by
+    selectors"""
+    value = getattr(styled, name, MISSING)
+    if isinstance(value, (HasClass, HasClasses)):
+        return tuple(styled.classes)
+    elif isinstance(value, list):
+        return tuple(value)
+    return value
+
+
 class StyleSheet(RuleSet, Resource):
     """Dictionary storing a collection of related styles by name.
 
@@ -609,6 +819,7 @@ class StyleSheet(RuleSet, Resource):
         super().__init__(name, base=base)
         self.description = description
         self.matcher = matcher
+        self._selector_index = None
         if user_options:
             warn('Unsupported options passed to stylesheet: {}'
                  .format(', '.join(user_options.keys())))
@@ -680,25 +891,24 @@ class StyleSheet(RuleSet, Resource):
             else:
                 raise KeyError("No selector found for style '{}'".format(name))
 
+    @property
+    def selector_index(self):
+        """The :class:`SelectorIndex` for this style sheet and its bases"""
+        if not (self._selector_index and self._selector_index.is_current()):
+            self._selector_index = SelectorIndex(self)
+        return self._selector_index
+
     def find_matches(self, styled):
-        for match in self.matcher.match(styled, self):
-            yield match
-        if self.base is not None:
-            yield from self.base.find_matches(styled)
+        return self.selector_index.match(styled)
 
     def find_style(self, styled):
-        matches = sorted(self.find_matches(styled),
-                         key=attrgetter('specificity'), reverse=True)
-        last_match = Match(None, ZERO_SPECIFICITY)
-        for match in matches:
-            if (match.specificity == last_match.specificity
-                    and match.style_name != last_match.style_name):
-                styled.warn('Multiple selectors match with the same '
-                            'specificity. See the style log for details.')
-            if self.contains(match.style_name):
-                return match.style_name
-            last_match = match
-        raise DefaultValueException
+        style_name, ambiguous = self.selector_index.find_style(styled, self)
+        if ambiguous:
+            styled.warn('Multiple selectors match with the same '
+                        'specificity. See the style log for details.')
+        if style_name is None:
+            raise DefaultValueException
+        return style_name
 
     def write(self, base_filename):
         from configparser import ConfigParser
@@ -6,6 +6,7 @@
 # Public License v3. See the LICENSE file or http://www.gnu.org/licenses/.
 
 
+from collections import OrderedDict
 from collections.abc import Iterable
 from itertools import chain
 from functools import partial
@@ -23,7 +24,8 @@ from .util import ReadAliasAttribute, NotImplementedAttribute
 
 
 __all__ = ['Table', 'TableStyle', 'TableWithCaption',
-           'TableSection', 'TableHead', 'TableBody', 'TableRow',
+           'TableSection', 'TableHead', 'TableBody', 'GeneratedTableBody',
+           'TableRow',
            'TableCell', 'TableCellStyle',
            'TableCellBorder', 'TableCellBorderStyle',
            'TableCellBackground', 'TableCellBackgroundStyle', 'VerticalAlign',
@@ -102,8 +104,8 @@ class Table(Flowable):
         get_style = partial(self.get_style, container=container)
         with MaybeContainer(container) as maybe_container:
             def render_rows(section, next_row_index=0):
-                rows = section[next_row_index:]
-                rendered_spans = self._render_section(container, rows,
+                rendered_spans = self._render_section(container, section,
+                                                      next_row_index,
                                                       state.column_widths)
                 for rendered_rows, is_last_span in rendered_spans:
                     sum_row_heights = sum(row.height for row in rendered_rows)
@@ -139,36 +141,55 @@ class Table(Flowable):
         - cell contents
 
         """
-        def calculate_column_widths(max_cell_width):
-            """Calculate required column widths given a maximum cell width"""
-            def cell_content_width(cell):
-                buffer = VirtualContainer(container, width=max_cell_width)
-                width, _, _ = cell.flow(buffer, None)
-                return float(width)
-
-            widths = [0] * self.body.num_columns
+        def cell_content_widths(cell, row, cell_index):
+            # rows of a GeneratedTableBody are recreated, so cells are
+            # identified by their position instead of by their identity
+            key = ('content widths', id(row.section), row._index, cell_index,
+                   container.page.number)
+            return document.cached_result(key, cell.content_widths, container)
+
+        def calculate_column_widths():
+            """Calculate the minimum and maximum column widths required by
+            the cell contents"""
+            min_widths = [0] * self.body.num_columns
+            max_widths = [0] * self.body.num_columns
+            spanning_cells = []
             for row in chain(self.head or [], self.body):
-                for cell in (cell for cell in row if cell.colspan == 1):
+                for cell_index, cell in enumerate(row):
+                    if cell.colspan > 1:
+                        spanning_cells.append((cell, row, cell_index))
+                        continue
                     col = int(cell.column_index)
-                    widths[col] = max(widths[col], cell_content_width(cell))
-            for row in chain(self.head or [], self.body):
-                for cell in (cell for cell in row if cell.colspan > 1):
-                    c = int(cell.column_index)
-                    c_end = c + cell.colspan
-                    padding = cell_content_width(cell) - sum(widths[c:c_end])
+                    minimum, maximum = cell_content_widths(cell, row,
+                                                           cell_index)
+                    min_widths[col] = max(min_widths[col], minimum)
+                    max_widths[col] = max(max_widths[col], maximum)
+            for cell, row, cell_index in spanning_cells:
+                c = int(cell.column_index)
+                c_end = c + cell.colspan
+                for widths, width in zip((min_widths, max_widths),
+                                         cell_content_widths(cell, row,
+                                                             cell_index)):
+                    padding = width - sum(widths[c:c_end])
                     if padding > 0:
                         per_column_padding = padding / cell.colspan
                         for i in range(cell.colspan):
                             widths[c + i] += per_column_padding
-            return widths
+            return min_widths, max_widths
+
+        # the cell contents need not be measured if all widths are fixed
+        if self.column_widths and all(isinstance(width, DimBase)
+                                      for width in self.column_widths):
+            return [width.to_points(container.width)
+                    for width in self.column_widths]
 
+        document = container.document
         width = self._width(container)
         try:
             fixed_width = width.to_points(container.width)
         except AttributeError:
             fixed_width = width or FlowableWidth.AUTO
-        min_column_widths = calculate_column_widths(0)
-        max_column_widths = calculate_column_widths(float('+inf'))
+        min_column_widths, max_column_widths = calculate_column_widths()
 
         # calculate relative column widths for auto-sized columns
         auto_rel_colwidths = [sqrt(minimum * maximum) for minimum, maximum
@@ -257,15 +278,24 @@ class Table(Flowable):
                     for width in column_widths]
 
     @classmethod
-    def _render_section(cls, container, rows, column_widths):
+    def _render_section(cls, container, section, start, column_widths):
+        """Render the rows of `section` starting at row index `start`
+
+        The rows are rendered only when the next group of rows spanned by
+        a cell is requested, so that rendering can stop when the container
+        is full.
+
+        """
         rendered_rows = []
         rows_left_in_span = 0
-        for row in rows:
+        last_index = len(section) - 1
+        for index in range(start, last_index + 1):
+            row = section[index]
             rows_left_in_span = max(row.maximum_rowspan, rows_left_in_span) - 1
             rendered_row = cls._render_row(column_widths, container, row)
             rendered_rows.append(rendered_row)
             if rows_left_in_span == 0:
-                is_last_span = row == rows[-1]
+                is_last_span = index == last_index
                 yield cls._vertically_size_cells(rendered_rows), is_last_span
                 rendered_rows = []
         assert not rendered_rows
@@ -361,6 +391,17 @@ class TableSection(Styled, list):
     def num_columns(self):
         return sum(cell.colspan for cell in self[0])
 
+    def row_index(self, row):
+        try:
+            index = row._section_index
+            if self[index] is row:
+                return index
+        except (AttributeError, IndexError):
+            pass
+        index = next(i for i, item in enumerate(self) if item is row)
+        row._section_index = index
+        return index
+
 
 class TableHead(TableSection):
     pass
@@ -370,6 +411,61 @@ class TableBody(TableSection):
     pass
 
 
+class GeneratedTableBody(TableBody):
+    """A table body whose rows are created only when they are needed
+
+    Only the most recently used rows are kept in memory, so that very large
+    (data-backed) tables can be rendered without creating all of their rows
+    up front. To avoid creating each row one additional time to determine
+    the column widths, pass absolute column widths to the :class:`Table`.
+
+    Args:
+        num_rows (int): the number of rows in the table body
+        create_row (callable): called with a row index, returns a new
+            :class:`TableRow` for that row; can be called more than once for
+            the same row index
+
+    """
+
+    row_cache_size = 64
+
+    def __init__(self, num_rows, create_row, style=None, parent=None):
+        super().__init__([], style=style, parent=parent)
+        self.num_rows = num_rows
+        self.create_row = create_row
+        self._rows = OrderedDict()
+
+    def __len__(self):
+        return self.num_rows
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.num_rows))]
+        if index < 0:
+            index += self.num_rows
+        if not 0 <= index < self.num_rows:
+            raise IndexError('row index out of range')
+        try:
+            row = self._rows.pop(index)
+        except KeyError:
+            row = self.create_row(index)
+            row.parent = self
+            row._section_index = index
+            if len(self._rows) >= self.row_cache_size:
+                self._rows.popitem(last=False)
+        self._rows[index] = row
+        return row
+
+    def __iter__(self):
+        return (self[index] for index in range(self.num_rows))
+
+    def prepare(self, flowable_target):
+        pass
+
+    def row_index(self, row):
+        return row._section_index
+
+
 class TableRow(Styled, list):
     section = ReadAliasAttribute('parent')
 
@@ -389,7 +485,7 @@ class TableRow(Styled, list):
 
     @property
     def _index(self):
-        return next(i for i, item in enumerate(self.section) if item is self)
+        return self.section.row_index(self)
 
     def get_rowspanned_columns(self):
         """Return a dictionary mapping column indices to the number of columns
@@ -397,7 +493,8 @@ class TableRow(Styled, list):
         spanned_columns = {}
         current_row_index = self._index
         current_row_cols = sum(cell.colspan for cell in self)
-        prev_rows = iter(reversed(self.section[:current_row_index]))
+        prev_rows = (self.section[index]
+                     for index in reversed(range(current_row_index)))
         while current_row_cols < self.section.num_columns:
             row = next(prev_rows)
             min_rowspan = current_row_index - int(row._index)
@@ -470,7 +567,7 @@ class Index(object):
 
 class RowIndex(Index):
     def __int__(self):
-        return next(i for i, row in enumerate(self.section) if row is self.row)
+        return self.row._index
 
     def __iter__(self):
         index = int(self)
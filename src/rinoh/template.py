@@ -10,7 +10,7 @@ import re
 
 from collections import OrderedDict
 from functools import partial
-from itertools import chain
+from itertools import chain, count
 from pathlib import Path
 
 from . import styleds, reference
@@ -20,11 +20,12 @@ from .attribute import (Bool, Integer, Attribute, AttributesDictionary,
                         Configurable, DefaultValueException,
                         VariableNotDefined)
 from .dimension import Dimension, CM, PT, PERCENT
-from .document import Document, Page, PageOrientation, PageType
+from .document import Document, Page, PageOrientation, PageType, PageRecord
 from .element import create_destination
 from .image import BackgroundImage, Image
 from .flowable import Flowable
 from .language import Language, EN
+from .layoutcache import chain_position, set_chain_position
 from .layout import (Container, DownExpandingContainer, UpExpandingContainer,
                      FlowablesContainer, FootnoteContainer, ChainedContainer,
                      BACKGROUND, CONTENT, HEADER_FOOTER, CHAPTER_TITLE,
@@ -359,6 +360,7 @@ class DocumentPart(Templated, metaclass=DocumentLocationType):
         self.template_name = template.name
         self.document = document
         self.pages = []
+        self._page_records = []
         self.chain = Chain(self)
         for flowable in flowables or []:
                 self.chain << flowable
@@ -369,36 +371,120 @@ class DocumentPart(Templated, metaclass=DocumentLocationType):
 
     @property
     def number_of_pages(self):
-        try:
-            return self.document.part_page_counts[self.template.name].count
-        except KeyError:
-            return 0
+        return self.document.get_part_page_count(self.template.name)
 
     def prepare(self):
         for flowable in self._flowables(self.document):
             flowable.prepare(self)
 
     def render(self, first_page_number):
-        self.add_page(self.first_page(first_page_number))
-        for page_number, page in enumerate(self.pages, first_page_number + 1):
-            try:
-                page.render()
-                break_type = None
-            except NewChapterException as nce:
-                break_type = nce.break_type
-            except PageBreakException as pbe:
-                break_type = None
-            page.place()
-            if self.chain and not self.chain.done:
-                next_page_type = 'left' if page.number % 2 else 'right'
-                page = self.new_page(page_number, next_page_type == break_type)
-                self.add_page(page)     # this grows self.pages!
+        """Render the pages of this document part, numbering them starting
+        from `first_page_number`, and return the number of pages.
+
+        When rendering incrementally, the leading pages that are unaffected by
+        changes since the previous rendering pass are reused. Rendering
+        continues from the first page that needs to be rendered again. When
+        the document's layout cache is enabled, the pages stored for the
+        flowables to be rendered next are reused when still valid."""
+        document = self.document
+        previous_pages, self.pages = self.pages, []
+        previous_records, self._page_records = self._page_records, []
+        page_number, new_chapter = first_page_number, True
+        for index in count():
+            record = (previous_records[index] if index < len(previous_records)
+                      else None)
+            if record and record.is_reusable(page_number, document):
+                record.replay(document)
+            else:
+                if previous_pages:
+                    if record:
+                        self.chain.restore_state(record.chain_state)
+                    self._discard_pages(previous_pages[len(self.pages):])
+                    previous_pages = previous_records = []
+                page = self.new_page(page_number, new_chapter)
+                record = (self._replay_cached_pages(page, new_chapter)
+                          or self._render_page(page, new_chapter))
+            for page in record.pages:
+                self.add_page(page)
+                document.write_page(page)
+            self._page_records.append(record)
+            page_number += len(record.pages)
+            if not record.continued:
+                break
+            next_page_type = 'left' if page.number % 2 else 'right'
+            new_chapter = next_page_type == record.break_type
+        self._discard_pages(previous_pages[len(self.pages):])
         next_page_type = 'right' if page_number % 2 else 'left'
-        end_at_page = self.get_config_value('end_at_page', self.document)
+        end_at_page = self.get_config_value('end_at_page', document)
         if next_page_type == end_at_page:
             self.add_page(self.first_page(page_number + 1))
         return len(self.pages)
 
+    def render_from(self, position, first_page_number, end):
+        """Render the pages for the flowables following chain position
+        `position`, numbering them starting from `first_page_number`
+
+        Rendering stops at the end of the chain or when a new chapter starts
+        at chain position `end`. This renders a range of chapters independent
+        of the preceding ones (see :meth:`Document.render`)."""
+        page_number, new_chapter = first_page_number, True
+        page = self.new_page(page_number, new_chapter)
+        if not set_chain_position(self.chain, position, page):
+            return
+        while True:
+            record = self._render_page(page, new_chapter)
+            self.add_page(page)
+            self._page_records.append(record)
+            page_number += 1
+            if not record.continued:
+                break
+            next_page_type = 'left' if page.number % 2 else 'right'
+            new_chapter = next_page_type == record.break_type
+            if new_chapter and chain_position(self.chain) == end:
+                break
+            page = self.new_page(page_number, new_chapter)
+
+    @property
+    def chapter_starts(self):
+        """The chain position and number of each page rendered in the last
+        rendering pass that starts a new chapter"""
+        return [(record.position, record.pages[0].number)
+                for record in self._page_records
+                if record.new_chapter and record.position is not None]
+
+    def _replay_cached_pages(self, page, new_chapter):
+        """Reuse the pages stored in the layout cache for the flowables
+        following the chain's current position, starting with `page`. Returns
+        a :class:`PageRecord` or `None` if no valid pages were stored."""
+        layout_cache = self.document.layout_cache
+        if layout_cache:
+            return layout_cache.replay(self, page, new_chapter)
+
+    def _render_page(self, page, new_chapter):
+        """Render and place `page`, returning a :class:`PageRecord`"""
+        document = self.document
+        chain_state = self.chain.save_state() if document.incremental else None
+        position = (chain_position(self.chain)
+                    if document.layout_cache or new_chapter else None)
+        record = PageRecord([page], new_chapter, chain_state, position)
+        with record.recording(document):
+            try:
+                page.render()
+            except NewChapterException as nce:
+                record.break_type = nce.break_type
+            except PageBreakException:
+                pass
+            page.place()
+        record.continued = not self.chain.done
+        return record
+
+    def _discard_pages(self, pages):
+        """Remove `pages`, rendered in a previous rendering pass, from the
+        output"""
+        if pages:
+            backend_document = self.document.backend_document
+            backend_document.discard_pages(page.backend_page for page in pages)
+
     def add_page(self, page):
         """Append `page` (:class:`Page`) to this :class:`DocumentPart`."""
         self.pages.append(page)
@@ -686,6 +772,16 @@ class DocumentTemplate(Document, AttributesDictionary, Resource,
                                                'styling document elements')
 
     parts = Attribute(PartsList, [], 'The parts making up this document')
+    object_streams = Attribute(Bool, False, 'Pack the objects in the PDF '
+                                            'output into compressed object '
+                                            'streams (requires PDF 1.5)')
+    compression_level = Attribute(Integer, 6, 'The zlib compression level '
+                                              '(0-9) for the page contents '
+                                              'and embedded fonts')
+    compression_threads = Attribute(Integer, 0, 'The number of threads to '
+                                                'compress the PDF output in '
+                                                '(0: the number of '
+                                                'processors)')
 
     variables = {'paper_size': A4}      # default variable values
 
@@ -696,8 +792,12 @@ class DocumentTemplate(Document, AttributesDictionary, Resource,
         stylesheet = self.get_option('stylesheet')
         language = self.get_option('language')
         strings = self.get_option('strings')
+        backend_options = dict(
+            object_streams=self.get_option('object_streams'),
+            compression_level=self.get_option('compression_level'),
+            compression_threads=self.get_option('compression_threads') or None)
         super().__init__(document_tree, stylesheet, language, strings=strings,
-                         backend=backend)
+                         backend=backend, backend_options=backend_options)
         parts = self.get_option('parts')
         self.part_templates = [next(self._find_templates(name))
                                for name in parts]
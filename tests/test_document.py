@@ -0,0 +1,318 @@
+# This file is part of rinohtype, the Python document preparation system.
+#
+# Copyright (c) Brecht Machiels.
+#
+# Use of this source code is subject to the terms of the GNU Affero General
+# Public License v3. See the LICENSE file or http://www.gnu.org/licenses/.
+
+import json
+import pytest
+import re
+import shutil
+
+from pathlib import Path
+
+from rinoh.backend.pdf.reader import PDFReader
+from rinoh.document import Document, DocumentTree, Page
+from rinoh.image import Image, Figure, FigureStyle, Caption
+from rinoh.frontend.rst import ReStructuredTextReader
+from rinoh.paragraph import Paragraph
+from rinoh.progress import ProgressCallback, JSONLinesProgressLog
+from rinoh.reference import Reference, Note, NoteMarkerWithNote
+from rinoh.templates import Article, Book
+from rinoh.text import SingleStyledText
+from rinoh.warnings import RinohWarning
+
+
+IMAGE = Path(__file__).parent.parent / 'tests_regression' / 'images' \
+            / 'biohazard.png'
+
+
+def render_document(tmpdir, incremental):
+    paragraphs = [Paragraph('Lorem ipsum dolor sit amet. ' * 40)
+                  for _ in range(12)]
+    reference = Reference('target', type='page')
+    paragraphs.append(Paragraph('See page ' + reference))
+    paragraphs.append(Paragraph('Target', id='target'))
+    document = Article(DocumentTree(paragraphs))
+    filename_root = tmpdir.join('incremental' if incremental else 'full')
+    assert document.render(str(filename_root), incremental=incremental)
+    return document
+
+
+def test_incremental_rendering(tmpdir):
+    full = render_document(tmpdir, incremental=False)
+    incremental = render_document(tmpdir, incremental=True)
+    full_pages = full.backend_document.pages
+    incremental_pages = incremental.backend_document.pages
+    assert len(full_pages) == len(incremental_pages) > 2
+    for full_page, incremental_page in zip(full_pages, incremental_pages):
+        assert full_page.number == incremental_page.number
+        assert (full_page.canvas.getvalue()
+                == incremental_page.canvas.getvalue())
+    assert incremental.page_references == full.page_references
+    cos_pages = incremental.backend_document.cos_document.catalog['Pages']
+    assert list(cos_pages['Kids']) == [page.cos_page
+                                       for page in incremental_pages]
+
+
+def page_contents(filename):
+    reader = PDFReader(str(filename))
+    return [kid.object['Contents'].read()
+            for kid in reader.catalog['Pages']['Kids']]
+
+
+def test_stream_output(tmpdir):
+    full = render_document(tmpdir, incremental=False)
+    paragraphs = [Paragraph('Lorem ipsum dolor sit amet. ' * 40)
+                  for _ in range(12)]
+    paragraphs.append(Paragraph('See page ' + Reference('target',
+                                                        type='page')))
+    paragraphs.append(Paragraph('Target', id='target'))
+    document = Article(DocumentTree(paragraphs))
+    with pytest.raises(ValueError):
+        document.render(str(tmpdir.join('stream')), stream=True,
+                        incremental=True)
+    assert document.render(str(tmpdir.join('stream')), stream=True)
+    assert document._rendering_pass == 2
+    pages = document.backend_document.pages
+    assert all(page.canvas.getvalue() == b'' for page in pages)
+    assert (page_contents(tmpdir.join('stream.pdf'))
+            == page_contents(tmpdir.join('full.pdf'))
+            == [page.canvas.getvalue()
+                for page in full.backend_document.pages])
+
+
+def render_compressed(tmpdir, name, **options):
+    paragraphs = [Paragraph('Lorem ipsum dolor sit amet. ' * 40)
+                  for _ in range(12)]
+    configuration = Article.Configuration(name, **options)
+    document = Article(DocumentTree(paragraphs), configuration=configuration)
+    assert document.render(str(tmpdir.join(name)))
+    pdf = tmpdir.join(name + '.pdf').read_binary()
+    return re.sub(rb'/(CreationDate|ModDate) \(.*?\)|/ID \[.*?\]', b'', pdf)
+
+
+def test_compression_threads(tmpdir):
+    serial = render_compressed(tmpdir, 'serial', compression_threads=1)
+    threaded = render_compressed(tmpdir, 'threaded', compression_threads=4)
+    assert threaded == serial
+    uncompressed = render_compressed(tmpdir, 'uncompressed',
+                                     compression_level=0)
+    assert len(uncompressed) > 2 * len(serial)
+
+
+def test_incremental_rendering_reuses_pages(tmpdir, monkeypatch):
+    rendered_pages = []
+    page_render = Page.render
+
+    def render_page(page):
+        rendered_pages.append(page.number)
+        page_render(page)
+
+    monkeypatch.setattr(Page, 'render', render_page)
+    full = render_document(tmpdir, incremental=False)
+    full_rendered_pages = list(rendered_pages)
+    rendered_pages.clear()
+    incremental = render_document(tmpdir, incremental=True)
+    number_of_pages = len(full.backend_document.pages)
+    assert len(full_rendered_pages) == 2 * number_of_pages
+    assert number_of_pages < len(rendered_pages) < 2 * number_of_pages
+    assert len(incremental.backend_document.pages) == number_of_pages
+
+
+def test_convergence(tmpdir):
+    document = render_document(tmpdir, incremental=False)
+    assert document._rendering_pass == 2
+    changed_lookups, = document.changed_lookups
+    assert ({lookup.kind for lookup in changed_lookups}
+            == {'page reference', 'part page count'})
+    changed_reference, = (lookup for lookup in changed_lookups
+                          if lookup.kind == 'page reference')
+    assert changed_reference.key == 'target'
+    assert changed_reference.value is None
+    assert changed_reference.current_value == changed_reference.page == '5'
+    # the page references cached by the previous run are unchanged
+    document = render_document(tmpdir, incremental=False)
+    assert document._rendering_pass == 1
+    assert document.changed_lookups == []
+    # the target's page reference changes, but it is not looked up
+    paragraphs = [Paragraph('Target', id='target')]
+    paragraphs += [Paragraph('Lorem ipsum dolor sit amet. ' * 40)
+                   for _ in range(12)]
+    document = Article(DocumentTree(paragraphs))
+    assert document.render(str(tmpdir.join('full')))
+    assert document.page_references['target'] != '5'
+    assert document._rendering_pass == 1
+
+
+def test_convergence_with_footnote_and_float(tmpdir):
+    note = Note(Paragraph('A footnote'))
+    figure = Figure([Image(str(IMAGE)), Caption(SingleStyledText('Figure'))],
+                    style=FigureStyle(float=True))
+    flowables = [Paragraph('Lorem ipsum dolor sit amet. ' * 40)
+                 for _ in range(3)]
+    flowables[1:1] = [Paragraph('See the footnote' + NoteMarkerWithNote(note)),
+                      figure]
+    document = Article(DocumentTree(flowables))
+    assert document.render(str(tmpdir.join('notes')))
+    assert document._rendering_pass == 2
+    assert document.placed_footnotes and document.floats
+    changed_lookups, = document.changed_lookups
+    assert {lookup.kind for lookup in changed_lookups} == {'part page count'}
+
+
+def test_maximum_rendering_passes(tmpdir, monkeypatch):
+    monkeypatch.setattr(Document, 'MAX_RENDERING_PASSES', 1)
+    with pytest.warns(RinohWarning, match='did not converge after 1 passes'):
+        document = render_document(tmpdir, incremental=False)
+    assert document._rendering_pass == 1
+
+
+def render_rst_document(tmpdir, filename, layout_cache):
+    sections = []
+    for index in range(1, 5):
+        title = 'Section {}'.format(index)
+        paragraphs = ['Lorem ipsum dolor sit amet. ' * 40] * 4
+        sections.append('\n\n'.join([title, '-' * len(title)] + paragraphs))
+    input_file = tmpdir.join('input.rst')
+    input_file.write('\n\n'.join(sections))
+    document_tree = ReStructuredTextReader().parse(str(input_file))
+    document = Article(document_tree)
+    assert document.render(str(tmpdir.join(filename)),
+                           layout_cache=layout_cache)
+    return document
+
+
+def test_layout_cache_reuses_pages(tmpdir, monkeypatch):
+    rendered_pages = []
+    page_render = Page.render
+
+    def render_page(page):
+        rendered_pages.append(page.number)
+        page_render(page)
+
+    monkeypatch.setattr(Page, 'render', render_page)
+    first = render_rst_document(tmpdir, 'cached', layout_cache=True)
+    assert first.layout_cache.reused_pages == 0
+    assert tmpdir.join('cached.rtl').check()
+    rendered_pages.clear()
+    second = render_rst_document(tmpdir, 'cached', layout_cache=True)
+    second_pages = second.backend_document.pages
+    assert 0 < second.layout_cache.reused_pages
+    assert len(rendered_pages) < 2 * len(second_pages)
+    full = render_rst_document(tmpdir, 'full', layout_cache=False)
+    full_pages = full.backend_document.pages
+    assert len(second_pages) == len(full_pages) > 2
+    for second_page, full_page in zip(second_pages, full_pages):
+        assert second_page.canvas.getvalue() == full_page.canvas.getvalue()
+    assert second.page_references == full.page_references
+
+
+def test_progress_reporters(tmpdir):
+    events = []
+    paragraphs = [Paragraph('Lorem ipsum dolor sit amet. ' * 40)
+                  for _ in range(12)]
+    document = Article(DocumentTree(paragraphs))
+    log_path = tmpdir.join('progress.jsonl')
+    json_log = JSONLinesProgressLog(str(log_path))
+    reporters = [ProgressCallback(events.append), json_log]
+    assert document.render(str(tmpdir.join('progress')),
+                           progress_reporters=reporters)
+    json_log.close()
+    assert events[0].type == 'pass started'
+    assert events[-1].type == 'pass finished'
+    placed = [event for event in events
+              if event.type == 'flowable placed' and event.rendering_pass == 1]
+    assert [event.index for event in placed] == list(range(12))
+    assert all(event.total == 12 and event.part == 'contents'
+               for event in placed)
+    assert placed[-1].fraction == 1
+    log_lines = log_path.readlines()
+    assert len(log_lines) == len(events)
+    assert json.loads(log_lines[1]) == placed[0].as_dict()
+
+
+def test_current_section(tmpdir):
+    sections = []
+    for index in range(1, 7):
+        title = 'Section {}'.format(index)
+        paragraphs = ['Lorem ipsum dolor sit amet. ' * 40] * (index % 3 * 3)
+        sections.append('\n'.join([title, '-' * len(title), '']
+                                  + paragraphs))
+    input_file = tmpdir.join('sections.rst')
+    input_file.write('\n\n'.join(sections))
+    document = Article(ReStructuredTextReader().parse(str(input_file)))
+    assert document.render(str(tmpdir.join('sections')))
+    first_pages = [(document.page_elements[section.get_id(document)],
+                    section) for section in document._sections]
+    part = first_pages[-1][0].document_part
+    first_pages = [(first_page, section) for first_page, section in first_pages
+                   if first_page.document_part is part]
+    assert len(first_pages) == 6
+    assert len(set(page for page, _ in first_pages)) < len(part.pages)
+    for page in part.pages:
+        starting = [section for first_page, section in first_pages
+                    if first_page.number == page.number]
+        preceding = [section for first_page, section in first_pages
+                     if first_page.number < page.number]
+        expected = (starting[0] if starting
+                    else preceding[-1] if preceding else None)
+        assert page.get_current_section(1) is expected
+        assert page.get_current_section(2) is None
+
+
+def render_chapters(tmpdir, filename, processes=None):
+    chapters = []
+    for index in range(1, 6):
+        title = 'Chapter {}'.format(index)
+        paragraphs = ['Lorem ipsum dolor sit amet. ' * 40] * index
+        chapters.append('\n'.join([title, '=' * len(title), '']
+                                  + paragraphs))
+    input_file = tmpdir.join('chapters.rst')
+    input_file.write('\n\n'.join(chapters))
+    document = Book(ReStructuredTextReader().parse(str(input_file)))
+    assert document.render(str(tmpdir.join(filename)),
+                           progress_reporters=[], processes=processes)
+    return document
+
+
+def test_render_in_parallel(tmpdir, monkeypatch):
+    rendered_ranges = []
+    render_chapters_in_worker = Document._render_chapters
+
+    def render_range(document, *args):
+        rendered_ranges.append(args)
+        return render_chapters_in_worker(document, *args)
+
+    serial = render_chapters(tmpdir, 'serial')
+    tmpdir.join('serial.rtc').copy(tmpdir.join('parallel.rtc'))
+    monkeypatch.setattr(Document, '_render_chapters', render_range)
+    parallel = render_chapters(tmpdir, 'parallel', processes=2)
+    assert not rendered_ranges          # rendered in worker processes
+    assert parallel._rendering_pass == 1
+    serial_pages = serial.backend_document.pages
+    parallel_pages = parallel.backend_document.pages
+    assert len(parallel_pages) == len(serial_pages)
+    assert parallel.layout_cache.reused_pages > len(serial_pages) / 2
+    for serial_page, parallel_page in zip(serial_pages, parallel_pages):
+        assert serial_page.canvas.getvalue() == parallel_page.canvas.getvalue()
+
+
+def test_identical_images_embedded_once(tmpdir):
+    copy = tmpdir.join('copy.png')
+    shutil.copy(str(IMAGE), str(copy))
+    flowables = []
+    for filename in (str(IMAGE), str(IMAGE), str(copy)):
+        flowables.append(Image(filename))
+        flowables.append(Paragraph('Lorem ipsum dolor sit amet. ' * 150))
+    document = Article(DocumentTree(flowables))
+    assert document.render(str(tmpdir.join('images')))
+    assert len(document._images) == 2
+    xobjects = set()
+    for page in document.backend_document.pages:
+        resources = page.cos_page['Resources']
+        if 'XObject' in resources:
+            xobjects.update(id(xobject)
+                            for xobject in resources['XObject'].values())
+    assert len(xobjects) == 1
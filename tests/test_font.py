@@ -6,9 +6,19 @@
 # Public License v3. See the LICENSE file or http://www.gnu.org/licenses/.
 
 
+import gc
+import os
+import shutil
+
 import pytest
 
+from collections import OrderedDict
+
 from rinoh.font import Typeface, MissingGlyphException
+from rinoh.font.opentype import OpenTypeFont
+from rinoh.font.opentype.parse import OpenTypeTables
+from rinoh.font.opentype.subset import subset
+from rinoh.paragraph import shape
 
 
 def test_missingglyph_type1():
@@ -16,3 +26,84 @@ def test_missingglyph_type1():
     font = times.get_font(weight='regular')
     with pytest.raises(MissingGlyphException):
         font.get_glyph('\u2024', 'normal')
+
+
+TERMES = os.path.join(os.path.dirname(__file__), 'texgyretermes-regular.otf')
+
+
+def test_opentype_lazy_tables():
+    tables = OpenTypeTables(TERMES)
+    assert 'GPOS' in tables and 'glyf' not in tables
+    assert not tables.keys()                # no tables parsed yet
+    tables['hmtx']
+    assert set(tables.keys()) == {'hhea', 'maxp', 'hmtx'}
+
+
+def test_opentype_shared_metrics():
+    font = OpenTypeFont(TERMES)
+    glyph = font.get_glyph('a', 'normal')
+    other_font = OpenTypeFont(TERMES, weight='bold')
+    assert other_font._tables is font._tables
+    assert other_font.get_glyph('a', 'normal') is glyph
+
+
+def test_opentype_tables_cache(tmpdir, monkeypatch):
+    monkeypatch.setattr(OpenTypeTables, 'CACHE_SIZE', 2)
+    monkeypatch.setattr(OpenTypeTables, '_instances', OrderedDict())
+    copies = [tmpdir.join('font{}.otf'.format(index)) for index in range(3)]
+    for copy in copies:
+        shutil.copy(TERMES, str(copy))
+    font = OpenTypeFont(str(copies[0]))
+    tables = font._tables
+    assert OpenTypeFont(str(copies[0]))._tables is tables
+    # a modified file gets new tables; the old ones are still in use
+    copies[0].write_binary(copies[0].read_binary() + b'\0')
+    modified_tables = OpenTypeFont(str(copies[0]))._tables
+    assert modified_tables is not tables and not tables.closed
+    del font
+    gc.collect()
+    assert tables.closed
+    # tables evicted from the cache are closed when no longer used
+    other_font = OpenTypeFont(str(copies[1]))
+    OpenTypeFont(str(copies[2]))
+    gc.collect()
+    assert modified_tables.closed
+    assert len(OpenTypeTables._instances) == 2
+    assert not other_font._tables.closed
+
+
+def test_opentype_features():
+    font = OpenTypeFont(TERMES)
+    glyph = {char: font.get_glyph(char, 'normal') for char in 'AVfi1'}
+    assert font.get_kerning(glyph['A'], glyph['V']) == -130
+    assert font.get_kerning(glyph['V'], glyph['1']) == 0
+    assert font.get_ligature(glyph['f'], glyph['i']).code == 126
+    assert font.get_ligature(glyph['i'], glyph['f']) is None
+    assert font.get_glyph('1', 'oldstyle figures').code == 1018
+    assert font.get_glyph('A', 'oldstyle figures') is glyph['A']
+
+
+def test_subset_opentype(tmpdir):
+    font = OpenTypeFont(TERMES)
+    glyph_codes = {font.get_glyph(char, 'normal').code for char in 'rinoh'}
+    with open(TERMES, 'rb') as font_file:
+        font_data = font_file.read()
+    subset_data = subset(font_data, glyph_codes)
+    assert len(subset_data) < len(font_data) / 2
+    subset_filename = tmpdir.join('subset.otf').strpath
+    with open(subset_filename, 'wb') as subset_file:
+        subset_file.write(subset_data)
+    subset_font = OpenTypeFont(subset_filename)
+    assert subset_font.name == font.name
+    assert (subset_font['hmtx']['advanceWidth']
+            == font['hmtx']['advanceWidth'])
+
+
+def test_shape_cached():
+    font = OpenTypeFont(TERMES)
+    glyphs = shape(font, 10.0, 'normal', True, True, 'fifty')
+    assert [glyph.char for glyph in glyphs] == ['fi', 'f', 't', 'y']
+    assert glyphs.width == sum(glyph.width for glyph in glyphs)
+    assert shape(font, 10.0, 'normal', True, True, 'fifty') is glyphs
+    unligated = shape(font, 10.0, 'normal', True, False, 'fifty')
+    assert len(unligated) == 5
@@ -0,0 +1,46 @@
+# This file is part of rinohtype, the Python document preparation system.
+#
+# Copyright (c) Brecht Machiels.
+#
+# Use of this source code is subject to the terms of the GNU Affero General
+# Public License v3. See the LICENSE file or http://www.gnu.org/licenses/.
+
+
+from docutils.core import publish_doctree
+
+from rinoh.frontend.rst import DocutilsNode
+
+
+RST = """\
+First paragraph
+
+* item 1
+* item 2
+* item 3
+
+Second paragraph
+"""
+
+
+def test_children_mapped_once(monkeypatch):
+    mapped = []
+    map_node = DocutilsNode.map_node.__func__
+
+    def record_map_node(cls, node, **context):
+        mapped.append(node)
+        return map_node(cls, node, **context)
+
+    document = DocutilsNode.map_node(publish_doctree(RST))
+    monkeypatch.setattr(DocutilsNode, 'map_node',
+                        classmethod(record_map_node))
+    paragraph, bullet_list, last_paragraph = document.getchildren()
+    assert document.getchildren()[0] is paragraph
+    assert document.paragraph is paragraph
+    assert list(paragraph) == [paragraph, last_paragraph]
+    items = list(bullet_list.list_item)
+    assert [item.paragraph.text for item in items] == ['item 1', 'item 2',
+                                                       'item 3']
+    assert items[1].parent is bullet_list
+    assert list(items[1]) == items
+    assert list(document) == [document]
+    assert len(mapped) == len(set(map(id, mapped))) == 9
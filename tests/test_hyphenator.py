@@ -0,0 +1,87 @@
+# This file is part of rinohtype, the Python document preparation system.
+#
+# Copyright (c) Brecht Machiels.
+#
+# Use of this source code is subject to the terms of the GNU Affero General
+# Public License v3. See the LICENSE file or http://www.gnu.org/licenses/.
+
+
+import os
+import pytest
+
+from rinoh import hyphenator
+from rinoh.hyphenator import (Hyphenator, Hyph_dict, PatternTrie,
+                              COMPILED_EXTENSION, compiled_filenames)
+
+
+PATTERNS = """UTF-8
+1ba
+a1b
+.schif1fahrt/ff=f,5,2
+"""
+
+
+@pytest.fixture
+def cache_dir(tmpdir, monkeypatch):
+    cache_dir = tmpdir.join('cache')
+    monkeypatch.setattr(hyphenator, 'user_cache_directory',
+                        lambda: str(cache_dir))
+    return cache_dir
+
+
+def write_dictionary(tmpdir):
+    dic_file = tmpdir.join('hyph_xx.dic')
+    dic_file.write_text(PATTERNS, 'utf-8')
+    return str(dic_file)
+
+
+def test_hyphenator(tmpdir, cache_dir):
+    hyphenator = Hyphenator(write_dictionary(tmpdir), 1, 1)
+    assert hyphenator.inserted('abba') == 'a-b-ba'
+    assert hyphenator.positions('schiffahrt') == [5]
+    assert hyphenator.positions('schiffahrt')[0].data == ('ff=f', -1, 3)
+    assert list(hyphenator.iterate('Schiffahrt')) == [('Schiff', 'fhrt')]
+
+
+def test_compiled_dictionary(tmpdir, cache_dir):
+    dic_filename = write_dictionary(tmpdir)
+    hyph_dict = Hyph_dict(dic_filename)
+    compiled_file, = cache_dir.listdir()
+    assert compiled_file.ext == COMPILED_EXTENSION
+    assert not tmpdir.join('hyph_xx' + COMPILED_EXTENSION).check()
+    assert PatternTrie.load(str(compiled_file)).positions('abba') == [1, 2]
+    hyph_dict.positions('abba')
+    hyph_dict.positions('ABBA')
+    assert hyph_dict._positions.cache_info().hits == 1
+
+
+def test_compiled_next_to_dictionary(tmpdir, cache_dir):
+    cache_dir.write('not a directory')
+    dic_filename = write_dictionary(tmpdir)
+    assert Hyph_dict(dic_filename).positions('abba') == [1, 2]
+    assert not tmpdir.join('hyph_xx' + COMPILED_EXTENSION).check()
+    assert [os.path.dirname(compiled_filename) for compiled_filename
+            in compiled_filenames(dic_filename)] == [str(cache_dir)]
+    assert Hyph_dict(dic_filename,
+                     next_to_dictionary=True).positions('abba') == [1, 2]
+    assert tmpdir.join('hyph_xx' + COMPILED_EXTENSION).check()
+
+
+def test_truncated_compiled_dictionary(tmpdir, cache_dir):
+    dic_filename = write_dictionary(tmpdir)
+    Hyph_dict(dic_filename)
+    compiled_file, = cache_dir.listdir()
+    compiled = compiled_file.read_binary()
+    for length in (45, 47, 50, len(compiled) - 1):
+        with pytest.raises(ValueError):
+            PatternTrie(compiled[:length])
+        compiled_file.write_binary(compiled[:length])
+        assert Hyph_dict(dic_filename).positions('abba') == [1, 2]
+        assert compiled_file.read_binary() == compiled    # compiled again
+
+
+def test_outdated_compiled_dictionary(tmpdir, cache_dir):
+    dic_filename = write_dictionary(tmpdir)
+    assert Hyph_dict(dic_filename).positions('ab') == [1]
+    tmpdir.join('hyph_xx.dic').write_text(PATTERNS + 'b1c\n', 'utf-8')
+    assert Hyph_dict(dic_filename).positions('abc') == [1, 2]
@@ -0,0 +1,47 @@
+# This file is part of rinohtype, the Python document preparation system.
+#
+# Copyright (c) Brecht Machiels.
+#
+# Use of this source code is subject to the terms of the GNU Affero General
+# Public License v3. See the LICENSE file or http://www.gnu.org/licenses/.
+
+
+from rinoh.backend.pdf import Canvas, PlacedCanvas
+from rinoh.annotation import NamedDestination
+
+
+def test_nested_canvases():
+    page, outer, inner = Canvas(), Canvas(), Canvas()
+    page.print('page')
+    outer.print('outer')
+    outer.fonts['F1'] = 'font 1'
+    outer.annotate(NamedDestination('outer'), 1, 2, 0, 0)
+    inner.print('inner')
+    inner.fonts['F2'] = 'font 2'
+    inner.images[3] = 'image 3'
+    inner.annotate(NamedDestination('inner'), 0.1, 0.2, 0, 0)
+    inner.append(outer, 10, 20)
+    outer.print('after inner')
+    outer.append(page, 100, 200)
+    # placing a canvas does not copy its contents
+    assert outer.items[3] == PlacedCanvas(inner, 10, 20)
+    assert page.items[3] == PlacedCanvas(outer, 100, 200)
+    assert page.getvalue() == (b'page\n'
+                               b'q\n'
+                               b'1 0 0 1 100.000000 -200.000000 cm\n'
+                               b'outer\n'
+                               b'q\n'
+                               b'1 0 0 1 10.000000 -20.000000 cm\n'
+                               b'inner\n'
+                               b'Q\n'
+                               b'after inner\n'
+                               b'Q\n')
+    assert page.used_fonts() == {'F1': 'font 1', 'F2': 'font 2'}
+    assert page.used_images() == {3: 'image 3'}
+    assert [(annotation_location.annotation.names,
+             annotation_location.left, annotation_location.top)
+            for annotation_location in page.placed_annotations()] \
+        == [(('outer', ), 101, 202), (('inner', ), 110.1, 220.2)]
+    page.clear()
+    assert page.getvalue() == b''
+    assert page.placed_annotations() == []
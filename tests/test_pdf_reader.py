@@ -6,12 +6,15 @@
 # Public License v3. See the LICENSE file or http://www.gnu.org/licenses/.
 
 
+import mmap
 import pytest
 
 from io import BytesIO
 
 from rinoh.backend.pdf import cos
-from rinoh.backend.pdf.reader import PDFObjectReader
+from rinoh.backend.pdf.reader import (PDFObjectReader, PDFReader,
+                                     PDFPageReader, decode_xref_stream,
+                                     get_reader)
 
 
 def test_read_boolean():
@@ -64,6 +67,41 @@ def test_read_name():
     test_name(b'/A#42', 'AB')
 
 
+def test_read_string():
+    def test_string(bytes_string, string):
+        reader = PDFObjectReader(BytesIO(bytes_string))
+        result = reader.next_item()
+        assert isinstance(result, cos.String) and result == cos.String(string)
+
+    test_string(b'(a string)', b'a string')
+    test_string(b'(balanced (parentheses))', b'balanced (parentheses)')
+    test_string(b'(escaped \\) and \\()', b'escaped ) and (')
+    test_string(b'(line\\nfeed\\t)', b'line\nfeed\t')
+    test_string(b'(\\101\\1022\\0)', b'AB2\0')
+    test_string(b'(continued \\\r\nline)', b'continued line')
+
+
+def test_read_array_with_comment():
+    reader = PDFObjectReader(b'[1 0 R % comment\n 2 0 R 3]')
+    result = reader.next_item()
+    assert isinstance(result, cos.Array)
+    first, second, third = result
+    assert isinstance(first, cos.Reference) and first.identifier == 1
+    assert isinstance(second, cos.Reference) and second.identifier == 2
+    assert isinstance(third, cos.Integer) and third == 3
+
+
+def test_decode_xref_stream():
+    data = bytes([1, 0, 0, 5, 0,
+                  2, 0, 1, 7, 3])
+    assert list(decode_xref_stream(data, [1, 3, 1])) == [(1, 5, 0),
+                                                          (2, 263, 3)]
+    assert list(decode_xref_stream(data, [1, 2, 2])) == [(1, 0, 1280),
+                                                          (2, 1, 1795)]
+    assert list(decode_xref_stream(data, [0, 4, 1])) == [(1, 16777221, 0),
+                                                          (1, 33554695, 3)]
+
+
 def test_read_dictionary():
     input = b"""
     << /Type          /Example
@@ -91,3 +129,152 @@ def test_read_dictionary():
                                     ('VeryLastItem', cos.String('OK'))]))])
     assert isinstance(result, cos.Dictionary)
     assert dict(result) == dict(expected)
+
+
+@pytest.mark.parametrize('object_streams', [False, True])
+def test_write_and_read_document(object_streams):
+    document = cos.Document('test', object_streams=object_streams)
+    for index in range(3):
+        document.catalog['Pages'].new_page(100, 150)
+    deleted = cos.String('deleted', indirect=True)
+    document.register(deleted)
+    deleted.delete(document)
+    file = BytesIO()
+    document.write(file)
+    size = document.max_identifier + 1
+    file.seek(0)
+    reader = PDFReader(file)
+    check_document(reader, size)
+
+
+def check_document(reader, size):
+    assert reader.max_identifier == size - 1
+    assert int(reader.catalog['Pages']['Count']) == 3
+    assert reader.catalog['Pages']['Kids'][2]['MediaBox'][3] == 150
+    assert str(reader.info['Creator']) == 'test'
+
+
+def test_read_document_from_file(tmpdir):
+    document = cos.Document('test', object_streams=True)
+    for index in range(3):
+        document.catalog['Pages'].new_page(100, 150)
+    filename = tmpdir.join('test.pdf')
+    with filename.open('wb') as file:
+        document.write(file)
+    reader = PDFReader(str(filename))
+    assert isinstance(reader.data, mmap.mmap)
+    check_document(reader, document.max_identifier + 1)
+
+
+@pytest.mark.parametrize('object_streams', [False, True])
+def test_write_object(object_streams):
+    document = cos.Document('test', object_streams=object_streams)
+    file = BytesIO()
+    for index in range(3):
+        page = document.catalog['Pages'].new_page(100, 150)
+        contents = page['Contents'] = cos.Stream()
+        contents.write('page {}'.format(index).encode('ascii'))
+        document.write_object(contents, file)
+        assert contents.closed
+    with pytest.raises(ValueError):
+        document.write(BytesIO())
+    document.write(file)
+    reader = PDFReader(file)
+    check_document(reader, document.max_identifier + 1)
+    kids = reader.catalog['Pages']['Kids']
+    assert [kid.object['Contents'].read() for kid in kids] \
+        == [b'page 0', b'page 1', b'page 2']
+
+
+def page_tree_node(parent, kids, **items):
+    node = cos.Dictionary(indirect=True, Type=cos.Name('Pages'), **items)
+    if parent is not None:
+        node['Parent'] = parent
+    node['Kids'] = cos.Array()
+    node['Count'] = cos.Integer(0)
+    for kid in kids:
+        kid['Parent'] = node
+        node['Kids'].append(kid)
+    return node
+
+
+def leaf_page(width, *contents):
+    page = cos.Dictionary(indirect=True, Type=cos.Name('Page'))
+    page['MediaBox'] = cos.Array([cos.Integer(0), cos.Integer(0),
+                                  cos.Integer(width), cos.Integer(100)])
+    streams = cos.Array()
+    for content in contents or [b'']:
+        stream = cos.Stream()
+        stream.write(content)
+        streams.append(stream)
+    page['Contents'] = streams if len(streams) > 1 else streams[0]
+    return page
+
+
+def write_page_tree(file):
+    """Write a document with a nested page tree with an empty node; the pages'
+    MediaBox width is 10 times their page number"""
+    document = cos.Document('test')
+    inheriting = cos.Dictionary(indirect=True, Type=cos.Name('Page'))
+    inheriting['Contents'] = cos.Stream()
+    first = page_tree_node(None, [leaf_page(10), leaf_page(20)])
+    empty = page_tree_node(None, [])
+    second = page_tree_node(None, [leaf_page(30, b'0 g', b'1 0 0 rg'),
+                                   inheriting],
+                            MediaBox=cos.Array([cos.Integer(0),
+                                                cos.Integer(0),
+                                                cos.Integer(40),
+                                                cos.Integer(100)]))
+    root = document.catalog['Pages']
+    root['Kids'] = cos.Array()
+    for kid in (first, empty, second, leaf_page(50)):
+        kid['Parent'] = root
+        root['Kids'].append(kid)
+    root['Resources'] = cos.Dictionary(ProcSet=cos.Array([cos.Name('PDF')]))
+    for node in (root, first, second):
+        node['Count'] = cos.Integer(sum(int(kid['Count']) if 'Kids' in kid
+                                        else 1 for kid in node['Kids']))
+    document.write(file)
+
+
+def test_get_page():
+    file = BytesIO()
+    write_page_tree(file)
+    reader = PDFReader(file)
+    for index in range(5):
+        page = reader.get_page(index)
+        assert str(page['Type']) == 'Page'
+        assert 'Kids' not in page
+        if 'MediaBox' in page:
+            assert page['MediaBox'][2] == 10 * (index + 1)
+    with pytest.raises(IndexError):
+        reader.get_page(5)
+    with pytest.raises(IndexError):
+        reader.get_page(-1)
+
+
+def test_page_reader(tmpdir):
+    filename = tmpdir.join('tree.pdf')
+    with filename.open('wb') as file:
+        write_page_tree(file)
+    page_readers = [PDFPageReader(str(filename), page_number)
+                    for page_number in range(1, 6)]
+    assert [page.width for page in page_readers] == [10, 20, 30, 40, 50]
+    assert all(page['Resources']['ProcSet'] == [cos.Name('PDF')]
+               for page in page_readers)
+    assert page_readers[2].getvalue() == b'0 g\n1 0 0 rg'
+
+
+def test_reader_cache(tmpdir):
+    filename = tmpdir.join('tree.pdf')
+    with filename.open('wb') as file:
+        write_page_tree(file)
+    reader = get_reader(str(filename))
+    assert get_reader(str(filename)) is reader
+    with filename.open('wb') as file:
+        document = cos.Document('modified')
+        document.catalog['Pages'].new_page(100, 150)
+        document.write(file)
+    modified_reader = get_reader(str(filename))
+    assert modified_reader is not reader
+    assert str(modified_reader.info['Creator']) == 'modified'
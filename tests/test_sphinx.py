@@ -6,18 +6,20 @@
 # Public License v3. See the LICENSE file or http://www.gnu.org/licenses/.
 
 
+import os
+
 import pytest
 
 from sphinx.application import Sphinx
 
 from rinoh.document import DocumentTree
-from rinoh.frontend.sphinx import template_from_config
+from rinoh.frontend.sphinx import RinohBuilder, template_from_config
 from rinoh.language import IT
 from rinoh.paper import A4, LETTER
 from rinoh.templates import Book, Article
 
 
-def create_sphinx_app(tmpdir, **confoverrides):
+def create_sphinx_app(tmpdir, parallel=0, **confoverrides):
     return Sphinx(srcdir=tmpdir.strpath,
                   confdir=None,
                   outdir=(tmpdir / 'output').strpath,
@@ -25,7 +27,8 @@ def create_sphinx_app(tmpdir, **confoverrides):
                   buildername='rinoh',
                   # confoverrides=dict(extensions=['rinoh.frontend.sphinx'],
                   #                    **confoverrides))
-                  confoverrides=confoverrides)
+                  confoverrides=confoverrides,
+                  parallel=parallel)
 
 
 CONFIG_DIR = 'confdir'
@@ -118,3 +121,26 @@ def test_sphinx_config_rinoh_template_from_filename(tmpdir):
     assert not template_cfg.keys()
     assert template_cfg.template == Book
     assert template_cfg.get_attribute_value('stylesheet').name == 'Sphinx'
+
+
+def test_sphinx_parallel_write(tmpdir, monkeypatch):
+    pids_file = tmpdir.join('pids')
+    write_doc = RinohBuilder.write_doc
+
+    def record_pid(builder, *args, **kwargs):
+        with open(pids_file.strpath, 'a') as pids:
+            print(os.getpid(), file=pids)
+        write_doc(builder, *args, **kwargs)
+
+    monkeypatch.setattr(RinohBuilder, 'write_doc', record_pid)
+    tmpdir.join('index.rst').write('Index\n=====\n\n.. toctree::\n\n'
+                                   '   other\n')
+    tmpdir.join('other.rst').write('Other\n=====\n\nLorem ipsum.\n')
+    documents = [('index', 'index', 'Index', 'Author'),
+                 ('other', 'other', 'Other', 'Author')]
+    app = create_sphinx_app(tmpdir, parallel=2, rinoh_documents=documents)
+    app.build()
+    assert (tmpdir / 'output' / 'index.pdf').check()
+    assert (tmpdir / 'output' / 'other.pdf').check()
+    pids = set(int(pid) for pid in pids_file.readlines())
+    assert len(pids) == 2 and os.getpid() not in pids
@@ -172,6 +172,29 @@ def test_find_style():
     assert ssheet2.find_style(paragraph5) == 'paragraph'
 
 
+def test_find_style_after_adding_selector():
+    matcher = StyledMatcher({'paragraph': Paragraph})
+    stylesheet = StyleSheet('stylesheet', matcher=matcher)
+    stylesheet('paragraph', font_size=8*PT)
+    styled = Paragraph('A paragraph', style='paragraph2')
+    assert stylesheet.find_style(styled) == 'paragraph'
+    matcher['paragraph 2'] = Paragraph.like('paragraph2')
+    stylesheet('paragraph 2', font_size=9*PT)
+    assert stylesheet.find_style(styled) == 'paragraph 2'
+
+
+def test_style_signature():
+    index = ssheet2.selector_index
+    first = Paragraph('First paragraph', style='paragraph3')
+    second = Paragraph('Second paragraph', style='paragraph3')
+    other = Paragraph('Other paragraph', style='paragraph4')
+    assert index.signature(first) == index.signature(second)
+    assert index.signature(first) != index.signature(other)
+    assert ssheet2.find_style(first) == 'paragraph 3'
+    assert ssheet2.find_style(second) == 'paragraph 3'
+    assert ssheet2.find_style(other) == 'paragraph 4'
+
+
 def test_get_style():
     assert emphasized.get_style('font_weight', container) == 'medium'
     assert emphasized.get_style('font_width', container) == 'condensed'
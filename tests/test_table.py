@@ -0,0 +1,101 @@
+# This file is part of rinohtype, the Python document preparation system.
+#
+# Copyright (c) Brecht Machiels.
+#
+# Use of this source code is subject to the terms of the GNU Affero General
+# Public License v3. See the LICENSE file or http://www.gnu.org/licenses/.
+
+
+from rinoh.dimension import PT
+from rinoh.document import DocumentTree
+from rinoh.flowable import Flowable
+from rinoh.paragraph import Paragraph
+from rinoh.reference import Reference
+from rinoh.structure import List
+from rinoh.table import (Table, TableBody, GeneratedTableBody, TableRow,
+                         TableCell)
+from rinoh.templates import Article
+
+
+def create_table():
+    texts = ['Lorem ipsum dolor sit amet, consectetur adipiscing elit.',
+             'Supercalifragilisticexpialidocious',
+             '',
+             'A line\nbreak']
+    rows = [TableRow([TableCell([Paragraph(text)]),
+                      TableCell([Paragraph('Page ' + Reference('target',
+                                                               type='page'))]),
+                      TableCell([List([Paragraph(text), Paragraph('item')])])])
+            for text in texts]
+    return Table(TableBody(rows))
+
+
+def render_table(tmpdir, monkeypatch, callback):
+    size_columns = Table._size_columns
+
+    def _size_columns(table, container):
+        callback(table, container)
+        return size_columns(table, container)
+
+    monkeypatch.setattr(Table, '_size_columns', _size_columns)
+    table = create_table()
+    document = Article(DocumentTree([table,
+                                     Paragraph('Target', id='target')]))
+    assert document.render(str(tmpdir.join('table')))
+    return document, table
+
+
+def test_content_widths(tmpdir, monkeypatch):
+    def check_cells(table, container):
+        for row in table.body:
+            for cell in row:
+                assert (cell.content_widths(container)
+                        == Flowable.content_widths(cell, container))
+
+    render_table(tmpdir, monkeypatch, check_cells)
+
+
+def test_content_widths_cached(tmpdir, monkeypatch):
+    measured = []
+    content_widths = TableCell.content_widths
+
+    def measure(cell, container):
+        measured.append(cell)
+        return content_widths(cell, container)
+
+    monkeypatch.setattr(TableCell, 'content_widths', measure)
+    document, table = render_table(tmpdir, monkeypatch, lambda *args: None)
+    assert document._rendering_pass == 2
+    # only the cells referencing the target's page are measured again, since
+    # the page reference is resolved in the second rendering pass
+    cells = [id(cell) for row in table.body for cell in row]
+    reference_cells = [id(row[1]) for row in table.body]
+    assert [id(cell) for cell in measured] == cells + reference_cells
+
+
+def render_body(tmpdir, name, body):
+    table = Table(body, column_widths=[100*PT, 200*PT])
+    document = Article(DocumentTree([table]))
+    assert document.render(str(tmpdir.join(name)))
+    return document
+
+
+def test_generated_table_body(tmpdir):
+    def create_row(index):
+        created.append(index)
+        return TableRow([TableCell([Paragraph('Row {}'.format(index))]),
+                         TableCell([Paragraph('Lorem ipsum ' * (index % 5))])])
+
+    created = []
+    rows = [create_row(index) for index in range(120)]
+    document = render_body(tmpdir, 'list', TableBody(rows))
+    created.clear()
+    body = GeneratedTableBody(120, create_row)
+    generated = render_body(tmpdir, 'generated', body)
+    assert sorted(set(created)) == list(range(120))
+    assert len(body._rows) == body.row_cache_size
+    pages = document.backend_document.pages
+    generated_pages = generated.backend_document.pages
+    assert len(pages) == len(generated_pages) > 2
+    for page, generated_page in zip(pages, generated_pages):
+        assert page.canvas.getvalue() == generated_page.canvas.getvalue()